@@ -0,0 +1,101 @@
+import ast
+import math
+import time
+
+from code_units import function_features
+
+# Weights of the priority score; see priority()
+PUBLIC_WEIGHT = 2.0
+FAN_IN_WEIGHT = 1.0
+SIZE_WEIGHT = 0.5
+
+
+def _called_names(node):
+    """Returns the names a function calls, as plain names (`f()`) or attribute names (`obj.f()`)."""
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Call):
+            if isinstance(child.func, ast.Name):
+                names.add(child.func.id)
+            elif isinstance(child.func, ast.Attribute):
+                names.add(child.func.attr)
+    return names
+
+
+def fan_in(units):
+    """Counts, for each unit id, how many other units call it.
+
+    Calls are resolved by name only, which is cheap and good enough for ranking; when several
+    units share a name, each of them is credited.
+    """
+    by_name = {}
+    for unit in units:
+        by_name.setdefault(unit["name"], []).append(unit["id"])
+    counts = {unit["id"]: 0 for unit in units}
+    for unit in units:
+        for name in _called_names(unit["node"]):
+            for callee in by_name.get(name, ()):
+                if callee != unit["id"]:
+                    counts[callee] += 1
+    return counts
+
+
+def is_public(unit):
+    """A unit is public when no part of its qualified name is underscore-private (dunders count as public)."""
+    return all(not part.startswith("_") or (part.startswith("__") and part.endswith("__"))
+               for part in unit["qualname"].split("."))
+
+
+def priority(unit, callers):
+    """Scores a unit by public API status, fan-in and size; higher goes first."""
+    size = function_features(unit["code"], unit["node"])["statements"]
+    return (PUBLIC_WEIGHT * is_public(unit) + FAN_IN_WEIGHT * math.log2(1 + callers)
+            + SIZE_WEIGHT * math.log1p(size))
+
+
+def rank_units(units):
+    """Returns the units in priority order, ties broken by file and position."""
+    callers = fan_in(units)
+    scores = {unit["id"]: priority(unit, callers[unit["id"]]) for unit in units}
+    return sorted(units, key=lambda unit: (-scores[unit["id"]], unit["path"], unit["lineno"]))
+
+
+def summarize_until(units, summarize, deadline, started_at=None):
+    """Summarizes units in priority order, stopping before `deadline` seconds have passed since `started_at`.
+
+    A function is only started when the observed seconds per token predict it will finish in
+    time. Returns ({unit id: summary}, [skipped units]).
+    """
+    started_at = time.monotonic() if started_at is None else started_at
+    summaries = {}
+    skipped = []
+    seconds_per_token = None
+    for unit in rank_units(units):
+        tokens = function_features(unit["code"], unit["node"])["tokens"]
+        remaining = deadline - (time.monotonic() - started_at)
+        expected = 0.0 if seconds_per_token is None else seconds_per_token * tokens
+        if remaining <= 0 or expected > remaining:
+            skipped.append(unit)
+            continue
+        start = time.monotonic()
+        summaries[unit["id"]] = summarize(unit["name"], unit["code"])
+        observed = (time.monotonic() - start) / tokens
+        # Smooth the rate so one slow call doesn't skip everything after it
+        seconds_per_token = observed if seconds_per_token is None else 0.7 * seconds_per_token + 0.3 * observed
+    return summaries, skipped
+
+
+def format_partial_docs(units, summaries, skipped):
+    """Formats the summaries per file in source order, followed by the functions the deadline cut."""
+    sections = []
+    for unit in units:
+        if unit["id"] not in summaries:
+            continue
+        if not sections or sections[-1][0] != unit["path"]:
+            sections.append((unit["path"], []))
+        sections[-1][1].append(summaries[unit["id"]])
+    lines = [f"Summary of {path}:\n" + "\n\n".join(file_summaries) for path, file_summaries in sections]
+    if skipped:
+        lines.append(f"Skipped {len(skipped)} of {len(units)} functions to meet the deadline:\n"
+                     + "\n".join(f"  {unit['id']}" for unit in skipped))
+    return "\n\n".join(lines)
@@ -0,0 +1,209 @@
+import gc
+import os
+import sys
+import math
+import resource
+import threading
+from collections import deque
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_OOM_MESSAGES = ("out of memory", "can't allocate memory", "cannot allocate memory", "defaultcpuallocator")
+
+
+def rss_mb():
+    """Returns this process's current resident set size in MB (its peak so far where /proc isn't available)."""
+    try:
+        with open("/proc/self/statm", 'r') as file:
+            return int(file.read().split()[1]) * _PAGE_SIZE / 2 ** 20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def default_ceiling_mb(fraction=0.8):
+    """A ceiling of `fraction` of physical memory, or 4 GB where that can't be read."""
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * _PAGE_SIZE / 2 ** 20 * fraction
+    except (AttributeError, ValueError, OSError):
+        return 4096.0
+
+
+def is_out_of_memory(error):
+    """True for MemoryError and for the RuntimeErrors torch raises when an allocation fails."""
+    if isinstance(error, MemoryError):
+        return True
+    return isinstance(error, RuntimeError) and any(message in str(error).lower() for message in _OOM_MESSAGES)
+
+
+class PeakRss:
+    """Samples RSS on a background thread while the block runs; `peak` is the highest value seen, in MB."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def __enter__(self):
+        self.peak = rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+        return False
+
+
+class AdaptiveBatcher:
+    """Sizes batches from the measured memory cost per padded token and keeps RSS under a ceiling.
+
+    A batch holds at most `limit` items and is cut short when its padded size (item count times
+    its longest item) at the current MB-per-token estimate would push RSS past `ceiling_mb`.
+    After each batch the estimate is updated from the RSS peak the batch caused. The limit grows
+    when that peak stayed under `headroom` of the ceiling and is halved when it came within 10%.
+    A batch that runs out of memory is split and retried, and later batches stay below its padded
+    size for a while; a single item that still runs out is passed to `on_error`. Every change of
+    course is reported through `log`.
+    """
+
+    def __init__(self, ceiling_mb=None, max_batch=32, start_batch=4, headroom=0.7, grow=1.5, log=print):
+        self.ceiling_mb = ceiling_mb or default_ceiling_mb()
+        self.max_batch = max(1, max_batch)
+        self.limit = max(1, min(start_batch, self.max_batch))
+        self.headroom = headroom
+        self.grow = grow
+        self.log = log
+        self.mb_per_token = None
+        # Batches stay under this padded token count: 3/4 of the smallest one that ran out of memory
+        self.oom_tokens = None
+        self.stats = {"batches": 0, "items": 0, "splits": 0, "grown": 0, "shrunk": 0, "failed": 0, "peak_mb": 0.0}
+
+    def _next_size(self, pending, lengths):
+        """Returns (items, longest, base_mb) for the longest prefix of `pending` that fits; always at least one item."""
+        base = rss_mb()
+        if base > self.ceiling_mb:
+            gc.collect()
+            base = rss_mb()
+            if base > self.ceiling_mb and self.limit > 1:
+                self.limit = max(1, self.limit // 2)
+                self.stats["shrunk"] += 1
+                self.log(f"batching: RSS {base:.0f} MB is over the {self.ceiling_mb:.0f} MB ceiling before a batch; "
+                         f"limit now {self.limit}")
+        size, longest = 1, lengths[pending[0]]
+        while size < min(self.limit, len(pending)):
+            candidate = max(longest, lengths[pending[size]])
+            if self.mb_per_token is not None and base + (size + 1) * candidate * self.mb_per_token > self.ceiling_mb:
+                break
+            if self.oom_tokens is not None and (size + 1) * candidate >= self.oom_tokens:
+                break
+            size, longest = size + 1, candidate
+        return size, longest, base
+
+    def _observe(self, size, longest, base, peak):
+        """Updates the per-token estimate and the limit from one successful batch."""
+        observed = max(0.0, peak - base) / (size * longest)
+        # Rise at once, decay slowly: memory the allocator keeps from earlier batches hides later batches' cost
+        self.mb_per_token = observed if self.mb_per_token is None else max(
+            observed, 0.7 * self.mb_per_token + 0.3 * observed)
+        self.stats["batches"] += 1
+        self.stats["items"] += size
+        self.stats["peak_mb"] = max(self.stats["peak_mb"], peak)
+        if self.oom_tokens is not None:
+            # Memory pressure from outside comes and goes, so the cap loosens slowly while batches succeed
+            self.oom_tokens *= 1.01
+        if peak > 0.9 * self.ceiling_mb and self.limit > 1:
+            self.limit = max(1, self.limit // 2)
+            self.stats["shrunk"] += 1
+            self.log(f"batching: {size} x {longest} tokens peaked at {peak:.0f} MB of {self.ceiling_mb:.0f} MB; "
+                     f"limit now {self.limit}")
+        elif peak < self.headroom * self.ceiling_mb and size >= self.limit and self.limit < self.max_batch:
+            self.limit = min(self.max_batch, math.ceil(self.limit * self.grow))
+            self.stats["grown"] += 1
+            self.log(f"batching: {size} x {longest} tokens peaked at {peak:.0f} MB of {self.ceiling_mb:.0f} MB; "
+                     f"limit now {self.limit}")
+
+    def run(self, items, process, length, on_error=None, on_batch=None):
+        """Calls `process(batch)` over `items` and returns its per-item results in order.
+
+        `length(item)` is the item's token count; `process` returns one result per item of its batch,
+        and `on_batch(batch, outputs)` is called as soon as each batch succeeds. With `on_error`, a
+        batch that raises anything else than out-of-memory is bisected down to the items that fail,
+        which go to `on_error(item, error)` and get None as their result, like an item that runs out
+        of memory on its own; without it, errors propagate.
+        """
+        lengths = [max(1, length(item)) for item in items]
+        results = [None] * len(items)
+        pending = deque(range(len(items)))
+        # Halves of a batch that failed for a reason other than memory, run before anything else
+        bisecting = deque()
+        while pending or bisecting:
+            if bisecting:
+                batch = bisecting.popleft()
+                size, longest, base = len(batch), max(lengths[index] for index in batch), rss_mb()
+            else:
+                size, longest, base = self._next_size(pending, lengths)
+                batch = [pending.popleft() for _ in range(size)]
+            try:
+                with PeakRss() as sampler:
+                    outputs = process([items[index] for index in batch])
+            except Exception as e:
+                out_of_memory = is_out_of_memory(e)
+                if on_error is None and (size == 1 or not out_of_memory):
+                    raise
+                if out_of_memory:
+                    gc.collect()
+                if size == 1:
+                    if out_of_memory:
+                        self.stats["failed"] += 1
+                        self.log(f"batching: one item of {longest} tokens ran out of memory on its own; giving up on it")
+                    on_error(items[batch[0]], e)
+                    continue
+                if not out_of_memory:
+                    # Not a memory problem, so the estimates stand; only the failing items need finding
+                    bisecting.extendleft([batch[size // 2:], batch[:size // 2]])
+                    continue
+                # The estimate was too low: raise it to what would have made this batch fill the whole budget
+                self.mb_per_token = max(self.mb_per_token or 0.0,
+                                        max(1.0, self.ceiling_mb - base) / (size * longest))
+                self.oom_tokens = min(self.oom_tokens or math.inf, 0.75 * size * longest)
+                self.limit = max(1, size // 2)
+                self.stats["splits"] += 1
+                self.log(f"batching: {size} x {longest} tokens ran out of memory at {base:.0f} MB; "
+                         f"retrying in halves, limit now {self.limit}")
+                pending.extendleft(reversed(batch))
+                continue
+            for index, output in zip(batch, outputs):
+                results[index] = output
+            if on_batch is not None:
+                on_batch([items[index] for index in batch], outputs)
+            self._observe(size, longest, base, sampler.peak)
+        return results
+
+    def report(self):
+        stats = self.stats
+        estimate = f"{self.mb_per_token * 1024:.1f} KB/token" if self.mb_per_token is not None else "no estimate"
+        return (f"batching: {stats['items']} items in {stats['batches']} batches, final limit {self.limit}, "
+                f"{estimate}, peak {stats['peak_mb']:.0f} of {self.ceiling_mb:.0f} MB, {stats['splits']} OOM splits"
+                + (f" (batches capped at {self.oom_tokens:.0f} padded tokens), " if self.oom_tokens else ", ")
+                + f"{stats['grown']} grown, {stats['shrunk']} shrunk, {stats['failed']} failed")
+
+
+def add_batching_arguments(parser):
+    parser.add_argument("--max_batch", type=int, default=1,
+                        help="Up to this many functions per generate call, sized to fit --memory_ceiling_mb")
+    parser.add_argument("--memory_ceiling_mb", type=float,
+                        help="With --max_batch, RSS to keep batches under (default 80%% of physical memory)")
+
+
+def batcher_from_args(args):
+    """Returns an AdaptiveBatcher for --max_batch above 1, otherwise None."""
+    if args.max_batch <= 1:
+        return None
+    return AdaptiveBatcher(args.memory_ceiling_mb, args.max_batch)
@@ -0,0 +1,347 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import torch
+import transformers
+from tokenizers import Tokenizer, models, pre_tokenizers
+from transformers import AutoModelForSeq2SeqLM, BartConfig, T5Config, PreTrainedTokenizerFast
+
+from cody_docu import extract_functions, build_prompt
+from length_policy import LengthPolicy
+from compiled import add_compile_arguments, compile_model, warm_up
+
+RESULTS_DIR = "bench_results"
+SPECIAL_TOKENS = ["<pad>", "</s>", "<unk>", "<s>"]
+
+# Tiny randomly initialized stand-ins for the seq2seq models the tool uses.
+# Their outputs are meaningless, but they exercise the same code paths offline.
+BACKENDS = {
+    "bart-tiny": lambda vocab_size: BartConfig(
+        vocab_size=vocab_size, d_model=64, encoder_layers=2, decoder_layers=2,
+        encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=128, decoder_ffn_dim=128,
+        max_position_embeddings=1024, pad_token_id=0, eos_token_id=1, bos_token_id=3,
+        decoder_start_token_id=1, forced_eos_token_id=None,
+    ),
+    "t5-tiny": lambda vocab_size: T5Config(
+        vocab_size=vocab_size, d_model=64, d_kv=32, d_ff=128, num_layers=2, num_decoder_layers=2,
+        num_heads=2, pad_token_id=0, eos_token_id=1, decoder_start_token_id=0,
+    ),
+}
+
+
+def generate_corpus(num_files=20, functions_per_file=10, max_statements=40, max_depth=4, seed=0):
+    """Generates synthetic Python files with functions of varying size and nesting depth."""
+    rng = random.Random(seed)
+
+    def block(depth, budget, indent):
+        lines = []
+        while budget > 0:
+            pad = "    " * indent
+            choice = rng.random()
+            if depth < max_depth and budget > 3 and choice < 0.25:
+                kind = rng.choice(["if value_{0} > {1}:", "for item_{0} in range({1}):", "while count_{0} < {1}:"])
+                lines.append(pad + kind.format(indent, rng.randint(1, 50)))
+                inner = rng.randint(1, min(budget - 1, 6))
+                lines.extend(block(depth + 1, inner, indent + 1))
+                budget -= inner + 1
+            elif choice < 0.5:
+                lines.append(f"{pad}result_{indent} = helper_{rng.randint(0, 9)}(value_{indent}, {rng.randint(0, 99)})")
+                budget -= 1
+            elif choice < 0.7:
+                lines.append(f"{pad}# adjust the running total by a small constant")
+                lines.append(f"{pad}total += {rng.randint(1, 9)} * len(items)")
+                budget -= 1
+            else:
+                lines.append(f"{pad}print(\"step {rng.randint(0, 999)}\", total)")
+                budget -= 1
+        return lines
+
+    corpus = []
+    for file_index in range(num_files):
+        functions = []
+        for function_index in range(functions_per_file):
+            statements = rng.randint(1, max_statements)
+            args = ", ".join(f"arg_{i}" for i in range(rng.randint(0, 4)))
+            body = ["    total = 0", "    items = []", *block(0, statements, 1), "    return total"]
+            functions.append(f"def function_{file_index}_{function_index}({args}):\n"
+                             f"    \"\"\"Synthetic function {function_index}.\"\"\"\n" + "\n".join(body))
+        corpus.append((f"synthetic/module_{file_index}.py", "\n\n\n".join(functions) + "\n"))
+    return corpus
+
+
+def build_offline_tokenizer(texts, vocab_size=4000):
+    """Builds a word-level tokenizer from the corpus so no pretrained tokenizer has to be downloaded."""
+    counts = {}
+    splitter = pre_tokenizers.Whitespace()
+    for text in texts:
+        for word, _ in splitter.pre_tokenize_str(text):
+            counts[word] = counts.get(word, 0) + 1
+    words = sorted(counts, key=lambda word: (-counts[word], word))[:vocab_size - len(SPECIAL_TOKENS)]
+    vocab = {token: index for index, token in enumerate(SPECIAL_TOKENS + words)}
+    tokenizer = Tokenizer(models.WordLevel(vocab=vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = splitter
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, pad_token="<pad>", eos_token="</s>",
+                                   unk_token="<unk>", bos_token="<s>")
+
+
+def load_tiny_model(backend, vocab_size, seed=0):
+    """Creates a randomly initialized tiny seq2seq model for the given backend."""
+    torch.manual_seed(seed)
+    model = AutoModelForSeq2SeqLM.from_config(BACKENDS[backend](vocab_size))
+    model.eval()
+    return model
+
+
+def percentile(values, fraction):
+    """Returns the nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    """Returns the peak resident set size of this process in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def stage_result(latencies, items, tokens=None):
+    """Summarizes per-item latencies into throughput and percentile figures."""
+    total = sum(latencies)
+    result = {
+        "items": items,
+        "seconds": round(total, 6),
+        "items_per_sec": round(items / total, 2) if total else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+    if tokens is not None:
+        result["tokens"] = tokens
+        result["tokens_per_sec"] = round(tokens / total, 2) if total else 0.0
+    return result
+
+
+def bench_extraction(corpus):
+    functions, latencies = [], []
+    for _, code in corpus:
+        start = time.perf_counter()
+        functions.extend(extract_functions(code))
+        latencies.append(time.perf_counter() - start)
+    return functions, stage_result(latencies, len(functions))
+
+
+def bench_prompts(functions):
+    prompts, latencies = [], []
+    for name, func_code in functions:
+        start = time.perf_counter()
+        prompts.append(build_prompt(name, func_code))
+        latencies.append(time.perf_counter() - start)
+    return prompts, stage_result(latencies, len(prompts))
+
+
+def bench_tokenization(tokenizer, prompts, max_input_tokens):
+    encoded, latencies, tokens = [], [], 0
+    for prompt in prompts:
+        start = time.perf_counter()
+        inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=max_input_tokens)
+        latencies.append(time.perf_counter() - start)
+        tokens += inputs["input_ids"].shape[1]
+        encoded.append(inputs)
+    return encoded, stage_result(latencies, len(encoded), tokens)
+
+
+def bench_generation(model, encoded, lengths):
+    """Generates for each input with its own (min_new_tokens, max_new_tokens)."""
+    latencies, generated = [], 0
+    with torch.inference_mode():
+        for inputs, (min_new_tokens, max_new_tokens) in zip(encoded, lengths):
+            start = time.perf_counter()
+            output = model.generate(**inputs, min_new_tokens=min_new_tokens, max_new_tokens=max_new_tokens,
+                                    num_beams=1, do_sample=False)
+            latencies.append(time.perf_counter() - start)
+            generated += output.shape[1] - 1
+    result = stage_result(latencies, len(encoded), generated)
+    result["decode_steps"] = generated
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def bench_backend(backend, args, corpus, generation_prompts, fixed_lengths, adaptive_lengths=None):
+    """Benchmarks tokenization and generation for one backend; run in its own process so peak RSS is its own."""
+    torch.set_num_threads(args.threads)
+    tokenizer = build_offline_tokenizer(code for _, code in corpus)
+    model = load_tiny_model(backend, len(tokenizer), args.seed)
+    encoded, tokenization = bench_tokenization(tokenizer, generation_prompts, args.max_input_tokens)
+    generation = bench_generation(model, encoded, fixed_lengths)
+    stages = {"tokenize": tokenization, "generate": generation}
+    if adaptive_lengths is not None:
+        adaptive = bench_generation(model, encoded, adaptive_lengths)
+        adaptive["decode_steps_saved"] = generation["decode_steps"] - adaptive["decode_steps"]
+        stages["generate_adaptive"] = adaptive
+    if args.compile:
+        start = time.perf_counter()
+        compile_model(model, args.compile, args.buckets, tokenizer.pad_token_id)
+        warmup_seconds = warm_up(model)
+        compiled = bench_generation(model, encoded, fixed_lengths)
+        compiled["setup_seconds"] = round(time.perf_counter() - start - compiled["seconds"], 3)
+        compiled["warmup_seconds"] = round(warmup_seconds, 3)
+        compiled["speedup"] = round(generation["seconds"] / compiled["seconds"], 3) if compiled["seconds"] else 0.0
+        stages["generate_compiled"] = compiled
+    return stages
+
+
+def run_benchmark(args):
+    """Runs every stage over a synthetic corpus and returns the results as a dict."""
+    random.seed(args.seed)
+    torch.set_num_threads(args.threads)
+    corpus = generate_corpus(args.files, args.functions_per_file, args.max_statements, args.max_depth, args.seed)
+
+    functions, extraction = bench_extraction(corpus)
+    prompts, prompt_building = bench_prompts(functions)
+    generation_prompts = prompts[:args.generate_limit] if args.generate_limit else prompts
+    fixed_lengths = [(args.min_new_tokens, args.max_new_tokens)] * len(generation_prompts)
+    adaptive_lengths = None
+    if args.adaptive_length:
+        policy = LengthPolicy.load(args.length_policy)
+        adaptive_lengths = [policy.lengths(func_code, args.max_new_tokens)
+                            for _, func_code in functions[:len(generation_prompts)]]
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "transformers": transformers.__version__,
+            "machine": platform.machine(),
+            "threads": args.threads,
+            "args": vars(args),
+        },
+        "corpus": {"files": len(corpus), "functions": len(functions),
+                   "bytes": sum(len(code) for _, code in corpus)},
+        "extract": extraction,
+        "prompt": prompt_building,
+        "backends": {},
+    }
+    for backend in args.backends:
+        # A fresh process per backend, so each one's peak RSS excludes the models loaded before it
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            results["backends"][backend] = executor.submit(bench_backend, backend, args, corpus, generation_prompts,
+                                                           fixed_lengths, adaptive_lengths).result()
+    return results
+
+
+def save_results(results, output_dir=RESULTS_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = results["meta"]["timestamp"].replace(":", "").replace("-", "")
+    path = os.path.join(output_dir, f"{stamp}_{results['meta']['commit']}.json")
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2)
+    return path
+
+
+def flatten(results, prefix=""):
+    """Flattens nested numeric results into {"a.b.c": value} for comparison."""
+    flat = {}
+    for key, value in results.items():
+        if key == "meta":
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare_results(baseline_path, candidate_path):
+    """Prints the relative change of every metric between two result files."""
+    with open(baseline_path) as file:
+        baseline = flatten(json.load(file))
+    with open(candidate_path) as file:
+        candidate = flatten(json.load(file))
+    print(f"{'metric':<45}{'baseline':>14}{'candidate':>14}{'change':>10}")
+    for name in sorted(set(baseline) & set(candidate)):
+        old, new = baseline[name], candidate[name]
+        change = f"{(new - old) / old:+.1%}" if old else "n/a"
+        print(f"{name:<45}{old:>14}{new:>14}{change:>10}")
+
+
+def print_results(results):
+    corpus = results["corpus"]
+    print(f"Corpus: {corpus['files']} files, {corpus['functions']} functions, {corpus['bytes']} bytes")
+    rows = [("extract", results["extract"]), ("prompt", results["prompt"])]
+    for backend, stages in results["backends"].items():
+        rows.extend((f"{backend}/{stage}", result) for stage, result in stages.items())
+    print(f"{'stage':<24}{'items/s':>12}{'tokens/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'peak MB':>10}")
+    for name, result in rows:
+        tokens_per_sec = result.get("tokens_per_sec", "")
+        print(f"{name:<24}{result['items_per_sec']:>12}{tokens_per_sec:>12}{result['p50_ms']:>10}"
+              f"{result['p95_ms']:>10}{result['peak_rss_mb']:>10}")
+    for backend, stages in results["backends"].items():
+        if "generate_adaptive" in stages:
+            fixed, adaptive = stages["generate"], stages["generate_adaptive"]
+            print(f"{backend}: adaptive length decoded {adaptive['decode_steps']} steps vs {fixed['decode_steps']} "
+                  f"fixed ({adaptive['decode_steps_saved']} saved, {fixed['seconds']:.2f}s -> {adaptive['seconds']:.2f}s)")
+        if "generate_compiled" in stages:
+            eager, compiled = stages["generate"], stages["generate_compiled"]
+            print(f"{backend}: compiled generation {eager['seconds']:.2f}s -> {compiled['seconds']:.2f}s "
+                  f"({compiled['speedup']:.2f}x, p95 {eager['p95_ms']:.0f} -> {compiled['p95_ms']:.0f} ms) after "
+                  f"{compiled['setup_seconds']:.1f}s compiling and warming up")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark for extraction, tokenization and generation")
+    parser.add_argument("--files", type=int, default=20, help="Number of synthetic files")
+    parser.add_argument("--functions_per_file", type=int, default=10, help="Functions per synthetic file")
+    parser.add_argument("--max_statements", type=int, default=40, help="Maximum statements per function")
+    parser.add_argument("--max_depth", type=int, default=4, help="Maximum block nesting depth")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS.keys(), default=list(BACKENDS.keys()),
+                        help="Tiny seq2seq backends to benchmark")
+    parser.add_argument("--generate_limit", type=int, default=50, help="Functions to generate for (0 = all)")
+    parser.add_argument("--max_input_tokens", type=int, default=512, help="Input truncation length")
+    parser.add_argument("--min_new_tokens", type=int, default=30, help="Minimum generated tokens")
+    parser.add_argument("--max_new_tokens", type=int, default=100, help="Maximum generated tokens")
+    parser.add_argument("--adaptive_length", action="store_true",
+                        help="Also generate with per-function lengths from the length policy and report steps saved")
+    parser.add_argument("--length_policy", help="Calibrated length policy JSON for --adaptive_length")
+    add_compile_arguments(parser)
+    parser.add_argument("--threads", type=int, default=1, help="Torch intra-op threads")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for corpus and weights")
+    parser.add_argument("--output_dir", default=RESULTS_DIR, help="Directory for JSON results")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"),
+                        help="Compare two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+    else:
+        results = run_benchmark(args)
+        print_results(results)
+        print(f"Results written to {save_results(results, args.output_dir)}")
+
+# Usage examples:
+# python benchmark.py --files 20 --functions_per_file 10 --backends bart-tiny t5-tiny
+# python benchmark.py --generate_limit 50 --adaptive_length
+# python benchmark.py --generate_limit 50 --compile inductor --buckets 64 128 256 512
+# python benchmark.py --compare bench_results/old.json bench_results/new.json
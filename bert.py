@@ -5,6 +5,11 @@ import argparse
 
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
 
+from length_policy import LengthPolicy
+
+# Summary length follows function size instead of forcing 100-300 tokens for every chunk
+LENGTH_POLICY = LengthPolicy(ceiling=300)
+
 summarization_pipeline = pipeline("summarization",
                                   model="mrm8488/bert2bert_shared-finetuned-summarization",
                                   tokenizer="mrm8488/bert2bert_shared-finetuned-summarization")
@@ -54,7 +59,8 @@ def process_code_in_chunks(code):
     for function in functions:
         if function.strip():
             func_code = "def " + function
-            summary = summarize_code(func_code)
+            min_length, max_length = LENGTH_POLICY.lengths(func_code)
+            summary = summarize_code(func_code, max_length, min_length)
             summaries.append(summary)
     return "\n\n".join(summaries)
 
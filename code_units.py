@@ -0,0 +1,116 @@
+import ast
+import re
+import textwrap
+
+
+def _signature(node):
+    """Builds a one-line `def name(args) -> returns` signature for a function node."""
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    signature = f"{prefix} {node.name}({ast.unparse(node.args)})"
+    if node.returns is not None:
+        signature += f" -> {ast.unparse(node.returns)}"
+    return signature
+
+
+def extract_units(code, path=""):
+    """Extracts every function and method in the code as a dict with its source, signature and location."""
+    tree = ast.parse(code)
+    units = []
+    seen = {}
+
+    def visit(node, scope):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                qualname = ".".join(scope + [child.name])
+                seen[qualname] = seen.get(qualname, 0) + 1
+                if seen[qualname] > 1:
+                    qualname = f"{qualname}#{seen[qualname]}"
+                units.append({
+                    "id": f"{path}::{qualname}" if path else qualname,
+                    "path": path,
+                    "name": child.name,
+                    "qualname": qualname,
+                    "code": ast.get_source_segment(code, child),
+                    "args": [arg.arg for arg in child.args.args],
+                    "signature": _signature(child),
+                    "docstring": ast.get_docstring(child),
+                    "lineno": child.lineno,
+                    "end_lineno": child.end_lineno,
+                    "node": child,
+                })
+                visit(child, scope + [child.name])
+            elif isinstance(child, ast.ClassDef):
+                visit(child, scope + [child.name])
+            else:
+                visit(child, scope)
+
+    visit(tree, [])
+    return units
+
+
+def parse_function_code(func_code):
+    """Parses a function's source segment, which may still carry the indentation of its enclosing class."""
+    try:
+        return ast.parse(func_code)
+    except SyntaxError:
+        return ast.parse(textwrap.dedent(func_code))
+
+
+def signature_of(func_code):
+    """Returns the one-line signature of a function's source, or its first line if it doesn't parse."""
+    try:
+        node = parse_function_code(func_code).body[0]
+    except (SyntaxError, IndexError):
+        return func_code.strip().split("\n")[0]
+    if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return func_code.strip().split("\n")[0]
+    return _signature(node)
+
+
+def estimate_tokens(text):
+    """Roughly estimates the number of model tokens in a piece of text (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+# Node types that add a decision point for cyclomatic complexity
+_BRANCH_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler,
+                 ast.Assert, ast.comprehension, ast.match_case)
+# Statement types that open a nested block
+_BLOCK_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try,
+                ast.Match, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def code_tokens(text):
+    """Splits source text into identifier/number words and single punctuation characters."""
+    return _TOKEN_PATTERN.findall(text)
+
+
+def _nesting_depth(node, depth=0):
+    deepest = depth
+    for child in ast.iter_child_nodes(node):
+        child_depth = depth + 1 if isinstance(child, _BLOCK_NODES) else depth
+        deepest = max(deepest, _nesting_depth(child, child_depth))
+    return deepest
+
+
+def function_features(func_code, node=None):
+    """Computes cheap size and complexity features for a function's source."""
+    if node is None:
+        node = parse_function_code(func_code).body[0]
+    statements = 0
+    complexity = 1
+    for child in ast.walk(node):
+        if child is not node and isinstance(child, ast.stmt):
+            statements += 1
+        if isinstance(child, _BRANCH_NODES):
+            complexity += 1
+        elif isinstance(child, ast.BoolOp):
+            complexity += len(child.values) - 1
+    return {
+        "statements": statements,
+        "complexity": complexity,
+        "tokens": len(code_tokens(func_code)),
+        "depth": _nesting_depth(node),
+        "lines": func_code.count("\n") + 1,
+    }
@@ -3,36 +3,74 @@ import base64
 import requests
 import argparse
 import ast
+import time
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
 
-# Dictionary of available models with their specifications
+import metrics
+import profiling
+from dedup import Deduplicator
+from near_dup import NearDuplicateSummarizer, index_from_args
+from fast_path import DOCSTRING_POLICIES, FastPath
+from journal import add_journal_arguments, journal_from_args
+from anytime import format_partial_docs, summarize_until
+from code_units import extract_units
+from length_policy import AdaptiveLength, LengthPolicy
+from source_scan import FileIndex, scan_source_files
+from summary_store import SummaryStore
+from rollup import Rollup
+from github_graphql import GraphQLBlobFetcher, add_graphql_arguments, sparse_paths
+from git_objects import GitRepository
+from watch import watch
+from model_router import ModelRouter, load_tiers
+from compiled import DEFAULT_BUCKETS, add_compile_arguments, compile_pipeline
+
+# Dictionary of available models with their specifications ("params" is the approximate size in millions)
 AVAILABLE_MODELS = {
     "bart": {
         "name": "facebook/bart-large-cnn",
-        "type": "summarization"
+        "type": "summarization",
+        "params": 406
     },
     "t5": {
         "name": "google/flan-t5-base",
-        "type": "text2text-generation"
+        "type": "text2text-generation",
+        "params": 248
+    },
+    "codet5-small": {
+        "name": "Salesforce/codet5-small",
+        "type": "text2text-generation",
+        "params": 60
     },
     "codet5": {
         "name": "Salesforce/codet5-base",
-        "type": "text2text-generation"
+        "type": "text2text-generation",
+        "params": 220
+    },
+    "codet5-large": {
+        "name": "Salesforce/codet5-large",
+        "type": "text2text-generation",
+        "params": 770
     },
     "codebert": {
         "name": "microsoft/codebert-base",
-        "type": "text2text-generation"
+        "type": "text2text-generation",
+        "params": 125
     }
 }
 
+# Overridable so the fetch path can run against a local stand-in (see github_stub_server.py)
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+
 def get_github_file_content(owner, repo, filepath, branch="main"):
     """Fetches the content of a file from a GitHub repository."""
-    url = f"https://api.github.com/repos/{owner}/{repo}/contents/{filepath}?ref={branch}"
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/contents/{filepath}?ref={branch}"
     headers = {}
     token = os.getenv("GITHUB_TOKEN")
     if token:
         headers["Authorization"] = f"token {token}"
-    response = requests.get(url, headers=headers)
+    with metrics.stage("fetch") as stage:
+        response = requests.get(url, headers=headers)
+        stage.add(bytes=len(response.content))
     if response.status_code == 200:
         file_data = response.json()
         if file_data["type"] == "file":
@@ -45,9 +83,11 @@ def get_github_file_content(owner, repo, filepath, branch="main"):
 
 def get_github_files_in_directory(owner, repo, directory_path, branch="main"):
     """Recursively fetches all Python files in a GitHub directory."""
-    url = f"https://api.github.com/repos/{owner}/{repo}/contents/{directory_path}?ref={branch}"
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/contents/{directory_path}?ref={branch}"
     headers = {"Authorization": f"token {os.getenv('GITHUB_TOKEN')}"}
-    response = requests.get(url, headers=headers)
+    with metrics.stage("fetch") as stage:
+        response = requests.get(url, headers=headers)
+        stage.add(bytes=len(response.content))
     files = []
     if response.status_code == 200:
         contents = response.json()
@@ -59,51 +99,81 @@ def get_github_files_in_directory(owner, repo, directory_path, branch="main"):
     return files
 
 def get_local_files_in_directory(directory_path):
-    """Recursively fetches all Python files in a local directory."""
-    files = []
-    for root, _, filenames in os.walk(directory_path):
-        for filename in filenames:
-            if filename.endswith(".py"):
-                files.append(os.path.join(root, filename))
-    return files
+    """Recursively fetches all Python files in a local directory, skipping .gitignore'd and vendored paths."""
+    return scan_source_files(directory_path)
 
-def initialize_model(model_choice):
-    """Initialize the selected model pipeline."""
+def initialize_model(model_choice, compile_backend=None, buckets=DEFAULT_BUCKETS):
+    """Initialize the selected model pipeline, compiled and warmed up if `compile_backend` is given."""
     if model_choice not in AVAILABLE_MODELS:
         raise ValueError(f"Model {model_choice} not supported. Available models: {', '.join(AVAILABLE_MODELS.keys())}")
 
     model_info = AVAILABLE_MODELS[model_choice]
-    return pipeline(
+    summarization_pipeline = pipeline(
         model_info["type"],
         model=model_info["name"],
         tokenizer=model_info["name"]
     )
+    metrics.instrument_pipeline(summarization_pipeline)
+    if compile_backend:
+        compile_pipeline(summarization_pipeline, compile_backend, buckets)
+    return summarization_pipeline
 
 def extract_functions(code):
     """Extracts functions and their signatures from the code."""
-    tree = ast.parse(code)
+    with metrics.stage("parse") as stage:
+        tree = ast.parse(code)
+        stage.add(bytes=len(code))
     functions = []
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            func_code = ast.get_source_segment(code, node)
-            functions.append((node.name, func_code))
+    with metrics.stage("extract"):
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef):
+                func_code = ast.get_source_segment(code, node)
+                functions.append((node.name, func_code))
     return functions
 
+def build_prompt(name, func_code):
+    """Builds the summarization prompt for a single function."""
+    return f"Summarize this Python function: {name}\nCode:\n{func_code}\nSummary:"
+
 def summarize_function(name, func_code, pipeline_model, max_length=100, min_length=30):
     """Generates a summary for a single function using the selected model."""
-    prompt = f"Summarize this Python function: {name}\nCode:\n{func_code}\nSummary:"
+    return generate_summary(build_prompt(name, func_code), pipeline_model, max_length, min_length, name)
+
+def summarize_batch(functions, pipeline_model, max_length=100, min_length=30):
+    """Summarizes a list of (name, func_code) in one padded generate call; returns the summaries in order."""
+    prompts = [build_prompt(name, func_code) for name, func_code in functions]
+    if metrics.enabled():
+        with metrics.stage("tokenize") as stage:
+            stage.add(tokens_in=sum(len(ids) for ids in pipeline_model.tokenizer(prompts)["input_ids"]))
+    key = "summary_text" if getattr(pipeline_model, 'task', None) == "summarization" else "generated_text"
+    with metrics.stage("generate"), profiling.summarizing(f"batch of {len(prompts)}"):
+        result = pipeline_model(prompts, max_length=max_length, min_length=min_length, batch_size=len(prompts))
+    summaries = [item[key] if isinstance(item, dict) else item[0][key] for item in result]
+    if metrics.enabled():
+        metrics.count("generate", tokens_out=sum(len(ids) for ids in pipeline_model.tokenizer(summaries)["input_ids"]))
+    return summaries
+
+def generate_summary(prompt, pipeline_model, max_length=100, min_length=30, name="rollup"):
+    """Runs one summarization prompt through the pipeline, recording metrics and profiling under `name`."""
+    if metrics.enabled():
+        # The pipeline tokenizes internally; this pass only measures that cost and the input size
+        with metrics.stage("tokenize") as stage:
+            stage.add(tokens_in=len(pipeline_model.tokenizer(prompt)["input_ids"]))
 
-    # Check the task type directly
-    if hasattr(pipeline_model, 'task'):
-        if pipeline_model.task == "summarization":
+    with metrics.stage("generate"), profiling.summarizing(name):
+        # Check the task type directly
+        if getattr(pipeline_model, 'task', None) == "summarization":
             result = pipeline_model([prompt], max_length=max_length, min_length=min_length)
-            return result[0]['summary_text']
+            summary = result[0]['summary_text']
         else:
             result = pipeline_model(prompt, max_length=max_length, min_length=min_length)
-            return result[0]['generated_text']
-    return pipeline_model(prompt, max_length=max_length, min_length=min_length)[0]['generated_text']
+            summary = result[0]['generated_text']
+    if metrics.enabled():
+        metrics.count("generate", tokens_out=len(pipeline_model.tokenizer(summary)["input_ids"]))
+    return summary
 
 if __name__ == "__main__":
+    started_at = time.monotonic()
     parser = argparse.ArgumentParser(description="Summarize Python code files from local path or GitHub")
     parser.add_argument("--model", choices=AVAILABLE_MODELS.keys(), default="bart",
                         help="Choose the model to use for summarization")
@@ -114,42 +184,278 @@ if __name__ == "__main__":
     parser.add_argument("--filepath", default="src/sample", help="File or directory path in the GitHub repository")
     parser.add_argument("--branch", default="main", help="GitHub branch")
     parser.add_argument("--max_length", type=int, default=100, help="Maximum length of the summary")
+    parser.add_argument("--git", metavar="REPOSITORY",
+                        help="Read sources from this bare or normal git repository at --branch (comma-separated "
+                             "for several refs) straight from its object database")
+    parser.add_argument("--git_prefix", default="", help="With --git, only summarize files under this directory")
+    parser.add_argument("--route", action="store_true",
+                        help="Route each function to the cheapest model tier that fits its complexity")
+    parser.add_argument("--route_config", help="JSON file with routing tiers (defaults to model_router.DEFAULT_TIERS)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Summarize each distinct function body once and reuse the summary for its copies")
+    parser.add_argument("--dedup_names", action="store_true",
+                        help="With --dedup, also treat functions that differ only in identifier names as copies")
+    parser.add_argument("--near_dup", type=float, metavar="THRESHOLD",
+                        help="Reuse the summary of an earlier near-clone with at least this MinHash similarity")
+    parser.add_argument("--near_dup_index", help="Load/save the near-clone index here to reuse summaries across runs")
+    parser.add_argument("--near_dup_adapt", action="store_true",
+                        help="Swap the near-clone's name for the function's own name in reused summaries")
+    parser.add_argument("--adaptive_length", action="store_true",
+                        help="Pick min/max summary length per function from its size and complexity")
+    parser.add_argument("--length_policy", help="Calibrated length policy JSON (implies --adaptive_length)")
+    parser.add_argument("--deadline", type=float, metavar="SECONDS",
+                        help="Summarize the most important functions first and stop before this many seconds")
+    parser.add_argument("--fast_path", action="store_true",
+                        help="Answer trivial functions and well-documented ones by rule instead of the model")
+    parser.add_argument("--docstring_policy", choices=DOCSTRING_POLICIES, default="good",
+                        help="With --fast_path, which existing docstrings to reuse as the summary")
+    parser.add_argument("--watch", action="store_true",
+                        help="With --local, keep the model loaded and re-summarize functions as files change")
+    parser.add_argument("--watch_output", help="With --watch, keep this Markdown file up to date instead of printing")
+    parser.add_argument("--scan_index", help="With --local, skip files unchanged since they were recorded in this index")
+    parser.add_argument("--store", help="Also save summaries to this SQLite full-text store (see summary_store.py)")
+    parser.add_argument("--rollup", metavar="OUTPUT",
+                        help="Also build module and package summaries from the function summaries into this Markdown file")
+    parser.add_argument("--metrics_dir", help="Collect per-stage metrics and write Prometheus/JSON reports here")
+    add_graphql_arguments(parser)
+    add_journal_arguments(parser)
+    add_compile_arguments(parser)
+    profiling.add_profile_arguments(parser)
     args = parser.parse_args()
+    if args.deadline is not None:
+        # Partial runs report what they skipped instead of recording it
+        unsupported = [option for option in ("journal", "store", "rollup") if getattr(args, option)]
+        if unsupported:
+            parser.error(f"--deadline can't be combined with {', '.join('--' + option for option in unsupported)}")
+    journal = journal_from_args(parser, args)
+    scan_index = FileIndex(args.scan_index) if args.scan_index else None
+    store = SummaryStore(args.store) if args.store else None
+    repo_label = f"{args.owner}/{args.repo}" if args.github else os.path.abspath(args.git or args.local or ".")
 
-    try:
-        summarization_pipeline = initialize_model(args.model)
-
-        if args.github:
-            code_content = get_github_file_content(args.owner, args.repo, args.filepath, args.branch)
-            if code_content:
-                functions = extract_functions(code_content)
-                summaries = [summarize_function(name, func_code, summarization_pipeline, args.max_length)
-                             for name, func_code in functions]
-                print(f"Summary of {args.filepath} from {args.owner}/{args.repo}:")
-                print("\n\n".join(summaries))
+    if args.metrics_dir:
+        metrics.enable()
+
+    with profiling.profiler_from_args(args):
+        try:
+            router = None
+            if args.route:
+                load_model = lambda model_choice: initialize_model(model_choice, args.compile, args.buckets)
+                router = ModelRouter(AVAILABLE_MODELS, load_model, summarize_function, load_tiers(args.route_config))
+                summarize = router.summarize
             else:
-                print("Failed to fetch the file from GitHub")
+                summarization_pipeline = initialize_model(args.model, args.compile, args.buckets)
+
+                def summarize(name, func_code, max_length, min_length=30):
+                    return summarize_function(name, func_code, summarization_pipeline, max_length, min_length)
+
+            adaptive_length = None
+            if args.adaptive_length or args.length_policy:
+                adaptive_length = AdaptiveLength(summarize, LengthPolicy.load(args.length_policy))
+                summarize = adaptive_length.summarize
 
-        elif args.local:
-            if os.path.isdir(args.local):
-                files = get_local_files_in_directory(args.local)
-            elif os.path.isfile(args.local) and args.local.endswith(".py"):
-                files = [args.local]
+            near_dup = None
+            if args.near_dup is not None:
+                near_dup = NearDuplicateSummarizer(summarize, index_from_args(args), args.near_dup_adapt)
+                summarize = near_dup.summarize
+
+            deduplicator = None
+            if args.dedup or args.dedup_names:
+                deduplicator = Deduplicator(summarize, ignore_names=args.dedup_names)
+                summarize = deduplicator.summarize
+
+            fast_path = None
+            if args.fast_path:
+                fast_path = FastPath(summarize, args.docstring_policy)
+                summarize = fast_path.summarize
+            # Tags each summary with what produced it, for the journal and the store
+            source_of = fast_path.source_of if fast_path is not None else None
+
+            rollup = None
+            if args.rollup:
+                # File and package summaries go to the largest model, which handles the longer digests best
+                text_pipeline = router.get_pipeline(router.tiers[-1]["model"]) if router else summarization_pipeline
+                rollup = Rollup(lambda prompt, max_length: generate_summary(prompt, text_pipeline, max_length))
+
+            if args.deadline is not None:
+                if args.github:
+                    code_content = get_github_file_content(args.owner, args.repo, args.filepath, args.branch)
+                    sources = [(args.filepath, code_content)] if code_content else []
+                elif args.local:
+                    sources = []
+                    for filepath in scan_source_files(args.local):
+                        with open(filepath, 'r') as file:
+                            sources.append((filepath, file.read()))
+                else:
+                    sources = []
+                units = [unit for filepath, code_content in sources for unit in extract_units(code_content, filepath)]
+                summaries, skipped = summarize_until(
+                    units, lambda name, func_code: summarize(name, func_code, args.max_length),
+                    args.deadline, started_at)
+                with metrics.stage("output"):
+                    print(format_partial_docs(units, summaries, skipped))
+
+            elif args.git:
+                repository = GitRepository(args.git)
+                refs = [ref.strip() for ref in args.branch.split(",") if ref.strip()]
+                # Files unchanged between refs are the same blob; their summaries are reused by blob sha
+                blob_summaries = {}
+                try:
+                    for ref in refs:
+                        for filepath, blob_sha, code_content in repository.iter_sources(ref, args.git_prefix):
+                            key = f"{ref}:{filepath}"
+                            if journal.file_done(key):
+                                functions, summaries = extract_functions(code_content), journal.file_summaries(key)
+                            elif blob_sha in blob_summaries:
+                                functions, summaries = blob_summaries[blob_sha]
+                                metrics.count("generate", cache_hits=len(summaries))
+                            else:
+                                functions = extract_functions(code_content)
+                                summaries = journal.summarize_file(
+                                    key, functions, lambda function: summarize(*function, args.max_length), source_of)
+                                blob_summaries[blob_sha] = (functions, summaries)
+                            if store is not None:
+                                store.record_file(f"{repo_label}@{ref}", filepath, functions, summaries,
+                                                  journal.file_sources(key, functions, source_of))
+                            if rollup is not None:
+                                rollup.add_functions(f"{ref}/{filepath}" if len(refs) > 1 else filepath,
+                                                     code_content, functions, summaries)
+                            with metrics.stage("output"):
+                                print(f"Summary of {filepath} at {ref}:")
+                                print("\n\n".join(summaries))
+                finally:
+                    repository.close()
+
+            elif args.github and args.graphql:
+                paths, sizes = sparse_paths(args, args.filepath)
+                # --store and --rollup need the source of resumed files too; their summaries still come from the journal
+                refetch = store is not None or rollup is not None
+                for filepath in paths:
+                    if journal.file_done(filepath) and not refetch:
+                        with metrics.stage("output"):
+                            print(f"Summary of {filepath} from {args.owner}/{args.repo}:")
+                            print("\n\n".join(journal.file_summaries(filepath)))
+                fetcher = GraphQLBlobFetcher(args.owner, args.repo, args.branch, batch_size=args.graphql_batch)
+                pending = paths if refetch else [path for path in paths if not journal.file_done(path)]
+                for filepath, code_content in fetcher.fetch(pending, sizes):
+                    if not code_content:
+                        continue
+                    functions = extract_functions(code_content)
+                    summaries = journal.summarize_file(
+                        filepath, functions, lambda function: summarize(*function, args.max_length), source_of)
+                    if store is not None:
+                        store.record_file(repo_label, filepath, functions, summaries,
+                                          journal.file_sources(filepath, functions, source_of))
+                    if rollup is not None:
+                        rollup.add_functions(filepath, code_content, functions, summaries)
+                    with metrics.stage("output"):
+                        print(f"Summary of {filepath} from {args.owner}/{args.repo}:")
+                        print("\n\n".join(summaries))
+                print(fetcher.report())
+
+            elif args.github:
+                summaries = None
+                if journal.file_done(args.filepath) and store is None and rollup is None:
+                    summaries = journal.file_summaries(args.filepath)
+                else:
+                    code_content = get_github_file_content(args.owner, args.repo, args.filepath, args.branch)
+                    if code_content:
+                        functions = extract_functions(code_content)
+                        summaries = journal.summarize_file(
+                            args.filepath, functions, lambda function: summarize(*function, args.max_length),
+                            source_of)
+                        if store is not None:
+                            store.record_file(repo_label, args.filepath, functions, summaries,
+                                              journal.file_sources(args.filepath, functions, source_of))
+                        if rollup is not None:
+                            rollup.add_functions(args.filepath, code_content, functions, summaries)
+                if summaries is not None:
+                    with metrics.stage("output"):
+                        print(f"Summary of {args.filepath} from {args.owner}/{args.repo}:")
+                        print("\n\n".join(summaries))
+                else:
+                    print("Failed to fetch the file from GitHub")
+
+            elif args.local and args.watch:
+                watch(args.local, lambda name, func_code: summarize(name, func_code, args.max_length),
+                      args.watch_output)
+
+            elif args.local:
+                if os.path.isdir(args.local):
+                    files = get_local_files_in_directory(args.local)
+                elif os.path.isfile(args.local) and args.local.endswith(".py"):
+                    files = [args.local]
+                else:
+                    print(f"Invalid local path: {args.local}")
+                    files = []
+                if scan_index is not None:
+                    files = scan_index.changed(files)
+                    print(f"{len(files)} changed files to summarize")
+
+                for filepath in files:
+                    with open(filepath, 'r') as file:
+                        code_content = file.read()
+                    functions = extract_functions(code_content)
+                    # Journaled functions come back without calling the model, so resumed files reach the store too
+                    summaries = journal.summarize_file(
+                        filepath, functions, lambda function: summarize(*function, args.max_length), source_of)
+                    if store is not None:
+                        store.record_file(repo_label, filepath, functions, summaries,
+                                          journal.file_sources(filepath, functions, source_of))
+                    if rollup is not None:
+                        rollup.add_functions(filepath, code_content, functions, summaries)
+                    with metrics.stage("output"):
+                        print(f"Summary of local file {filepath}:")
+                        print("\n\n".join(summaries))
+                    if scan_index is not None:
+                        scan_index.mark(filepath)
             else:
-                print(f"Invalid local path: {args.local}")
-                files = []
-
-            for filepath in files:
-                with open(filepath, 'r') as file:
-                    code_content = file.read()
-                functions = extract_functions(code_content)
-                summaries = [summarize_function(name, func_code, summarization_pipeline, args.max_length)
-                             for name, func_code in functions]
-                print(f"Summary of local file {filepath}:")
-                print("\n\n".join(summaries))
-        else:
-            print("Please specify either --github or --local to proceed")
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
+                print("Please specify either --github or --local to proceed")
+
+            if rollup is not None:
+                rollup.build_packages(args.local if args.local and os.path.isdir(args.local) else None)
+                rollup.write(args.rollup)
+                print(rollup.report())
+            if router is not None:
+                print(router.report())
+            if adaptive_length is not None:
+                print(adaptive_length.report())
+            if fast_path is not None:
+                print(fast_path.report())
+            if deduplicator is not None:
+                print(deduplicator.report())
+            if near_dup is not None:
+                print(near_dup.report())
+                if args.near_dup_index:
+                    near_dup.index.save(args.near_dup_index)
+        except Exception as e:
+            print(f"An error occurred: {str(e)}")
+            if args.journal:
+                print(f"Completed work is saved in {args.journal}; rerun with --resume to continue")
+        finally:
+            journal.close()
+            if scan_index is not None:
+                scan_index.save()
+            if store is not None:
+                store.close()
+            if args.metrics_dir:
+                metrics.print_summary()
+                metrics.write_reports(args.metrics_dir)
 
-#usage python cody_docu.py --local input.py --model t5
\ No newline at end of file
+#usage python cody_docu.py --local input.py --model t5
+#usage python cody_docu.py --local path/to/project --route
+#usage python cody_docu.py --local path/to/project --dedup --dedup_names
+#usage python cody_docu.py --local path/to/project --near_dup 0.8 --near_dup_index near_dup.npz
+#usage python cody_docu.py --local path/to/project --journal run.journal --resume
+#usage python cody_docu.py --local path/to/project --fast_path --docstring_policy any
+#usage python cody_docu.py --local path/to/project --scan_index .scan_index.json
+#usage python cody_docu.py --local path/to/project --watch --watch_output DOCS.md --model codet5-small
+#usage python cody_docu.py --local path/to/project --store summaries.db
+#usage python cody_docu.py --local path/to/project --rollup ARCHITECTURE.md
+#usage python cody_docu.py --git /srv/mirrors/pip.git --branch main,release/24.0 --git_prefix src/pip
+#usage python cody_docu.py --github --owner pypa --repo pip --filepath src/pip/_internal/cli --graphql
+#usage python cody_docu.py --github --owner pypa --repo pip --graphql --paths_from changed.txt
+#usage python cody_docu.py --local path/to/project --deadline 600
+#usage python cody_docu.py --local path/to/project --length_policy length_policy.json
+#usage python cody_docu.py --local path/to/project --metrics_dir run_metrics
+#usage python cody_docu.py --local path/to/project --profile run_profile --profile_torch
+#usage python cody_docu.py --local path/to/project --watch --compile inductor --buckets 128 256 512
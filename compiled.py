@@ -0,0 +1,249 @@
+import os
+import re
+import time
+import hashlib
+import argparse
+
+COMPILE_BACKENDS = ("inductor", "torchscript")
+DEFAULT_BUCKETS = (64, 128, 256, 512)
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "cody_docu", "compiled")
+
+
+def bucket_for(length, buckets):
+    """Returns the smallest bucket that fits `length`, or None if it is longer than every bucket."""
+    for bucket in buckets:
+        if length <= bucket:
+            return bucket
+    return None
+
+
+def pad_to_bucket(input_ids, attention_mask, buckets, pad_token_id):
+    """Right-pads a batch to its bucket length so compiled graphs only ever see a few shapes."""
+    import torch
+
+    bucket = bucket_for(input_ids.shape[1], buckets)
+    if bucket is None or bucket == input_ids.shape[1]:
+        return input_ids, attention_mask
+    extra = bucket - input_ids.shape[1]
+    input_ids = torch.nn.functional.pad(input_ids, (0, extra), value=pad_token_id)
+    attention_mask = torch.nn.functional.pad(attention_mask, (0, extra), value=0)
+    return input_ids, attention_mask
+
+
+def _model_key(model):
+    """Hash of a model's config, weights and torch version that names its cached traces."""
+    import torch
+
+    # Traces bake the weights in, so a checkpoint updated in place (or a fresh random init) must not hit an old one
+    with torch.no_grad():
+        weights = sum(float(parameter.float().sum()) for parameter in model.parameters())
+    return hashlib.sha1(f"{model.config.to_json_string()}{weights!r}{torch.__version__}".encode()).hexdigest()[:12]
+
+
+def _artifact_path(model, key, bucket, cache_dir):
+    """Cache file for one traced bucket of the model with `key`."""
+    name = re.sub(r"[^\w.-]", "_", model.config._name_or_path or type(model).__name__)
+    return os.path.join(cache_dir, f"{name}-{key}-encoder-{bucket}.pt")
+
+
+def _trace_encoder(model, buckets, cache_dir):
+    """Traces the encoder once per bucket, reusing traces saved by earlier runs; returns {length: module}."""
+    import torch
+
+    class EncoderStates(torch.nn.Module):
+        """The encoder as (input_ids, attention_mask) -> last hidden state, which TorchScript can trace."""
+
+        def __init__(self, encoder):
+            super().__init__()
+            self.encoder = encoder
+
+        def forward(self, input_ids, attention_mask):
+            return self.encoder(input_ids=input_ids, attention_mask=attention_mask, return_dict=False)[0]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    wrapper = EncoderStates(model.get_encoder()).eval()
+    # Summing every parameter is a full pass over the weights, so it is done once rather than per bucket
+    key = _model_key(model)
+    traced = {}
+    for bucket in buckets:
+        path = _artifact_path(model, key, bucket, cache_dir)
+        if os.path.exists(path):
+            traced[bucket] = torch.jit.load(path)
+            continue
+        example = (torch.ones(1, bucket, dtype=torch.long), torch.ones(1, bucket, dtype=torch.long))
+        with torch.inference_mode():
+            module = torch.jit.trace(wrapper, example, strict=False, check_trace=False)
+        module = torch.jit.freeze(module.eval())
+        torch.jit.save(module, path)
+        traced[bucket] = module
+    return traced
+
+
+def _script_encoder(model, traced):
+    """Routes encoder calls whose length has a trace to it; anything else runs eagerly."""
+    from transformers.modeling_outputs import BaseModelOutput
+
+    encoder = model.get_encoder()
+    eager_forward = encoder.forward
+
+    def forward(input_ids=None, attention_mask=None, output_attentions=False, output_hidden_states=False,
+                return_dict=True, **kwargs):
+        module = traced.get(input_ids.shape[1]) if input_ids is not None else None
+        if module is None or kwargs or output_attentions or output_hidden_states or attention_mask is None:
+            return eager_forward(input_ids=input_ids, attention_mask=attention_mask, output_attentions=output_attentions,
+                                 output_hidden_states=output_hidden_states, return_dict=return_dict, **kwargs)
+        states = module(input_ids, attention_mask)
+        return BaseModelOutput(last_hidden_state=states) if return_dict else (states,)
+
+    encoder.forward = forward
+
+
+def _inductor(model, buckets, cache_dir):
+    """Compiles the encoder per bucket and the decoder step with torch.compile, caching graphs on disk."""
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.join(cache_dir, "inductor"))
+    os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+    import torch
+    import torch._dynamo
+
+    # One encoder graph per bucket plus a few decoder variants, without dynamo giving up and falling back
+    torch._dynamo.config.cache_size_limit = max(torch._dynamo.config.cache_size_limit, 2 * len(buckets) + 8)
+    encoder = model.get_encoder()
+    encoder.forward = torch.compile(encoder.forward, dynamic=False)
+    decoder = model.get_decoder()
+    # A static KV cache keeps the decoder step at one shape; otherwise its cache grows and needs dynamic shapes
+    static_cache = bool(getattr(model, "_supports_static_cache", False))
+    if static_cache:
+        model.generation_config.cache_implementation = "static"
+    decoder.forward = torch.compile(decoder.forward, dynamic=not static_cache)
+    return static_cache
+
+
+def compile_model(model, backend="inductor", buckets=DEFAULT_BUCKETS, pad_token_id=0, cache_dir=CACHE_DIR):
+    """Switches an encoder-decoder model to compiled execution in place and returns it.
+
+    Inputs are padded to the nearest of `buckets` inside `generate`, so the compiled encoder sees
+    a fixed set of shapes. "inductor" compiles the encoder and the decoder step with torch.compile;
+    "torchscript" traces and freezes the encoder for each bucket and keeps the decoder eager.
+    Traced encoders and inductor's graph cache are kept under `cache_dir` for later runs.
+    """
+    import torch
+
+    if backend not in COMPILE_BACKENDS:
+        raise ValueError(f"Unknown compile backend {backend}; use one of {', '.join(COMPILE_BACKENDS)}")
+    if not getattr(model.config, "is_encoder_decoder", False):
+        print(f"Compiled mode supports encoder-decoder models only; keeping {type(model).__name__} eager")
+        return model
+    buckets = tuple(sorted(buckets))
+    model.eval()
+    if backend == "torchscript":
+        _script_encoder(model, _trace_encoder(model, buckets, cache_dir))
+        static_cache = False
+    else:
+        static_cache = _inductor(model, buckets, cache_dir)
+
+    eager_generate = model.generate
+
+    def generate(input_ids=None, attention_mask=None, **kwargs):
+        if input_ids is not None:
+            if attention_mask is None:
+                attention_mask = torch.ones_like(input_ids)
+            input_ids, attention_mask = pad_to_bucket(input_ids, attention_mask, buckets, pad_token_id)
+        return eager_generate(input_ids=input_ids, attention_mask=attention_mask, **kwargs)
+
+    model.generate = generate
+    model.compiled = {"backend": backend, "buckets": buckets, "static_cache": static_cache}
+    return model
+
+
+def warm_up(model, max_new_tokens=8):
+    """Runs one short generation per bucket so compilation happens now rather than on the first real request.
+
+    Returns the seconds spent.
+    """
+    import torch
+
+    start = time.perf_counter()
+    compiled = getattr(model, "compiled", None)
+    if compiled is None:
+        return 0.0
+    with torch.inference_mode():
+        for bucket in compiled["buckets"]:
+            input_ids = torch.full((1, bucket), 5, dtype=torch.long)
+            model.generate(input_ids=input_ids, attention_mask=torch.ones_like(input_ids),
+                           min_new_tokens=max_new_tokens, max_new_tokens=max_new_tokens, num_beams=1, do_sample=False)
+    return time.perf_counter() - start
+
+
+def compile_pipeline(pipeline_model, backend="inductor", buckets=DEFAULT_BUCKETS, warm=True):
+    """Compiles a transformers pipeline's model and, by default, warms it up; returns the pipeline."""
+    pad_token_id = pipeline_model.tokenizer.pad_token_id or 0
+    compile_model(pipeline_model.model, backend, buckets, pad_token_id)
+    if warm:
+        print(f"Warming up {backend} compiled model for buckets {', '.join(map(str, sorted(buckets)))}")
+        print(f"Warm-up took {warm_up(pipeline_model.model):.1f}s")
+    return pipeline_model
+
+
+def add_compile_arguments(parser):
+    parser.add_argument("--compile", choices=COMPILE_BACKENDS,
+                        help="Run generation through a compiled graph (torch.compile or TorchScript) on CPU")
+    parser.add_argument("--buckets", type=int, nargs="+", default=list(DEFAULT_BUCKETS),
+                        help="With --compile, input lengths that prompts are padded up to")
+
+
+if __name__ == "__main__":
+    import json
+    import torch
+    from benchmark import RESULTS_DIR, git_commit, percentile
+    from code_units import extract_units
+    from source_scan import scan_source_files
+    import cody_docu
+
+    parser = argparse.ArgumentParser(description="Measure compiled against eager generation on real functions")
+    parser.add_argument("--model", choices=cody_docu.AVAILABLE_MODELS.keys(), default="codet5-small")
+    parser.add_argument("--root", default=".", help="Source tree to take functions from")
+    parser.add_argument("--functions", type=int, default=50, help="Functions to summarize per mode")
+    parser.add_argument("--max_length", type=int, default=64, help="Maximum summary length")
+    parser.add_argument("--threads", type=int, default=1, help="Torch intra-op threads")
+    parser.add_argument("--output_dir", default=RESULTS_DIR, help="Directory for the JSON results")
+    add_compile_arguments(parser)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    units = [unit for path in scan_source_files(args.root) for unit in extract_units(open(path, 'r').read(), path)]
+    units = units[:args.functions]
+    rows = {}
+    for mode in ["eager", args.compile or "inductor"]:
+        summarization_pipeline = cody_docu.initialize_model(args.model)
+        setup = 0.0
+        if mode != "eager":
+            start = time.perf_counter()
+            compile_pipeline(summarization_pipeline, mode, args.buckets)
+            setup = time.perf_counter() - start
+        latencies = []
+        for unit in units:
+            start = time.perf_counter()
+            cody_docu.summarize_function(unit["name"], unit["code"], summarization_pipeline, args.max_length, 10)
+            latencies.append(time.perf_counter() - start)
+        total = sum(latencies)
+        rows[mode] = {"setup": setup, "per_sec": len(latencies) / total, "p50": percentile(latencies, 0.5),
+                      "p95": percentile(latencies, 0.95)}
+        del summarization_pipeline
+
+    eager = rows["eager"]
+    print(f"{'mode':<12}{'setup s':>9}{'fn/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'speedup':>9}")
+    for mode, row in rows.items():
+        print(f"{mode:<12}{row['setup']:>9.1f}{row['per_sec']:>8.2f}{row['p50'] * 1000:>9.0f}{row['p95'] * 1000:>9.0f}"
+              f"{row['per_sec'] / eager['per_sec']:>8.2f}x")
+    report = {"meta": {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "torch": torch.__version__, "functions": len(units), "args": vars(args)},
+              "modes": rows, "speedup": {mode: row["per_sec"] / eager["per_sec"] for mode, row in rows.items()}}
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"compiled_{report['meta']['timestamp'].replace(':', '').replace('-', '')}_"
+                                         f"{report['meta']['commit']}.json")
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {path}")
+
+#usage python compiled.py --model codet5-small --compile inductor --functions 50
+#usage python compiled.py --model codet5 --compile torchscript --buckets 128 256 512
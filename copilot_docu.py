@@ -4,6 +4,11 @@ import requests
 import argparse
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
 
+from length_policy import LengthPolicy
+
+# Summary length follows function size instead of forcing 100-300 tokens for every chunk
+LENGTH_POLICY = LengthPolicy(ceiling=300)
+
 def get_github_file_content(owner, repo, filepath, branch="main"):
     """Fetches the content of a file from a GitHub repository."""
     url = f"https://api.github.com/repos/{owner}/{repo}/contents/{filepath}?ref={branch}"
@@ -45,7 +50,8 @@ def process_code_in_chunks(code):
     for function in functions:
         if function.strip():
             func_code = "def " + function
-            summary = summarize_code(func_code)
+            min_length, max_length = LENGTH_POLICY.lengths(func_code)
+            summary = summarize_code(func_code, max_length, min_length)
             summaries.append(summary)
     return "\n\n".join(summaries)
 
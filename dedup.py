@@ -0,0 +1,147 @@
+import ast
+import hashlib
+import builtins
+
+import metrics
+from code_units import parse_function_code
+
+_BUILTINS = frozenset(dir(builtins))
+
+
+def _strip_docstring(node):
+    body = getattr(node, "body", None)
+    if (isinstance(body, list) and body and isinstance(body[0], ast.Expr)
+            and isinstance(body[0].value, ast.Constant) and isinstance(body[0].value.value, str)):
+        node.body = body[1:] or [ast.Pass()]
+
+
+def _bound_names(tree):
+    """Names the code binds itself: parameters, assignment and loop targets, nested defs and local imports.
+
+    Names declared global or nonlocal are left out, as are free names like called helpers and modules.
+    """
+    bound, declared = set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            bound.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            bound.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            declared.update(node.names)
+    return bound - declared - _BUILTINS
+
+
+class _Canonicalizer(ast.NodeTransformer):
+    """Renames local identifiers to v0, v1, ... in order of first appearance.
+
+    Only names bound inside the code are renamed; globals, imported modules, called helpers,
+    attribute names and builtins are kept, so `requests.get(url)` and `requests.post(url)` or
+    `save_file(path)` and `delete_file(path)` stay distinct while `def f(a): return a` and
+    `def g(b): return b` collapse.
+    """
+
+    def __init__(self, bound):
+        self.bound = bound
+        self.names = {}
+
+    def _rename(self, name):
+        if name not in self.bound:
+            return name
+        if name not in self.names:
+            self.names[name] = f"v{len(self.names)}"
+        return self.names[name]
+
+    def visit_FunctionDef(self, node):
+        node.name = self._rename(node.name)
+        return self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        node.name = self._rename(node.name)
+        return self.generic_visit(node)
+
+    def visit_arg(self, node):
+        node.arg = self._rename(node.arg)
+        return self.generic_visit(node)
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            node.name = self._rename(node.name)
+        return self.generic_visit(node)
+
+    def visit_Name(self, node):
+        node.id = self._rename(node.id)
+        return node
+
+
+def normalized_hash(func_code, ignore_names=False):
+    """Hashes a function's AST, so comments, formatting and docstrings don't change the result.
+
+    With `ignore_names`, identifiers bound inside the function (its own name, parameters and
+    locals) are renamed canonically first, so alpha-equivalent copies hash the same too.
+    """
+    tree = parse_function_code(func_code)
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            _strip_docstring(node)
+    if ignore_names:
+        tree = _Canonicalizer(_bound_names(tree)).visit(tree)
+    dump = ast.dump(tree, annotate_fields=False, include_attributes=False)
+    return hashlib.blake2b(dump.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class Deduplicator:
+    """Runs inference once per equivalence class of functions and reuses the summary for every copy.
+
+    `summarize` is called as `summarize(name, func_code, *args, **kwargs)`; the first occurrence of
+    each normalized AST is summarized and later occurrences get the same summary back. Functions
+    that fail to parse are always summarized.
+    """
+
+    def __init__(self, summarize, ignore_names=False):
+        self.summarize_with = summarize
+        self.ignore_names = ignore_names
+        self.summaries = {}
+        self.classes = {}
+        self.functions = 0
+
+    def key(self, func_code):
+        try:
+            return normalized_hash(func_code, self.ignore_names)
+        except SyntaxError:
+            return None
+
+    def summarize(self, name, func_code, *args, **kwargs):
+        """Summarizes a function, or returns the summary of an equivalent one seen earlier."""
+        self.functions += 1
+        key = self.key(func_code)
+        if key is None:
+            return self.summarize_with(name, func_code, *args, **kwargs)
+        self.classes.setdefault(key, []).append(name)
+        if key in self.summaries:
+            metrics.count("generate", cache_hits=1)
+            return self.summaries[key]
+        summary = self.summarize_with(name, func_code, *args, **kwargs)
+        self.summaries[key] = summary
+        return summary
+
+    def report(self):
+        """Returns the number of functions seen, model calls made and the dedup ratio."""
+        unique = len(self.summaries)
+        skipped = sum(len(names) for names in self.classes.values()) - unique
+        calls = self.functions - skipped
+        ratio = skipped / self.functions if self.functions else 0.0
+        lines = [f"dedup: {self.functions} functions, {calls} model calls, "
+                 f"{skipped} reused ({ratio:.1%} dedup ratio)"]
+        duplicated = sorted((names for names in self.classes.values() if len(names) > 1), key=len, reverse=True)
+        for names in duplicated[:10]:
+            shown = ", ".join(sorted(set(names)))
+            lines.append(f"  {len(names):>4} copies  {shown}")
+        return "\n".join(lines)
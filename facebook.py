@@ -5,9 +5,22 @@ import argparse
 import ast
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
 
+import metrics
+import profiling
+from dedup import Deduplicator
+from near_dup import NearDuplicateSummarizer, index_from_args
+from fast_path import DOCSTRING_POLICIES, FastPath
+from journal import add_journal_arguments, journal_from_args
+from source_scan import FileIndex, scan_source_files
+from summary_store import SummaryStore
+from github_graphql import GraphQLBlobFetcher, add_graphql_arguments, sparse_paths
+
+# Overridable so the fetch path can run against a local stand-in (see github_stub_server.py)
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+
 def get_github_repo_files(owner, repo, branch="main"):
     """Fetches the list of files from a GitHub repository."""
-    url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{branch}?recursive=1"
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/trees/{branch}?recursive=1"
     headers = {}
 
     # Add GitHub token if available for authentication
@@ -15,7 +28,9 @@ def get_github_repo_files(owner, repo, branch="main"):
     if token:
         headers["Authorization"] = f"token {token}"
 
-    response = requests.get(url, headers=headers)
+    with metrics.stage("fetch") as stage:
+        response = requests.get(url, headers=headers)
+        stage.add(bytes=len(response.content))
     if response.status_code == 200:
         file_data = response.json()
         # Filter only Python files
@@ -27,7 +42,7 @@ def get_github_repo_files(owner, repo, branch="main"):
 
 def get_github_file_content(owner, repo, filepath, branch="main"):
     """Fetches the content of a file from a GitHub repository."""
-    url = f"https://api.github.com/repos/{owner}/{repo}/contents/{filepath}?ref={branch}"
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/contents/{filepath}?ref={branch}"
     headers = {}
 
     # Add GitHub token if available for authentication
@@ -35,7 +50,9 @@ def get_github_file_content(owner, repo, filepath, branch="main"):
     if token:
         headers["Authorization"] = f"token {token}"
 
-    response = requests.get(url, headers=headers)
+    with metrics.stage("fetch") as stage:
+        response = requests.get(url, headers=headers)
+        stage.add(bytes=len(response.content))
     if response.status_code == 200:
         file_data = response.json()
         # Decode the base64-encoded content
@@ -52,15 +69,18 @@ summarization_pipeline = pipeline("summarization",
 
 def extract_functions(code):
     """Extracts functions and their signatures from the code."""
-    tree = ast.parse(code)
+    with metrics.stage("parse") as stage:
+        tree = ast.parse(code)
+        stage.add(bytes=len(code))
     functions = []
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            func_code = ast.get_source_segment(code, node)
-            func_name = node.name
-            func_args = [arg.arg for arg in node.args.args]
-            func_return = "N/A"  # Simplification: More complex parsing can be added
-            functions.append((func_name, func_code, func_args, func_return))
+    with metrics.stage("extract"):
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef):
+                func_code = ast.get_source_segment(code, node)
+                func_name = node.name
+                func_args = [arg.arg for arg in node.args.args]
+                func_return = "N/A"  # Simplification: More complex parsing can be added
+                functions.append((func_name, func_code, func_args, func_return))
     return functions
 
 def summarize_function(name, func_code, func_args, func_return, max_length=100, min_length=30):
@@ -72,8 +92,15 @@ def summarize_function(name, func_code, func_args, func_return, max_length=100,
         f"Return: {func_return}\n"
         f"Code:\n{func_code}\n\nSummary:"
     )
-    result = summarization_pipeline([prompt], max_length=max_length, min_length=min_length)
-    return result[0]['summary_text']
+    if metrics.enabled():
+        with metrics.stage("tokenize") as stage:
+            stage.add(tokens_in=len(summarization_pipeline.tokenizer(prompt)["input_ids"]))
+    with metrics.stage("generate"), profiling.summarizing(name):
+        result = summarization_pipeline([prompt], max_length=max_length, min_length=min_length)
+    summary = result[0]['summary_text']
+    if metrics.enabled():
+        metrics.count("generate", tokens_out=len(summarization_pipeline.tokenizer(summary)["input_ids"]))
+    return summary
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Summarize Python code files from local path or GitHub")
@@ -83,41 +110,141 @@ if __name__ == "__main__":
     parser.add_argument("--repo", default="sampleproject", help="GitHub repository name")
     parser.add_argument("--branch", default="main", help="GitHub branch")
     parser.add_argument("--max_length", type=int, default=100, help="Maximum length of the summary")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Summarize each distinct function body once and reuse the summary for its copies")
+    parser.add_argument("--dedup_names", action="store_true",
+                        help="With --dedup, also treat functions that differ only in identifier names as copies")
+    parser.add_argument("--near_dup", type=float, metavar="THRESHOLD",
+                        help="Reuse the summary of an earlier near-clone with at least this MinHash similarity")
+    parser.add_argument("--near_dup_index", help="Load/save the near-clone index here to reuse summaries across runs")
+    parser.add_argument("--near_dup_adapt", action="store_true",
+                        help="Swap the near-clone's name for the function's own name in reused summaries")
+    parser.add_argument("--fast_path", action="store_true",
+                        help="Answer trivial functions and well-documented ones by rule instead of the model")
+    parser.add_argument("--docstring_policy", choices=DOCSTRING_POLICIES, default="good",
+                        help="With --fast_path, which existing docstrings to reuse as the summary")
+    parser.add_argument("--scan_index", help="With --local, skip files unchanged since they were recorded in this index")
+    parser.add_argument("--store", help="Also save summaries to this SQLite full-text store (see summary_store.py)")
+    parser.add_argument("--metrics_dir", help="Collect per-stage metrics and write Prometheus/JSON reports here")
+    add_graphql_arguments(parser)
+    add_journal_arguments(parser)
+    profiling.add_profile_arguments(parser)
     args = parser.parse_args()
+    journal = journal_from_args(parser, args)
+    scan_index = FileIndex(args.scan_index) if args.scan_index else None
+    store = SummaryStore(args.store) if args.store else None
+    repo_label = f"{args.owner}/{args.repo}" if args.github else os.path.abspath(args.local or ".")
+
+    if args.metrics_dir:
+        metrics.enable()
+        metrics.instrument_pipeline(summarization_pipeline)
+
+    with profiling.profiler_from_args(args):
+        try:
+            summarize = summarize_function
+            near_dup = None
+            if args.near_dup is not None:
+                near_dup = NearDuplicateSummarizer(summarize, index_from_args(args), args.near_dup_adapt)
+                summarize = near_dup.summarize
 
-    try:
-        if args.github:
-            py_files = get_github_repo_files(args.owner, args.repo, args.branch)
-            summaries = []
-            for py_file in py_files:
-                code_content = get_github_file_content(args.owner, args.repo, py_file, args.branch)
-                if code_content:
-                    functions = extract_functions(code_content)
-                    summaries.extend(
-                        [summarize_function(name, func_code, func_args, func_return, args.max_length)
-                         for name, func_code, func_args, func_return in functions]
-                    )
-            print(f"Summary of {args.owner}/{args.repo} repository:")
-            print("\n\n".join(summaries))
-        elif args.local:
-            for root, dirs, files in os.walk(args.local):
-                for file in files:
-                    if file.endswith(".py"):
-                        file_path = os.path.join(root, file)
+            deduplicator = None
+            if args.dedup or args.dedup_names:
+                deduplicator = Deduplicator(summarize, ignore_names=args.dedup_names)
+                summarize = deduplicator.summarize
+
+            fast_path = None
+            if args.fast_path:
+                fast_path = FastPath(summarize, args.docstring_policy)
+                summarize = fast_path.summarize
+            # Tags each summary with what produced it, for the journal and the store
+            source_of = fast_path.source_of if fast_path is not None else None
+
+            if args.github:
+                if args.graphql:
+                    py_files, sizes = sparse_paths(args)
+                else:
+                    py_files, sizes = get_github_repo_files(args.owner, args.repo, args.branch), {}
+                summaries = []
+                for py_file in py_files:
+                    if journal.file_done(py_file):
+                        summaries.extend(journal.file_summaries(py_file))
+                pending = [py_file for py_file in py_files if not journal.file_done(py_file)]
+                if args.graphql:
+                    fetcher = GraphQLBlobFetcher(args.owner, args.repo, args.branch, batch_size=args.graphql_batch)
+                    contents = fetcher.fetch(pending, sizes)
+                else:
+                    fetcher = None
+                    contents = ((py_file, get_github_file_content(args.owner, args.repo, py_file, args.branch))
+                                for py_file in pending)
+                for py_file, code_content in contents:
+                    if code_content:
+                        functions = extract_functions(code_content)
+                        file_summaries = journal.summarize_file(
+                            py_file, functions, lambda function: summarize(*function, args.max_length), source_of)
+                        summaries.extend(file_summaries)
+                        if store is not None:
+                            store.record_file(repo_label, py_file, functions, file_summaries,
+                                              journal.file_sources(py_file, functions, source_of))
+                if fetcher is not None:
+                    print(fetcher.report())
+                with metrics.stage("output"):
+                    print(f"Summary of {args.owner}/{args.repo} repository:")
+                    print("\n\n".join(summaries))
+            elif args.local:
+                files = scan_source_files(args.local)
+                if scan_index is not None:
+                    files = scan_index.changed(files)
+                for file_path in files:
+                    if journal.file_done(file_path):
+                        summaries = journal.file_summaries(file_path)
+                    else:
                         with open(file_path, 'r') as f:
                             code_content = f.read()
                         functions = extract_functions(code_content)
-                        summaries = [
-                            summarize_function(name, func_code, func_args, func_return, args.max_length)
-                            for name, func_code, func_args, func_return in functions
-                        ]
+                        summaries = journal.summarize_file(
+                            file_path, functions, lambda function: summarize(*function, args.max_length), source_of)
+                        if store is not None:
+                            store.record_file(repo_label, file_path, functions, summaries,
+                                              journal.file_sources(file_path, functions, source_of))
+                    with metrics.stage("output"):
                         print(f"Summary of {file_path}:")
                         print("\n\n".join(summaries))
-        else:
-            print("Please use either --github to fetch from GitHub or --local to specify a local project directory")
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
+                    if scan_index is not None:
+                        scan_index.mark(file_path)
+            else:
+                print("Please use either --github to fetch from GitHub or --local to specify a local project directory")
+
+            if fast_path is not None:
+                print(fast_path.report())
+            if deduplicator is not None:
+                print(deduplicator.report())
+            if near_dup is not None:
+                print(near_dup.report())
+                if args.near_dup_index:
+                    near_dup.index.save(args.near_dup_index)
+        except Exception as e:
+            print(f"An error occurred: {str(e)}")
+            if args.journal:
+                print(f"Completed work is saved in {args.journal}; rerun with --resume to continue")
+        finally:
+            journal.close()
+            if scan_index is not None:
+                scan_index.save()
+            if store is not None:
+                store.close()
+            if args.metrics_dir:
+                metrics.print_summary()
+                metrics.write_reports(args.metrics_dir)
 
 # Usage examples:
 # python hf_working_reas.py --github --owner pypa --repo sampleproject --branch main
 # python hf_working_reas.py --local path/to/your/local/project_directory
+# python facebook.py --github --owner pypa --repo sampleproject --metrics_dir run_metrics
+# python facebook.py --local path/to/your/local/project_directory --profile run_profile
+# python facebook.py --local path/to/your/local/project_directory --dedup
+# python facebook.py --local path/to/your/local/project_directory --fast_path
+# python facebook.py --local path/to/your/local/project_directory --scan_index .scan_index.json
+# python facebook.py --github --owner pypa --repo sampleproject --store summaries.db
+# python facebook.py --github --owner pypa --repo pip --graphql --paths_from changed.txt
+# python facebook.py --github --owner pypa --repo sampleproject --journal run.journal --resume
+# python facebook.py --local path/to/your/local/project_directory --near_dup 0.75 --near_dup_adapt
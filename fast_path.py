@@ -0,0 +1,184 @@
+import ast
+import re
+from collections import Counter
+
+import metrics
+from code_units import parse_function_code
+
+DOCSTRING_POLICIES = ("never", "good", "any")
+# Words that mark a docstring as a placeholder rather than documentation
+_PLACEHOLDER = re.compile(r"\b(TODO|FIXME|XXX|TBD)\b|^\s*(docstring|description)\.?\s*$", re.IGNORECASE)
+_PROPERTY_DECORATORS = {"property", "cached_property"}
+# Templates for dunder methods; {detail} is filled in when the body is a single short return
+_DUNDER_SUMMARIES = {
+    "__str__": "Returns the human-readable string form of the object",
+    "__repr__": "Returns the developer-facing representation of the object",
+    "__init__": "Initializes the object",
+    "__eq__": "Checks whether the object equals another",
+    "__ne__": "Checks whether the object differs from another",
+    "__lt__": "Checks whether the object sorts before another",
+    "__hash__": "Returns the object's hash",
+    "__len__": "Returns the number of items in the object",
+    "__iter__": "Iterates over the object's items",
+    "__next__": "Returns the next item of the iterator",
+    "__contains__": "Checks whether an item is in the object",
+    "__getitem__": "Returns the item stored under a key",
+    "__setitem__": "Stores an item under a key",
+    "__delitem__": "Removes the item stored under a key",
+    "__enter__": "Enters the object's context",
+    "__exit__": "Leaves the object's context",
+    "__call__": "Calls the object",
+    "__bool__": "Returns the object's truth value",
+}
+
+
+def _body(node):
+    """Returns the function body without its docstring."""
+    body = node.body
+    if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+            and isinstance(body[0].value.value, str):
+        body = body[1:]
+    return body
+
+
+def _parameters(node):
+    args = node.args
+    names = [arg.arg for arg in args.posonlyargs + args.args + args.kwonlyargs]
+    if args.vararg:
+        names.append(args.vararg.arg)
+    if args.kwarg:
+        names.append(args.kwarg.arg)
+    return names
+
+
+def _self_attribute(expression):
+    """Returns `x` for `self.x` (or `cls.x`), else None."""
+    if (isinstance(expression, ast.Attribute) and isinstance(expression.value, ast.Name)
+            and expression.value.id in ("self", "cls")):
+        return expression.attr
+    return None
+
+
+def docstring_summary(docstring, policy="good", min_words=5):
+    """Returns the first paragraph of a docstring if the policy accepts it, else None.
+
+    "never" always declines, "any" takes any non-empty docstring, and "good" requires at least
+    `min_words` words and no placeholder markers such as TODO.
+    """
+    if policy == "never" or not docstring:
+        return None
+    paragraph = " ".join(docstring.strip().split("\n\n")[0].split())
+    if not paragraph:
+        return None
+    if policy == "good" and (len(paragraph.split()) < min_words or _PLACEHOLDER.search(paragraph)):
+        return None
+    return paragraph
+
+
+def _dunder_summary(node, body):
+    template = _DUNDER_SUMMARIES.get(node.name)
+    if template is None:
+        return None
+    if len(body) == 1 and isinstance(body[0], ast.Return) and body[0].value is not None:
+        detail = ast.unparse(body[0].value)
+        if len(detail) <= 80:
+            return f"{template}: `{detail}`."
+    if node.name == "__init__" and body and all(
+            isinstance(statement, ast.Assign) and len(statement.targets) == 1
+            and _self_attribute(statement.targets[0]) for statement in body):
+        stored = ", ".join(f"`{_self_attribute(statement.targets[0])}`" for statement in body)
+        return f"{template}, storing {stored}."
+    if len(body) > 3:
+        return None
+    return f"{template}."
+
+
+def rule_summary(func_code, docstring_policy="good", min_words=5):
+    """Summarizes a trivial function without the model.
+
+    Returns (summary, source) where source is "docstring", "stub", "passthrough", "getter",
+    "setter" or "dunder", or None when the function needs the model.
+    """
+    try:
+        node = parse_function_code(func_code).body[0]
+    except (SyntaxError, IndexError):
+        return None
+    if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return None
+
+    summary = docstring_summary(ast.get_docstring(node), docstring_policy, min_words)
+    if summary:
+        return summary, "docstring"
+
+    body = _body(node)
+    if not body or all(isinstance(statement, ast.Pass) or (isinstance(statement, ast.Expr)
+                       and isinstance(statement.value, ast.Constant) and statement.value.value is Ellipsis)
+                       for statement in body):
+        return "Does nothing; placeholder or hook for subclasses.", "stub"
+
+    if node.name.startswith("__") and node.name.endswith("__"):
+        summary = _dunder_summary(node, body)
+        return (summary, "dunder") if summary else None
+
+    if len(body) != 1:
+        return None
+    statement = body[0]
+    decorators = {ast.unparse(decorator).split(".")[-1] for decorator in node.decorator_list}
+    if isinstance(statement, ast.Return):
+        value = statement.value
+        if value is None:
+            return "Does nothing and returns None.", "stub"
+        if isinstance(value, ast.Name) and value.id in _parameters(node):
+            return f"Returns its `{value.id}` argument unchanged.", "passthrough"
+        attribute = _self_attribute(value)
+        if attribute and (decorators & _PROPERTY_DECORATORS or node.name.startswith("get")
+                          or node.name.lstrip("_") == attribute.lstrip("_")):
+            return f"Returns the `{attribute}` attribute.", "getter"
+    elif isinstance(statement, ast.Assign) and len(statement.targets) == 1:
+        attribute = _self_attribute(statement.targets[0])
+        if (attribute and isinstance(statement.value, ast.Name) and statement.value.id in _parameters(node)
+                and ("setter" in decorators or node.name.startswith("set"))):
+            return f"Sets the `{attribute}` attribute to `{statement.value.id}`.", "setter"
+    return None
+
+
+class FastPath:
+    """Answers trivial functions and well-documented ones by rule and sends the rest to the model.
+
+    `summarize` is called as `summarize(name, func_code, *args, **kwargs)` for everything the rules
+    don't cover. Every result is kept in `records` tagged with the source that produced it, and
+    `sources` maps each function's code to the source of its latest summary.
+    """
+
+    def __init__(self, summarize, docstring_policy="good", min_words=5):
+        if docstring_policy not in DOCSTRING_POLICIES:
+            raise ValueError(f"Unknown docstring policy {docstring_policy}; use one of {', '.join(DOCSTRING_POLICIES)}")
+        self.summarize_with = summarize
+        self.docstring_policy = docstring_policy
+        self.min_words = min_words
+        self.records = []
+        self.sources = {}
+
+    def summarize(self, name, func_code, *args, **kwargs):
+        answered = rule_summary(func_code, self.docstring_policy, self.min_words)
+        if answered is None:
+            summary, source = self.summarize_with(name, func_code, *args, **kwargs), "model"
+        else:
+            summary, source = answered
+            metrics.count("generate", cache_hits=1)
+        self.records.append({"name": name, "source": source, "summary": summary})
+        self.sources[func_code] = source
+        return summary
+
+    def source_of(self, function):
+        """Returns the source of the latest summary of an extract_functions tuple, or None if there is none."""
+        return self.sources.get(function[1])
+
+    def report(self):
+        """Returns the count per source and the share of model calls avoided."""
+        sources = Counter(record["source"] for record in self.records)
+        total = len(self.records)
+        avoided = total - sources.get("model", 0)
+        share = avoided / total if total else 0.0
+        details = ", ".join(f"{source} {count}" for source, count in sources.most_common())
+        return f"fast path: {avoided} of {total} model calls avoided ({share:.1%}); {details}"
@@ -0,0 +1,133 @@
+import re
+import json
+import random
+from types import SimpleNamespace
+
+from code_units import estimate_tokens
+
+PACKED_PROMPT_HEADER = """You are a helpful AI assistant that documents Python code.
+
+Below are several Python functions, each introduced by a line of the form "### <ID>: <name>".
+Write a clear, concise summary (one to three sentences) of what each function does.
+
+Respond with a single JSON object that maps every function ID to its summary, for example:
+{"f0": "Fetches a file from GitHub and decodes it.", "f1": "Parses the command line arguments."}
+
+Return only the JSON object, without markdown fences or any other text.
+"""
+
+# Token cost of the fixed instructions, reserved out of every request's budget
+HEADER_TOKENS = estimate_tokens(PACKED_PROMPT_HEADER)
+
+
+def format_entry(request_id, unit, max_tokens=None):
+    """Formats one function for a packed request, truncating its code to `max_tokens` if needed."""
+    code = unit["code"]
+    if max_tokens is not None and estimate_tokens(code) > max_tokens:
+        code = code[:max_tokens * 4] + "\n    # ... (truncated)"
+    return f"### {request_id}: {unit['qualname']}\n```python\n{code}\n```\n"
+
+
+def pack_units(units_by_id, request_ids, token_budget=6000, max_functions=60):
+    """Greedily groups functions into batches of (request_id, entry_text) that fit the token budget."""
+    available = token_budget - HEADER_TOKENS
+    batches = []
+    batch, used = [], 0
+    for request_id in request_ids:
+        entry = format_entry(request_id, units_by_id[request_id], max_tokens=available)
+        cost = estimate_tokens(entry)
+        if batch and (used + cost > available or len(batch) >= max_functions):
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append((request_id, entry))
+        used += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def build_packed_prompt(batch):
+    """Builds the prompt text for one batch of packed functions."""
+    return PACKED_PROMPT_HEADER + "\n" + "\n".join(entry for _, entry in batch)
+
+
+def parse_packed_response(text, expected_ids):
+    """Parses a JSON response keyed by function ID and returns (summaries, missing_ids)."""
+    text = (text or "").strip()
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)
+    start, end = text.find("{"), text.rfind("}")
+    data = {}
+    if start != -1 and end > start:
+        try:
+            data = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            data = {}
+    if not isinstance(data, dict):
+        data = {}
+
+    summaries = {}
+    for request_id in expected_ids:
+        value = data.get(request_id)
+        if isinstance(value, dict):
+            value = value.get("summary")
+        if isinstance(value, str) and value.strip():
+            summaries[request_id] = value.strip()
+    missing = [request_id for request_id in expected_ids if request_id not in summaries]
+    return summaries, missing
+
+
+def summarize_units_packed(units, model, token_budget=6000, max_rounds=3):
+    """Summarizes functions in packed requests, re-queueing only IDs missing from the responses.
+
+    Returns a list of summaries aligned with `units` (None where every round failed) and run stats.
+    """
+    keyed = {f"f{i}": unit for i, unit in enumerate(units)}
+    pending = list(keyed)
+    summaries = {}
+    stats = {"functions": len(units), "requests": 0, "rounds": 0, "requeued": 0}
+
+    for round_number in range(max_rounds):
+        if not pending:
+            break
+        stats["rounds"] += 1
+        if round_number:
+            stats["requeued"] += len(pending)
+        missing = []
+        for batch in pack_units(keyed, pending, token_budget):
+            batch_ids = [request_id for request_id, _ in batch]
+            stats["requests"] += 1
+            try:
+                response = model.generate_content(build_packed_prompt(batch))
+                text = response.text
+            except Exception as e:
+                print(f"Packed request for {len(batch_ids)} functions failed: {e}")
+                missing.extend(batch_ids)
+                continue
+            batch_summaries, batch_missing = parse_packed_response(text, batch_ids)
+            summaries.update(batch_summaries)
+            missing.extend(batch_missing)
+        pending = missing
+
+    stats["missing"] = len(pending)
+    return [summaries.get(f"f{i}") for i in range(len(units))], stats
+
+
+class FakeGeminiModel:
+    """Offline stand-in for `genai.GenerativeModel` that answers packed prompts with canned JSON.
+
+    `drop_rate` randomly omits IDs from responses so the re-queue path can be exercised.
+    """
+
+    def __init__(self, drop_rate=0.0, seed=0):
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        entries = re.findall(r"^### (f\d+): (.+)$", prompt, flags=re.MULTILINE)
+        answer = {}
+        for request_id, qualname in entries:
+            if self.random.random() >= self.drop_rate:
+                answer[request_id] = f"Offline summary of {qualname}."
+        return SimpleNamespace(text=json.dumps(answer))
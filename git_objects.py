@@ -0,0 +1,414 @@
+import os
+import re
+import mmap
+import zlib
+import struct
+import argparse
+from collections import OrderedDict
+
+from source_scan import DEFAULT_EXCLUDES, excluded
+
+_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+_OFS_DELTA = 6
+_REF_DELTA = 7
+_IDX_MAGIC = b"\377tOc"
+_BLOB_MODES = (b"100644", b"100755")
+_ANCESTRY = re.compile(r"(?:[~^]\d*)*$")
+
+
+def find_git_dir(path):
+    """Returns the object-database directory of a bare repository, a work tree, or a .git file pointer."""
+    path = os.path.abspath(path)
+    dot_git = os.path.join(path, ".git")
+    if os.path.isfile(dot_git):
+        with open(dot_git, 'r') as file:
+            pointer = file.read().strip()
+        if pointer.startswith("gitdir:"):
+            return os.path.normpath(os.path.join(path, pointer[len("gitdir:"):].strip()))
+    if os.path.isdir(dot_git):
+        return dot_git
+    if os.path.isdir(os.path.join(path, "objects")) and os.path.exists(os.path.join(path, "HEAD")):
+        return path
+    raise ValueError(f"{path} is not a git repository")
+
+
+def _apply_delta(base, delta):
+    """Rebuilds an object from its base and a git delta (copy and insert instructions)."""
+    position = 0
+
+    def varint():
+        nonlocal position
+        value = shift = 0
+        while True:
+            byte = delta[position]
+            position += 1
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if not byte & 0x80:
+                return value
+
+    base_size, target_size = varint(), varint()
+    if base_size != len(base):
+        raise ValueError("Delta base size mismatch")
+    out = bytearray()
+    while position < len(delta):
+        op = delta[position]
+        position += 1
+        if op & 0x80:
+            offset = size = 0
+            for bit in range(4):
+                if op & (1 << bit):
+                    offset |= delta[position] << (8 * bit)
+                    position += 1
+            for bit in range(3):
+                if op & (1 << (4 + bit)):
+                    size |= delta[position] << (8 * bit)
+                    position += 1
+            out += base[offset:offset + (size or 0x10000)]
+        elif op:
+            out += delta[position:position + op]
+            position += op
+        else:
+            raise ValueError("Invalid delta opcode 0")
+    if len(out) != target_size:
+        raise ValueError("Delta result size mismatch")
+    return bytes(out)
+
+
+class PackFile:
+    """One .pack file and its .idx (version 1 or 2), both memory-mapped; objects are found by binary search."""
+
+    def __init__(self, idx_path):
+        self.idx_path = idx_path
+        with open(idx_path, "rb") as file:
+            self.idx = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(idx_path[:-len(".idx")] + ".pack", "rb") as file:
+            self.pack = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.idx[:4] == _IDX_MAGIC:
+            self.version = struct.unpack(">I", self.idx[4:8])[0]
+            fanout_at = 8
+        else:
+            self.version = 1
+            fanout_at = 0
+        self.fanout = struct.unpack(">256I", self.idx[fanout_at:fanout_at + 1024])
+        self.count = self.fanout[255]
+        self.names_at = fanout_at + 1024
+        if self.version == 2:
+            self.offsets_at = self.names_at + 24 * self.count
+            self.large_at = self.offsets_at + 4 * self.count
+
+    def _name(self, i):
+        if self.version == 2:
+            return self.idx[self.names_at + 20 * i:self.names_at + 20 * i + 20]
+        return self.idx[self.names_at + 24 * i + 4:self.names_at + 24 * i + 24]
+
+    def _offset(self, i):
+        if self.version == 1:
+            return struct.unpack(">I", self.idx[self.names_at + 24 * i:self.names_at + 24 * i + 4])[0]
+        offset = struct.unpack(">I", self.idx[self.offsets_at + 4 * i:self.offsets_at + 4 * i + 4])[0]
+        if offset & 0x80000000:
+            at = self.large_at + 8 * (offset & 0x7fffffff)
+            offset = struct.unpack(">Q", self.idx[at:at + 8])[0]
+        return offset
+
+    def find(self, binary_sha, prefix_length=20):
+        """Returns (offset, full binary sha) of an object, or None; a shorter prefix must be unique."""
+        prefix = binary_sha[:prefix_length]
+        first = prefix[0]
+        low = self.fanout[first - 1] if first else 0
+        high = self.fanout[first]
+        while low < high:
+            middle = (low + high) // 2
+            if self._name(middle)[:prefix_length] < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.fanout[first] and self._name(low)[:prefix_length] == prefix:
+            if prefix_length < 20 and low + 1 < self.fanout[first] \
+                    and self._name(low + 1)[:prefix_length] == prefix:
+                raise ValueError(f"Ambiguous object prefix {prefix.hex()}")
+            return self._offset(low), self._name(low)
+        return None
+
+    def names_with_prefix(self, hex_prefix):
+        """Returns the hex shas of every object in the pack that starts with `hex_prefix` (any length)."""
+        if len(hex_prefix) >= 2:
+            first = int(hex_prefix[:2], 16)
+            low, high = self.fanout[first - 1] if first else 0, self.fanout[first]
+        else:
+            # A single hex digit spans sixteen fanout buckets
+            first = int(hex_prefix, 16) * 16
+            low, high = self.fanout[first - 1] if first else 0, self.fanout[first + 15]
+        padded = bytes.fromhex(hex_prefix[:len(hex_prefix) // 2 * 2])
+        end = high
+        while low < high:
+            middle = (low + high) // 2
+            if self._name(middle)[:len(padded)] < padded:
+                low = middle + 1
+            else:
+                high = middle
+        names = []
+        while low < end and self._name(low)[:len(padded)] == padded:
+            name = self._name(low).hex()
+            if name.startswith(hex_prefix):
+                names.append(name)
+            low += 1
+        return names
+
+    def header(self, offset):
+        """Returns (type number, size, data offset) of the entry at `offset`."""
+        byte = self.pack[offset]
+        offset += 1
+        kind = (byte >> 4) & 7
+        size = byte & 0x0f
+        shift = 4
+        while byte & 0x80:
+            byte = self.pack[offset]
+            offset += 1
+            size |= (byte & 0x7f) << shift
+            shift += 7
+        return kind, size, offset
+
+    def inflate(self, offset, size):
+        decompressor = zlib.decompressobj()
+        chunks = []
+        step = max(4096, size + 64)
+        while not decompressor.eof:
+            chunk = self.pack[offset:offset + step]
+            if not chunk:
+                raise ValueError(f"Truncated pack entry in {self.idx_path}")
+            chunks.append(decompressor.decompress(chunk))
+            offset += step
+        return b"".join(chunks)
+
+    def close(self):
+        self.idx.close()
+        self.pack.close()
+
+
+class GitRepository:
+    """Reads commits, trees and blobs straight from a repository's object database, without a checkout.
+
+    Loose objects are inflated from `objects/xx/...`; packed ones are located through the pack
+    indexes and rebuilt from their offset or ref delta chains. Recently rebuilt objects are kept
+    in a small LRU cache, since delta bases are shared by many objects.
+    """
+
+    def __init__(self, path, cache_bytes=64 * 1024 * 1024):
+        self.git_dir = find_git_dir(path)
+        self.object_dirs = [os.path.join(self.git_dir, "objects")]
+        alternates = os.path.join(self.git_dir, "objects", "info", "alternates")
+        if os.path.exists(alternates):
+            with open(alternates, 'r') as file:
+                self.object_dirs += [os.path.join(self.object_dirs[0], line.strip())
+                                     for line in file if line.strip() and not line.startswith("#")]
+        self.packs = []
+        for directory in self.object_dirs:
+            pack_dir = os.path.join(directory, "pack")
+            if os.path.isdir(pack_dir):
+                self.packs += [PackFile(os.path.join(pack_dir, name))
+                               for name in sorted(os.listdir(pack_dir)) if name.endswith(".idx")]
+        self.cache = OrderedDict()
+        self.cache_bytes = cache_bytes
+        self._cached = 0
+
+    def _remember(self, key, value):
+        self.cache[key] = value
+        self._cached += len(value[1])
+        while self._cached > self.cache_bytes and self.cache:
+            _, (_, data) = self.cache.popitem(last=False)
+            self._cached -= len(data)
+
+    def _packed(self, pack, offset):
+        """Rebuilds the object at a pack offset, following its delta chain iteratively."""
+        chain = []
+        while True:
+            key = (pack.idx_path, offset)
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                kind, data = self.cache[key]
+                break
+            kind, size, data_at = pack.header(offset)
+            if kind == _OFS_DELTA:
+                byte = pack.pack[data_at]
+                data_at += 1
+                distance = byte & 0x7f
+                while byte & 0x80:
+                    byte = pack.pack[data_at]
+                    data_at += 1
+                    distance = ((distance + 1) << 7) | (byte & 0x7f)
+                chain.append((key, pack.inflate(data_at, size)))
+                offset -= distance
+            elif kind == _REF_DELTA:
+                base_sha = pack.pack[data_at:data_at + 20]
+                chain.append((key, pack.inflate(data_at + 20, size)))
+                kind, data = self.read_object(base_sha.hex())
+                break
+            else:
+                kind, data = _TYPES[kind], pack.inflate(data_at, size)
+                self._remember(key, (kind, data))
+                break
+        for key, delta in reversed(chain):
+            data = _apply_delta(data, delta)
+            self._remember(key, (kind, data))
+        return kind, data
+
+    def read_object(self, sha):
+        """Returns (type, raw bytes) of the object with this full hex sha."""
+        for directory in self.object_dirs:
+            path = os.path.join(directory, sha[:2], sha[2:])
+            if os.path.exists(path):
+                with open(path, "rb") as file:
+                    raw = zlib.decompress(file.read())
+                header, _, data = raw.partition(b"\0")
+                return header.split(b" ")[0].decode(), data
+        binary = bytes.fromhex(sha)
+        for pack in self.packs:
+            found = pack.find(binary)
+            if found is not None:
+                return self._packed(pack, found[0])
+        raise KeyError(f"Object {sha} not found in {self.git_dir}")
+
+    def _expand(self, prefix):
+        """Expands an abbreviated sha by looking through loose objects and pack indexes."""
+        matches = set()
+        for directory in self.object_dirs:
+            loose = os.path.join(directory, prefix[:2])
+            if os.path.isdir(loose):
+                matches.update(prefix[:2] + name for name in os.listdir(loose) if name.startswith(prefix[2:]))
+        for pack in self.packs:
+            matches.update(pack.names_with_prefix(prefix))
+        if len(matches) > 1:
+            raise ValueError(f"Ambiguous object prefix {prefix}")
+        return matches.pop() if matches else None
+
+    def _read_ref(self, name):
+        path = os.path.join(self.git_dir, name)
+        if os.path.isfile(path):
+            with open(path, 'r') as file:
+                value = file.read().strip()
+            return self._read_ref(value[5:].strip()) if value.startswith("ref:") else value
+        packed = os.path.join(self.git_dir, "packed-refs")
+        if os.path.exists(packed):
+            with open(packed, 'r') as file:
+                for line in file:
+                    if not line.startswith(("#", "^")) and line.rstrip().endswith(" " + name):
+                        return line.split(" ", 1)[0]
+        return None
+
+    def resolve(self, ref="HEAD"):
+        """Resolves a branch, tag, remote branch, HEAD or (abbreviated) sha to the sha of its commit.
+
+        A `~N` or `^` suffix walks back along first parents, as in `main~3`.
+        """
+        suffix = _ANCESTRY.search(ref).group(0)
+        if suffix:
+            sha = self.resolve(ref[:-len(suffix)])
+            for step in re.findall(r"[~^]\d*", suffix):
+                count = int(step[1:]) if step[1:] else 1
+                if step[0] == "^" and count != 1:
+                    raise ValueError(f"Only first parents are supported in {ref}")
+                for _ in range(count):
+                    parents = [line.split(b" ")[1].decode() for line in self.read_object(sha)[1].split(b"\n\n", 1)[0]
+                               .split(b"\n") if line.startswith(b"parent ")]
+                    if not parents:
+                        raise KeyError(f"{ref} goes back past the root commit")
+                    sha = parents[0]
+            return sha
+        sha = None
+        for name in (ref, f"refs/heads/{ref}", f"refs/tags/{ref}", f"refs/remotes/{ref}"):
+            sha = self._read_ref(name)
+            if sha:
+                break
+        if sha is None and 4 <= len(ref) <= 40 and all(c in "0123456789abcdef" for c in ref.lower()):
+            sha = ref.lower() if len(ref) == 40 else self._expand(ref.lower())
+        if sha is None:
+            raise KeyError(f"Unknown ref {ref} in {self.git_dir}")
+        kind, data = self.read_object(sha)
+        while kind == "tag":
+            sha = data.split(b"\n", 1)[0].split(b" ")[1].decode()
+            kind, data = self.read_object(sha)
+        if kind != "commit":
+            raise ValueError(f"{ref} points to a {kind}, not a commit")
+        return sha
+
+    def tree_of(self, ref="HEAD"):
+        _, data = self.read_object(self.resolve(ref))
+        return data.split(b"\n", 1)[0].split(b" ")[1].decode()
+
+    def _entries(self, tree_sha):
+        """Yields (name, mode, sha) for the entries of one tree object."""
+        _, data = self.read_object(tree_sha)
+        position = 0
+        while position < len(data):
+            space = data.index(b" ", position)
+            null = data.index(b"\0", space)
+            yield (data[space + 1:null].decode("utf-8", errors="surrogateescape"), data[position:space],
+                   data[null + 1:null + 21].hex())
+            position = null + 21
+
+    def walk_tree(self, tree_sha, prefix=""):
+        """Yields (path, mode, sha) for every blob under a tree, recursing into subtrees."""
+        for name, mode, sha in self._entries(tree_sha):
+            if mode == b"40000":
+                yield from self.walk_tree(sha, f"{prefix}{name}/")
+            else:
+                yield f"{prefix}{name}", mode, sha
+
+    def list_files(self, ref="HEAD", prefix="", suffix=".py", excludes=DEFAULT_EXCLUDES):
+        """Returns [(path, blob sha)] of regular `suffix` files under `prefix` at `ref`, skipping excluded directories."""
+        prefix = prefix.strip("/")
+        tree = self.tree_of(ref)
+        if prefix:
+            for part in prefix.split("/"):
+                entries = {name: sha for name, mode, sha in self._entries(tree) if mode == b"40000"}
+                if part not in entries:
+                    return []
+                tree = entries[part]
+            prefix += "/"
+        files = []
+        for path, mode, sha in self.walk_tree(tree, prefix):
+            parts = path.split("/")
+            if mode in _BLOB_MODES and path.endswith(suffix) and not any(excluded(part, excludes) for part in parts[:-1]):
+                files.append((path, sha))
+        return files
+
+    def iter_sources(self, ref="HEAD", prefix="", suffix=".py"):
+        """Yields (path, blob sha, text) for every source file at `ref`; undecodable files are skipped."""
+        for path, sha in self.list_files(ref, prefix, suffix):
+            _, data = self.read_object(sha)
+            try:
+                yield path, sha, data.decode("utf-8")
+            except UnicodeDecodeError:
+                print(f"Skipping {path}: not UTF-8")
+
+    def close(self):
+        for pack in self.packs:
+            pack.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List or print source files from a git object database")
+    parser.add_argument("repository", help="Bare or normal git repository")
+    parser.add_argument("--ref", default="HEAD", help="Branch, tag or commit")
+    parser.add_argument("--prefix", default="", help="Only files under this directory")
+    parser.add_argument("--cat", help="Print this file instead of listing")
+    args = parser.parse_args()
+
+    repository = GitRepository(args.repository)
+    try:
+        if args.cat:
+            matches = [sha for path, sha in repository.list_files(args.ref, suffix="") if path == args.cat]
+            if not matches:
+                raise SystemExit(f"{args.cat} not found at {args.ref}")
+            print(repository.read_object(matches[0])[1].decode("utf-8", errors="replace"), end="")
+        else:
+            files = repository.list_files(args.ref, args.prefix)
+            for path, sha in files:
+                print(f"{sha}  {path}")
+            print(f"{len(files)} files at {args.ref} ({repository.resolve(args.ref)[:12]})")
+    finally:
+        repository.close()
+
+#usage python git_objects.py /srv/mirrors/pip.git --ref release/24.0 --prefix src/pip
+#usage python git_objects.py /srv/mirrors/pip.git --ref v24.0 --cat src/pip/__init__.py
@@ -5,9 +5,12 @@ import argparse
 import ast
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
 
+# Overridable so the fetch path can run against a local stand-in (see github_stub_server.py)
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+
 def get_github_file_content(owner, repo, filepath, branch="main"):
     """Fetches the content of a file from a GitHub repository."""
-    url = f"https://api.github.com/repos/{owner}/{repo}/contents/{filepath}?ref={branch}"
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/contents/{filepath}?ref={branch}"
     headers = {}
 
     # Add GitHub token if available for authentication
@@ -31,7 +34,7 @@ def get_github_file_content(owner, repo, filepath, branch="main"):
 
 def get_github_files_in_directory(owner, repo, directory_path, branch="main"):
     """Recursively fetches all Python files in a GitHub directory."""
-    url = f"https://api.github.com/repos/{owner}/{repo}/contents/{directory_path}?ref={branch}"
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/contents/{directory_path}?ref={branch}"
     headers = {"Authorization": f"token {os.getenv('GITHUB_TOKEN')}"}
     response = requests.get(url, headers=headers)
     files = []
@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import random
+import base64
+import argparse
+import fnmatch
+from datetime import datetime, timezone
+
+import requests
+
+import metrics
+
+REST_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+GRAPHQL_URL = f"{REST_URL}/graphql"
+# Error types GitHub returns when a query is too big or too slow; the batch is split and retried
+_SPLIT_ERRORS = {"RESOURCE_LIMITS_EXCEEDED", "MAX_NODE_LIMIT_EXCEEDED", "TIMEOUT"}
+
+
+def rate_limit_delay(response, attempt, cap=60.0):
+    """Seconds to wait before retrying a rate-limited response, or None if it wasn't rate limiting.
+
+    Secondary limits (429, or 403 with Retry-After) wait at least Retry-After, backing off with
+    full jitter; an exhausted primary limit (403 with no requests remaining) waits for the reset.
+    """
+    if response.status_code not in (403, 429):
+        return None
+    retry_after = response.headers.get("Retry-After")
+    backoff = random.uniform(0, min(cap, 2 ** attempt))
+    if retry_after:
+        try:
+            return max(backoff, float(retry_after))
+        except ValueError:
+            return backoff
+    if response.headers.get("X-RateLimit-Remaining") == "0" and response.headers.get("X-RateLimit-Reset"):
+        return max(0.0, float(response.headers["X-RateLimit-Reset"]) - time.time()) + 1
+    return backoff if response.status_code == 429 else None
+
+
+def send_with_retry(send, what, max_retries=5, on_retry=None):
+    """Calls `send()` for a response, retrying while GitHub rate limits it; returns the last response.
+
+    Each attempt is timed as a fetch; `on_retry()` is called before every retry. Requests that
+    are still limited after `max_retries` retries are returned for the caller to report.
+    """
+    for attempt in range(max_retries + 1):
+        with metrics.stage("fetch") as stage:
+            response = send()
+            stage.add(bytes=len(response.content))
+        delay = rate_limit_delay(response, attempt)
+        if delay is None or attempt == max_retries:
+            return response
+        if on_retry is not None:
+            on_retry()
+        metrics.count("fetch", retries=1)
+        print(f"{what} rate limited ({response.status_code}); retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+
+def blob_query(paths, branch):
+    """Builds one query fetching every path as an aliased `object(expression: "branch:path")` field."""
+    fields = "\n".join(
+        f"    f{i}: object(expression: {json.dumps(f'{branch}:{path}')}) "
+        "{ ... on Blob { text byteSize isBinary isTruncated } }"
+        for i, path in enumerate(paths))
+    return ("query($owner: String!, $name: String!) {\n"
+            "  rateLimit { cost remaining resetAt }\n"
+            f"  repository(owner: $owner, name: $name) {{\n{fields}\n  }}\n}}")
+
+
+def list_tree(owner, repo, branch="main", prefix="", pattern="*.py", token=None, session=None, max_retries=5):
+    """Lists the blobs under `prefix` matching `pattern` with one recursive Trees call; returns {path: size}."""
+    session = session or requests.Session()
+    headers = {"Authorization": f"token {token}"} if token else {}
+    url = f"{REST_URL}/repos/{owner}/{repo}/git/trees/{branch}?recursive=1"
+    response = send_with_retry(lambda: session.get(url, headers=headers), "Tree listing", max_retries)
+    if response.status_code != 200:
+        print("Error listing repository tree:", response.status_code, response.text[:200])
+        return {}
+    prefix = prefix.strip("/")
+    return {item["path"]: item.get("size", 0) for item in response.json()["tree"]
+            if item["type"] == "blob" and fnmatch.fnmatch(os.path.basename(item["path"]), pattern)
+            and (not prefix or item["path"] == prefix or item["path"].startswith(prefix + "/"))}
+
+
+class GraphQLBlobFetcher:
+    """Fetches many files of one repository per GitHub GraphQL query.
+
+    Paths are grouped into batches of at most `batch_size` aliases and, when sizes are known,
+    `max_bytes` of content. A batch that times out or exceeds GitHub's resource limits is split
+    and retried, and the ceiling drops below the size that failed; after successes the batch size
+    grows back towards that ceiling.
+    Blobs GraphQL won't return as text (binary or truncated large files) are fetched through the
+    Contents API. Needs a token: GitHub's GraphQL endpoint rejects anonymous requests.
+    """
+
+    def __init__(self, owner, repo, branch="main", token=None, batch_size=100, max_batch=250,
+                 max_bytes=2_000_000, session=None, max_retries=5):
+        self.owner = owner
+        self.repo = repo
+        self.branch = branch
+        self.token = token or os.getenv("GITHUB_TOKEN")
+        if not self.token:
+            raise ValueError("The GitHub GraphQL API needs a token; set GITHUB_TOKEN")
+        self.batch_size = batch_size
+        self.max_batch = max_batch
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        self.session = session or requests.Session()
+        self.session.headers["Authorization"] = f"bearer {self.token}"
+        self.stats = {"files": 0, "queries": 0, "splits": 0, "fallbacks": 0, "cost": 0, "bytes": 0,
+                      "throttled": 0}
+
+    def _batches(self, paths, sizes):
+        batch, batch_bytes = [], 0
+        for path in paths:
+            size = sizes.get(path, 0)
+            if batch and (len(batch) >= self.batch_size or batch_bytes + size > self.max_bytes):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(path)
+            batch_bytes += size
+        if batch:
+            yield batch
+
+    def _wait_for_rate_limit(self, rate_limit):
+        if not rate_limit:
+            return
+        self.stats["cost"] += rate_limit["cost"]
+        if rate_limit["remaining"] < 2 * max(rate_limit["cost"], 1):
+            reset = datetime.fromisoformat(rate_limit["resetAt"].replace("Z", "+00:00"))
+            pause = max(0.0, (reset - datetime.now(timezone.utc)).total_seconds()) + 1
+            print(f"GraphQL rate limit nearly spent; waiting {pause:.0f}s for the reset")
+            time.sleep(pause)
+
+    def _query(self, paths):
+        """Runs one query; returns {alias index: blob or None}, or None if the batch must be split."""
+        body = {"query": blob_query(paths, self.branch), "variables": {"owner": self.owner, "name": self.repo}}
+        try:
+            response = send_with_retry(lambda: self.session.post(GRAPHQL_URL, json=body, timeout=30),
+                                       "GraphQL request", self.max_retries, self._throttled)
+        except requests.Timeout:
+            return None
+        self.stats["queries"] += 1
+        self.stats["bytes"] += len(response.content)
+        if response.status_code in (502, 503, 504):
+            return None
+        if response.status_code != 200:
+            raise RuntimeError(f"GraphQL request failed: {response.status_code} {response.text[:200]}")
+        result = response.json()
+        errors = result.get("errors") or []
+        if any(error.get("type") in _SPLIT_ERRORS or "timeout" in error.get("message", "").lower()
+               for error in errors):
+            return None
+        data = result.get("data") or {}
+        if data.get("repository") is None:
+            raise RuntimeError(f"GraphQL query failed: {errors or result}")
+        self._wait_for_rate_limit(data.get("rateLimit"))
+        return data["repository"]
+
+    def _throttled(self):
+        self.stats["throttled"] += 1
+
+    def _fallback(self, path):
+        """Fetches one file through the Contents API."""
+        self.stats["fallbacks"] += 1
+        url = f"{REST_URL}/repos/{self.owner}/{self.repo}/contents/{path}?ref={self.branch}"
+        response = send_with_retry(lambda: self.session.get(url, headers={"Authorization": f"token {self.token}"}),
+                                   f"Fetching {path}", self.max_retries, self._throttled)
+        if response.status_code != 200:
+            print(f"Error fetching file {path}:", response.status_code)
+            return None
+        content = response.json().get("content")
+        if content is None:
+            return None
+        try:
+            return base64.b64decode(content).decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+
+    def _fetch_batch(self, paths):
+        repository = self._query(paths)
+        if repository is None:
+            self.stats["splits"] += 1
+            if len(paths) == 1:
+                yield paths[0], self._fallback(paths[0])
+                return
+            # Shrink future batches too, and never grow back to a size that already failed
+            self.max_batch = max(1, len(paths) * 3 // 4)
+            self.batch_size = max(1, len(paths) // 2)
+            middle = len(paths) // 2
+            yield from self._fetch_batch(paths[:middle])
+            yield from self._fetch_batch(paths[middle:])
+            return
+        self.batch_size = min(self.max_batch, max(self.batch_size, len(paths) * 5 // 4 + 1))
+        for i, path in enumerate(paths):
+            blob = repository.get(f"f{i}")
+            if blob is None:
+                print(f"{path} not found on {self.branch}")
+                yield path, None
+            elif blob.get("isBinary"):
+                yield path, None
+            elif blob.get("isTruncated") or blob.get("text") is None:
+                yield path, self._fallback(path)
+            else:
+                yield path, blob["text"]
+
+    def fetch(self, paths, sizes=None):
+        """Yields (path, text) for every path in order, with None for missing or binary files."""
+        sizes = sizes or {}
+        pending = list(paths)
+        while pending:
+            batch = next(self._batches(pending, sizes))
+            pending = pending[len(batch):]
+            for path, text in self._fetch_batch(batch):
+                if text is not None:
+                    self.stats["files"] += 1
+                yield path, text
+
+    def report(self):
+        stats = self.stats
+        return (f"graphql: {stats['files']} files in {stats['queries']} queries ({stats['splits']} splits, "
+                f"{stats['fallbacks']} REST fallbacks, {stats['throttled']} rate-limit retries), "
+                f"{stats['bytes'] / 1e6:.1f} MB, rate limit cost {stats['cost']}")
+
+
+def read_path_list(path):
+    """Reads one repository path per line (e.g. from `git diff --name-only`), skipping blanks and comments."""
+    with open(path, 'r') as file:
+        return [line.strip() for line in file if line.strip() and not line.startswith("#")]
+
+
+def add_graphql_arguments(parser):
+    parser.add_argument("--graphql", action="store_true",
+                        help="With --github, fetch files in batched GraphQL queries instead of one request each")
+    parser.add_argument("--paths_from", help="With --graphql, fetch only the paths listed in this file (one per line)")
+    parser.add_argument("--graphql_batch", type=int, default=100, help="Initial files per GraphQL query")
+
+
+def sparse_paths(args, prefix=""):
+    """Returns ([paths], {path: size}) to fetch: the --paths_from list, or the .py files under `prefix`."""
+    if args.paths_from:
+        return [path for path in read_path_list(args.paths_from) if path.endswith(".py")], {}
+    sizes = list_tree(args.owner, args.repo, args.branch, prefix, token=os.getenv("GITHUB_TOKEN"))
+    return sorted(sizes), sizes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch a sparse set of repository files in batched GraphQL queries")
+    parser.add_argument("--owner", default="pypa", help="GitHub repository owner")
+    parser.add_argument("--repo", default="sampleproject", help="GitHub repository name")
+    parser.add_argument("--branch", default="main", help="GitHub branch")
+    parser.add_argument("--prefix", default="", help="Only fetch .py files under this directory")
+    parser.add_argument("--paths_from", help="Fetch only the paths listed in this file (one per line)")
+    parser.add_argument("--batch_size", type=int, default=100, help="Initial files per query")
+    parser.add_argument("--output", help="Write the files under this directory")
+    args = parser.parse_args()
+
+    paths, sizes = sparse_paths(args, args.prefix)
+    fetcher = GraphQLBlobFetcher(args.owner, args.repo, args.branch, batch_size=args.batch_size)
+    start = time.perf_counter()
+    for path, text in fetcher.fetch(paths, sizes):
+        if text is not None and args.output:
+            target = os.path.join(args.output, path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'w') as file:
+                file.write(text)
+    print(fetcher.report())
+    print(f"{len(paths)} paths in {time.perf_counter() - start:.1f}s")
+
+#usage python github_graphql.py --owner pypa --repo pip --prefix src/pip/_internal --output pip_sources
+#usage git diff --name-only HEAD~20 > changed.txt && python github_graphql.py --owner pypa --repo pip --paths_from changed.txt
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import tarfile
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from code_units import signature_of
+from github_stub_server import start_stub_server
+
+MODES = ("contents", "graphql", "tarball")
+
+
+def stand_in_summarizer(summary_delay=0.0):
+    """A model-free summarizer that sleeps `summary_delay` per function and returns its signature."""
+    def summarize(name, func_code):
+        time.sleep(summary_delay)
+        return signature_of(func_code)
+    return summarize
+
+
+def model_summarizer(model_choice, max_length=100):
+    """Loads one of cody_docu's models and returns a summarizer that runs it on each function."""
+    import cody_docu
+
+    pipeline_model = cody_docu.initialize_model(model_choice)
+    return lambda name, func_code: cody_docu.summarize_function(name, func_code, pipeline_model, max_length)
+
+
+class FirstSummary:
+    """Summarizes fetched files with `summarize(name, func_code)` and notes when the first summary was ready."""
+
+    def __init__(self, started, summarize):
+        from cody_docu import extract_functions
+
+        self.extract_functions = extract_functions
+        self.started = started
+        self.summarize = summarize
+        self.first = None
+        self.files = 0
+        self.functions = 0
+
+    def __call__(self, filepath, code_content):
+        if not code_content:
+            return
+        try:
+            functions = self.extract_functions(code_content)
+        except SyntaxError:
+            return
+        for name, func_code in functions:
+            self.summarize(name, func_code)
+            if self.first is None:
+                self.first = time.perf_counter() - self.started
+        self.files += 1
+        self.functions += len(functions)
+
+
+def run_contents(args, summarize):
+    """One Contents call per directory to list and one per file, `concurrency` files at a time."""
+    import cody_docu
+
+    files = cody_docu.get_github_files_in_directory(args.owner, args.repo, args.path, args.branch)
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = {executor.submit(cody_docu.get_github_file_content, args.owner, args.repo, filepath, args.branch):
+                   filepath for filepath in files}
+        for future in as_completed(futures):
+            summarize(futures[future], future.result())
+
+
+def run_graphql(args, summarize):
+    """One Trees call to list, then batched GraphQL blob queries."""
+    from github_graphql import GraphQLBlobFetcher, list_tree
+
+    sizes = list_tree(args.owner, args.repo, args.branch, args.path, token=os.getenv("GITHUB_TOKEN"))
+    fetcher = GraphQLBlobFetcher(args.owner, args.repo, args.branch, batch_size=args.graphql_batch)
+    for filepath, code_content in fetcher.fetch(sorted(sizes), sizes):
+        summarize(filepath, code_content)
+
+
+def run_tarball(args, summarize):
+    """One tarball download, streamed member by member."""
+    from cody_docu import GITHUB_API_URL
+
+    url = f"{GITHUB_API_URL}/repos/{args.owner}/{args.repo}/tarball/{args.branch}"
+    response = requests.get(url, stream=True)
+    response.raise_for_status()
+    prefix = args.path.strip("/")
+    with tarfile.open(fileobj=response.raw, mode="r|gz") as archive:
+        for member in archive:
+            filepath = member.name.split("/", 1)[-1]
+            if member.isfile() and filepath.endswith(".py") and (not prefix or filepath.startswith(prefix + "/")):
+                summarize(filepath, archive.extractfile(member).read().decode("utf-8", errors="replace"))
+
+
+def server_counts(base_url):
+    return requests.get(f"{base_url}/stats").json()
+
+
+def load_test(args, base_url, summarizer):
+    """Runs every mode `rounds` times with `summarizer` and returns one result dict per run."""
+    runners = {"contents": run_contents, "graphql": run_graphql, "tarball": run_tarball}
+    results = []
+    for mode in args.modes:
+        for round_number in range(args.rounds):
+            before = server_counts(base_url)
+            started = time.perf_counter()
+            summarize = FirstSummary(started, summarizer)
+            try:
+                runners[mode](args, summarize)
+                error = None
+            except Exception as e:
+                error = str(e)
+            seconds = time.perf_counter() - started
+            after = server_counts(base_url)
+            requests_made = sum(after[key] - before.get(key, 0) for key in after if key not in ("bytes", "used"))
+            results.append({
+                "mode": mode, "round": round_number, "summarizer": args.model or "stand-in", "seconds": round(seconds, 3), "files": summarize.files,
+                "functions": summarize.functions, "requests": requests_made,
+                "requests_per_sec": round(requests_made / seconds, 1) if seconds else 0.0,
+                "files_per_sec": round(summarize.files / seconds, 1) if seconds else 0.0,
+                "first_summary_s": round(summarize.first, 3) if summarize.first is not None else None,
+                "throttled": sum(after.get(key, 0) - before.get(key, 0) for key in ("403", "429")),
+                "mb": round((after["bytes"] - before["bytes"]) / 1e6, 2), "error": error,
+            })
+    return results
+
+
+def print_results(results):
+    print(f"{'mode':<10}{'files':>7}{'requests':>10}{'req/s':>8}{'files/s':>9}{'first s':>9}{'total s':>9}"
+          f"{'throttled':>11}{'MB':>7}")
+    for result in results:
+        first = result["first_summary_s"] if result["first_summary_s"] is not None else "-"
+        print(f"{result['mode']:<10}{result['files']:>7}{result['requests']:>10}{result['requests_per_sec']:>8}"
+              f"{result['files_per_sec']:>9}{first:>9}{result['seconds']:>9}{result['throttled']:>11}{result['mb']:>7}"
+              + (f"  error: {result['error']}" if result["error"] else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the GitHub fetch paths against the local API stand-in")
+    parser.add_argument("--base_url", help="Use an already running stand-in instead of starting one")
+    parser.add_argument("--root", default=".", help="Fixture directory for the in-process stand-in")
+    parser.add_argument("--latency", type=float, default=0.02, help="Stand-in response latency in seconds")
+    parser.add_argument("--rate_limit", type=int, default=0, help="Stand-in requests per window before 403s")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Stand-in share of 403/429 responses")
+    parser.add_argument("--owner", default="stub", help="Repository owner in request paths")
+    parser.add_argument("--repo", default="fixture", help="Repository name in request paths")
+    parser.add_argument("--branch", default="main", help="Ref in request paths")
+    parser.add_argument("--path", default="", help="Directory to fetch")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES), help="Fetch paths to exercise")
+    parser.add_argument("--rounds", type=int, default=1, help="Runs per mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel requests in contents mode")
+    parser.add_argument("--graphql_batch", type=int, default=100, help="Initial files per GraphQL query")
+    parser.add_argument("--model", help="Summarize with this cody_docu model (e.g. codet5-small) instead of a stand-in")
+    parser.add_argument("--max_length", type=int, default=100, help="With --model, maximum summary length")
+    parser.add_argument("--summary_delay", type=float, default=0.0,
+                        help="Without --model, simulated seconds per function summary")
+    parser.add_argument("--output", help="Also write the results as JSON here")
+    args = parser.parse_args()
+
+    if args.model:
+        import cody_docu
+
+        if args.model not in cody_docu.AVAILABLE_MODELS:
+            parser.error(f"Unknown model {args.model}; choose from {', '.join(cody_docu.AVAILABLE_MODELS)}")
+        # Loaded before the clock starts, so time to first summary covers fetching and inference only
+        summarizer = model_summarizer(args.model, args.max_length)
+    else:
+        summarizer = stand_in_summarizer(args.summary_delay)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server, base_url = start_stub_server(args.root, latency=args.latency, rate_limit=args.rate_limit,
+                                             error_rate=args.error_rate)
+    # The fetch modules read these when first imported, which happens inside the runners
+    os.environ["GITHUB_API_URL"] = base_url
+    os.environ.setdefault("GITHUB_TOKEN", "stub-token")
+    try:
+        results = load_test(args, base_url, summarizer)
+    finally:
+        if server is not None:
+            server.shutdown()
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+#usage python github_load_test.py --root path/to/fixture --latency 0.05 --concurrency 16 --rounds 3
+#usage python github_load_test.py --root path/to/fixture --modes graphql tarball --model codet5-small
+#usage python github_load_test.py --base_url http://127.0.0.1:8090 --modes contents graphql --error_rate 0.05
@@ -0,0 +1,278 @@
+import io
+import os
+import re
+import json
+import time
+import base64
+import random
+import hashlib
+import tarfile
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from source_scan import scan_source_files
+
+_ALIAS = re.compile(r'(\w+)\s*:\s*object\(\s*expression:\s*("(?:[^"\\]|\\.)*")\s*\)')
+
+
+def git_blob_sha(data):
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class FixtureRepo:
+    """An in-memory snapshot of a directory that the stub serves as every owner/repo at every ref."""
+
+    def __init__(self, root, suffix=""):
+        self.root = root
+        self.files = {}
+        for path in scan_source_files(root, suffix=suffix):
+            with open(path, "rb") as file:
+                self.files[os.path.relpath(path, root).replace(os.sep, "/")] = file.read()
+        self.shas = {path: git_blob_sha(data) for path, data in self.files.items()}
+        self.directories = {"/".join(path.split("/")[:i]) for path in self.files for i in range(1, path.count("/") + 1)}
+        self.commit = hashlib.sha1("".join(sorted(self.shas.values())).encode()).hexdigest()
+        self._tarball = None
+
+    def entry(self, path):
+        """Returns a Contents API item for a file or directory."""
+        name = path.rsplit("/", 1)[-1]
+        if path in self.files:
+            return {"type": "file", "name": name, "path": path, "sha": self.shas[path], "size": len(self.files[path])}
+        return {"type": "dir", "name": name, "path": path, "sha": hashlib.sha1(path.encode()).hexdigest(), "size": 0}
+
+    def children(self, directory):
+        prefix = f"{directory}/" if directory else ""
+        names = {path[len(prefix):].split("/")[0] for path in list(self.files) + list(self.directories)
+                 if path.startswith(prefix) and path != directory}
+        return [self.entry(prefix + name) for name in sorted(names)]
+
+    def tree(self, recursive):
+        items = sorted(self.files) + sorted(self.directories)
+        if not recursive:
+            items = [path for path in items if "/" not in path]
+        return [{"path": path, "mode": "100644" if path in self.files else "040000",
+                 "type": "blob" if path in self.files else "tree", "sha": self.entry(path)["sha"],
+                 **({"size": len(self.files[path])} if path in self.files else {})} for path in sorted(items)]
+
+    def tarball(self, prefix):
+        if self._tarball is None:
+            buffer = io.BytesIO()
+            with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+                for path, data in sorted(self.files.items()):
+                    info = tarfile.TarInfo(f"{prefix}/{path}")
+                    info.size = len(data)
+                    archive.addfile(info, io.BytesIO(data))
+            self._tarball = buffer.getvalue()
+        return self._tarball
+
+
+class GitHubStubState:
+    """Shared settings and counters: latency, an hourly-style rate limit window, and injected errors."""
+
+    def __init__(self, repo, latency=0.02, jitter=0.01, rate_limit=5000, rate_window=3600, error_rate=0.0,
+                 graphql_max_aliases=0, seed=None):
+        self.repo = repo
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.error_rate = error_rate
+        self.graphql_max_aliases = graphql_max_aliases
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window_start = time.time()
+        self.used = 0
+        self.counts = {"ok": 0, "304": 0, "403": 0, "429": 0, "404": 0, "bytes": 0}
+
+    @property
+    def limit(self):
+        # With no limit configured, report GitHub's authenticated quota and never run out
+        return self.rate_limit or 5000
+
+    def remaining(self):
+        return max(0, self.limit - self.used) if self.rate_limit else self.limit
+
+    def charge(self):
+        """Counts one request against the window; returns (status or None, rate-limit headers)."""
+        with self.lock:
+            now = time.time()
+            if now - self.window_start >= self.rate_window:
+                self.window_start, self.used = now, 0
+            self.used += 1
+            headers = {"X-RateLimit-Limit": str(self.limit),
+                       "X-RateLimit-Remaining": str(self.remaining()),
+                       "X-RateLimit-Used": str(min(self.used, self.limit)),
+                       "X-RateLimit-Reset": str(int(self.window_start + self.rate_window)),
+                       "X-RateLimit-Resource": "core"}
+            if self.rate_limit and self.used > self.rate_limit:
+                return 403, headers
+            roll = self.random.random()
+            if roll < self.error_rate / 2:
+                return 429, dict(headers, **{"Retry-After": "1"})
+            if roll < self.error_rate:
+                # GitHub's secondary rate limit answers 403 with Retry-After
+                return 403, dict(headers, **{"Retry-After": "1"})
+            return None, headers
+
+    def count(self, status, size=0):
+        key = "ok" if status == 200 else str(status)
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.counts["bytes"] += size
+
+    def refund(self):
+        """Conditional requests answered with 304 don't count against GitHub's rate limit."""
+        with self.lock:
+            self.used = max(0, self.used - 1)
+
+
+def make_handler(state):
+    class GitHubStubHandler(BaseHTTPRequestHandler):
+        """Answers the Contents, Trees, tarball and GraphQL endpoints from the fixture repository."""
+
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body, content_type="application/json", headers=None, record=True):
+            etag = f'W/"{hashlib.sha1(body).hexdigest()}"'
+            if status == 200 and self.headers.get("If-None-Match") == etag:
+                state.refund()
+                status, body = 304, b""
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if status in (200, 304):
+                self.send_header("ETag", etag)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+            if record:
+                state.count(status, len(body))
+
+        def _send_json(self, status, payload, headers=None, record=True):
+            self._send(status, json.dumps(payload).encode("utf-8"), headers=headers, record=record)
+
+        def _gate(self):
+            """Sleeps for the configured latency and applies the rate limit; returns headers, or None if refused."""
+            time.sleep(max(0.0, state.latency + state.random.uniform(-state.jitter, state.jitter)))
+            status, headers = state.charge()
+            if status == 403 and "Retry-After" not in headers:
+                self._send_json(403, {"message": "API rate limit exceeded",
+                                      "documentation_url": "https://docs.github.com/rest/rate-limit"}, headers)
+                return None
+            if status is not None:
+                self._send_json(status, {"message": "You have exceeded a secondary rate limit"}, headers)
+                return None
+            return headers
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/stats":
+                self._send_json(200, dict(state.counts, used=state.used), record=False)
+                return
+            headers = self._gate()
+            if headers is None:
+                return
+            query = parse_qs(url.query)
+            parts = [unquote(part) for part in url.path.strip("/").split("/")]
+            if len(parts) < 4 or parts[0] != "repos":
+                self._send_json(404, {"message": "Not Found"}, headers)
+                return
+            owner, repo, endpoint, rest = parts[1], parts[2], parts[3], "/".join(parts[4:])
+            fixture = state.repo
+            if endpoint == "contents":
+                path = rest.strip("/")
+                if path in fixture.files:
+                    item = fixture.entry(path)
+                    encoded = base64.encodebytes(fixture.files[path]).decode("ascii")
+                    self._send_json(200, dict(item, content=encoded, encoding="base64"), headers)
+                elif path in fixture.directories or not path:
+                    self._send_json(200, fixture.children(path), headers)
+                else:
+                    self._send_json(404, {"message": "Not Found"}, headers)
+            elif endpoint == "git" and rest.startswith("trees/"):
+                recursive = query.get("recursive", ["0"])[0] not in ("0", "false", "")
+                self._send_json(200, {"sha": fixture.commit, "tree": fixture.tree(recursive), "truncated": False},
+                                headers)
+            elif endpoint == "tarball":
+                prefix = f"{owner}-{repo}-{fixture.commit[:7]}"
+                self._send(200, fixture.tarball(prefix), "application/x-gzip", headers)
+            else:
+                self._send_json(404, {"message": "Not Found"}, headers)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if urlsplit(self.path).path.rstrip("/") != "/graphql":
+                self._send_json(404, {"message": "Not Found"})
+                return
+            headers = self._gate()
+            if headers is None:
+                return
+            aliases = _ALIAS.findall(request.get("query", ""))
+            if state.graphql_max_aliases and len(aliases) > state.graphql_max_aliases:
+                self._send_json(200, {"errors": [{"type": "RESOURCE_LIMITS_EXCEEDED",
+                                                  "message": "Resource limits for this query exceeded."}]}, headers)
+                return
+            repository = {}
+            for alias, expression in aliases:
+                _, _, path = json.loads(expression).partition(":")
+                data = state.repo.files.get(path)
+                if data is None:
+                    repository[alias] = None
+                    continue
+                try:
+                    text, binary = data.decode("utf-8"), False
+                except UnicodeDecodeError:
+                    text, binary = None, True
+                repository[alias] = {"text": text, "byteSize": len(data), "isBinary": binary, "isTruncated": False}
+            rate_limit = {"cost": 1, "remaining": state.remaining(),
+                          "resetAt": time.strftime("%Y-%m-%dT%H:%M:%SZ",
+                                                   time.gmtime(state.window_start + state.rate_window))}
+            self._send_json(200, {"data": {"rateLimit": rate_limit, "repository": repository}}, headers)
+
+    return GitHubStubHandler
+
+
+def start_stub_server(root=".", host="127.0.0.1", port=0, **state_kwargs):
+    """Starts the stub server over the fixture `root` in a background thread and returns (server, base_url)."""
+    state = GitHubStubState(FixtureRepo(root), **state_kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.state = state
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the GitHub REST and GraphQL APIs")
+    parser.add_argument("--root", default=".", help="Directory served as the fixture repository")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8090, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.02, help="Base response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Random latency jitter in seconds")
+    parser.add_argument("--rate_limit", type=int, default=5000, help="Requests per window before 403s (0 = unlimited)")
+    parser.add_argument("--rate_window", type=float, default=3600, help="Rate limit window in seconds")
+    parser.add_argument("--error_rate", type=float, default=0.0,
+                        help="Fraction of requests answered with secondary-rate-limit 403/429")
+    parser.add_argument("--graphql_max_aliases", type=int, default=0,
+                        help="Fail GraphQL queries with more aliases than this with RESOURCE_LIMITS_EXCEEDED")
+    args = parser.parse_args()
+
+    state = GitHubStubState(FixtureRepo(args.root), args.latency, args.jitter, args.rate_limit, args.rate_window,
+                            args.error_rate, args.graphql_max_aliases)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"Stub GitHub API serving {len(state.repo.files)} files from {args.root} on http://{args.host}:{args.port}")
+    print(f"Point the tools at it with GITHUB_API_URL=http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Request counts: {state.counts}")
+
+# Usage example:
+# python github_stub_server.py --root path/to/fixture --latency 0.05 --rate_limit 600 --error_rate 0.05
@@ -0,0 +1,142 @@
+import os
+import json
+
+
+class RunJournal:
+    """Append-only JSON-lines journal of completed work, so an interrupted run can resume.
+
+    Every function summary is appended as one `{"file", "index", "name", "summary"}` line (with a
+    `"source"` when it is known) and a `{"file", "done": true}` line marks a file as finished.
+    Each line goes out in a single write followed by fsync, so a crash can at worst leave a torn
+    last line, which is dropped on load. Without `resume`, an existing non-empty journal is only
+    replaced when `overwrite` is set.
+    """
+
+    def __init__(self, path, resume=False, overwrite=False):
+        self.path = path
+        self.summaries = {}
+        self.sources = {}
+        self.done = set()
+        if resume and os.path.exists(path):
+            self._load()
+        else:
+            if not overwrite and os.path.exists(path) and os.path.getsize(path) > 0:
+                raise FileExistsError(f"{path} already holds completed work; use --resume to continue it "
+                                      f"or --overwrite_journal to start over")
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "w"):
+                pass
+            os.replace(temp_path, path)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _load(self):
+        with open(self.path, "rb") as file:
+            data = file.read()
+        good = 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            good += len(line)
+            if entry.get("done"):
+                self.done.add(entry["file"])
+            else:
+                key = (entry["file"], entry["index"], entry["name"])
+                self.summaries[key] = entry["summary"]
+                if entry.get("source"):
+                    self.sources[key] = entry["source"]
+        if good < len(data):
+            print(f"Dropping {len(data) - good} bytes of incomplete journal entries from {self.path}")
+            with open(self.path, "r+b") as file:
+                file.truncate(good)
+        print(f"Resuming from {self.path}: {len(self.done)} files and {len(self.summaries)} functions done")
+
+    def _append(self, entry):
+        os.write(self._fd, (json.dumps(entry) + "\n").encode("utf-8"))
+        os.fsync(self._fd)
+
+    def file_done(self, filepath):
+        return filepath in self.done
+
+    def file_summaries(self, filepath):
+        """Returns the journaled summaries of a file in function order."""
+        entries = sorted((key[1], summary) for key, summary in self.summaries.items() if key[0] == filepath)
+        return [summary for _, summary in entries]
+
+    def file_sources(self, filepath, functions, source=None):
+        """Returns what produced each of a file's summaries: the journaled source, else `source(function)`."""
+        return [self.sources.get((filepath, index, function[0])) or (source(function) if source else None)
+                for index, function in enumerate(functions)]
+
+    def summarize_file(self, filepath, functions, summarize, source=None):
+        """Summarizes a file's functions with `summarize(function)`, skipping and recording journaled work.
+
+        `functions` are the tuples returned by extract_functions, whose first item is the name.
+        `source(function)`, if given, is called after each summary and its result is journaled with it.
+        """
+        summaries = []
+        for index, function in enumerate(functions):
+            key = (filepath, index, function[0])
+            if key not in self.summaries:
+                self.summaries[key] = summarize(function)
+                entry = {"file": filepath, "index": index, "name": function[0], "summary": self.summaries[key]}
+                tag = source(function) if source is not None else None
+                if tag:
+                    self.sources[key] = entry["source"] = tag
+                self._append(entry)
+            summaries.append(self.summaries[key])
+        self.finish_file(filepath)
+        return summaries
+
+    def finish_file(self, filepath):
+        if filepath not in self.done:
+            self.done.add(filepath)
+            self._append({"file": filepath, "done": True})
+
+    def close(self):
+        os.close(self._fd)
+
+
+class _NullJournal:
+    """Stand-in used without --journal: nothing is skipped and nothing is recorded."""
+
+    def file_done(self, filepath):
+        return False
+
+    def file_summaries(self, filepath):
+        return []
+
+    def file_sources(self, filepath, functions, source=None):
+        return [source(function) if source else None for function in functions]
+
+    def summarize_file(self, filepath, functions, summarize, source=None):
+        return [summarize(function) for function in functions]
+
+    def finish_file(self, filepath):
+        pass
+
+    def close(self):
+        pass
+
+
+def add_journal_arguments(parser):
+    """Adds the shared --journal/--resume options to a summarization CLI."""
+    parser.add_argument("--journal", metavar="PATH", help="Record completed summaries in this append-only journal")
+    parser.add_argument("--resume", action="store_true", help="Skip work already recorded in --journal")
+    parser.add_argument("--overwrite_journal", action="store_true",
+                        help="Discard an existing --journal instead of refusing to start")
+
+
+def journal_from_args(parser, args):
+    """Returns a RunJournal for the parsed options, or a no-op journal when --journal is not given."""
+    if args.resume and not args.journal:
+        parser.error("--resume requires --journal")
+    if not args.journal:
+        return _NullJournal()
+    try:
+        return RunJournal(args.journal, resume=args.resume, overwrite=args.overwrite_journal)
+    except FileExistsError as e:
+        parser.error(str(e))
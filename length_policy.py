@@ -0,0 +1,161 @@
+import json
+import math
+import argparse
+
+from code_units import code_tokens, estimate_tokens, function_features
+
+
+class LengthPolicy:
+    """Picks per-function min/max generation lengths from the function's size and complexity.
+
+    The expected summary length is `intercept + slope * size`, where size is the function's code
+    token count plus `complexity_weight` per extra decision point. The maximum allows `headroom`
+    times that, the minimum asks for `min_fraction` of it, and both are clipped to
+    [`floor`, `ceiling`]. `calibrate` fits intercept, slope and headroom to past outputs.
+    """
+
+    def __init__(self, intercept=12.0, slope=0.08, complexity_weight=20.0, headroom=1.6,
+                 min_fraction=0.5, floor=8, ceiling=200):
+        self.intercept = intercept
+        self.slope = slope
+        self.complexity_weight = complexity_weight
+        self.headroom = headroom
+        self.min_fraction = min_fraction
+        self.floor = floor
+        self.ceiling = ceiling
+
+    def size(self, func_code):
+        try:
+            features = function_features(func_code)
+        except (SyntaxError, IndexError):
+            # Fragments that don't parse (e.g. chunks split on "def ") are sized by tokens alone
+            return len(code_tokens(func_code))
+        return features["tokens"] + self.complexity_weight * (features["complexity"] - 1)
+
+    def expected(self, func_code):
+        """Returns the expected summary length in tokens."""
+        return self.intercept + self.slope * self.size(func_code)
+
+    def lengths(self, func_code, max_length=None):
+        """Returns (min_length, max_length) for a function, never above `max_length` when given."""
+        expected = self.expected(func_code)
+        ceiling = self.ceiling if max_length is None else min(self.ceiling, max_length)
+        # The floor yields to an explicit max_length, which is a hard limit
+        upper = min(ceiling, max(self.floor, math.ceil(expected * self.headroom)))
+        lower = max(1, min(upper - 1, math.floor(expected * self.min_fraction)))
+        return lower, upper
+
+    def calibrate(self, samples, quantile=0.95):
+        """Fits the policy to (func_code, summary_tokens) pairs from past runs and returns it.
+
+        Intercept and slope come from a least-squares fit; headroom becomes the `quantile` of
+        observed over expected lengths, so that share of past summaries would have fit.
+        """
+        points = [(self.size(func_code), tokens) for func_code, tokens in samples]
+        if len(points) < 2:
+            raise ValueError("Need at least two past outputs to calibrate")
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        spread = sum((x - mean_x) ** 2 for x, _ in points)
+        if spread:
+            self.slope = max(0.0, sum((x - mean_x) * (y - mean_y) for x, y in points) / spread)
+        self.intercept = max(1.0, mean_y - self.slope * mean_x)
+        ratios = sorted(y / (self.intercept + self.slope * x) for x, y in points)
+        self.headroom = max(1.1, ratios[min(len(ratios) - 1, int(quantile * len(ratios)))])
+        return self
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    @classmethod
+    def load(cls, path=None):
+        """Loads a calibrated policy from JSON, or returns the default policy when no path is given."""
+        if not path:
+            return cls()
+        with open(path, 'r') as file:
+            return cls(**json.load(file))
+
+
+class AdaptiveLength:
+    """Wraps `summarize(name, func_code, max_length, min_length)` so each call gets policy lengths.
+
+    The caller's max_length stays a hard cap; the number of calls and the decode steps allowed
+    compared to a fixed (min_length, max_length) are tracked for the report.
+    """
+
+    def __init__(self, summarize, policy, fixed_min_length=30):
+        self.summarize_with = summarize
+        self.policy = policy
+        self.fixed_min_length = fixed_min_length
+        self.functions = 0
+        self.min_steps = 0
+        self.fixed_min_steps = 0
+        self.max_steps = 0
+        self.fixed_max_steps = 0
+
+    def summarize(self, name, func_code, max_length=100):
+        min_length, adaptive_max = self.policy.lengths(func_code, max_length)
+        self.functions += 1
+        self.min_steps += min_length
+        self.fixed_min_steps += min(self.fixed_min_length, max_length)
+        self.max_steps += adaptive_max
+        self.fixed_max_steps += max_length
+        return self.summarize_with(name, func_code, adaptive_max, min_length)
+
+    def report(self):
+        return (f"adaptive length: {self.functions} functions, forced decode steps {self.min_steps} "
+                f"(fixed: {self.fixed_min_steps}), step budget {self.max_steps} (fixed: {self.fixed_max_steps})")
+
+
+def journal_samples(journal_path, count_tokens=estimate_tokens):
+    """Yields (func_code, summary_tokens) for journaled summaries whose local source file still exists."""
+    from cody_docu import extract_functions
+
+    functions_by_file = {}
+    with open(journal_path, 'r') as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("done"):
+                continue
+            filepath = entry["file"]
+            if filepath not in functions_by_file:
+                try:
+                    with open(filepath, 'r') as source:
+                        functions_by_file[filepath] = extract_functions(source.read())
+                except (OSError, SyntaxError):
+                    functions_by_file[filepath] = []
+            functions = functions_by_file[filepath]
+            if entry["index"] < len(functions) and functions[entry["index"]][0] == entry["name"]:
+                yield functions[entry["index"]][1], count_tokens(entry["summary"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate the generation length policy from past run journals")
+    parser.add_argument("journals", nargs="+", help="Run journals written with --journal by local runs")
+    parser.add_argument("--output", default="length_policy.json", help="Where to write the calibrated policy")
+    parser.add_argument("--tokenizer", help="Count summary tokens with this Hugging Face tokenizer")
+    parser.add_argument("--quantile", type=float, default=0.95, help="Share of past summaries the max must fit")
+    args = parser.parse_args()
+
+    count_tokens = estimate_tokens
+    if args.tokenizer:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+
+        def count_tokens(text):
+            return len(tokenizer(text)["input_ids"])
+
+    samples = [sample for path in args.journals for sample in journal_samples(path, count_tokens)]
+    policy = LengthPolicy().calibrate(samples, args.quantile)
+    policy.save(args.output)
+    print(f"Calibrated on {len(samples)} summaries: {policy.to_dict()}")
+    print(f"Policy written to {args.output}")
+
+#usage python length_policy.py run.journal --tokenizer facebook/bart-large-cnn --output length_policy.json
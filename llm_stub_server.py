@@ -0,0 +1,128 @@
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+    """Shared settings and counters for the stub completion server."""
+
+    def __init__(self, latency=0.05, jitter=0.02, error_rate=0.0, rate_limit_rpm=0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rpm = rate_limit_rpm
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.counts = {"ok": 0, "429": 0, "500": 0}
+
+    def decide(self):
+        """Returns the status code the next request should get."""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 60:
+                self.window_start = now
+                self.window_count = 0
+            self.window_count += 1
+            if self.rate_limit_rpm and self.window_count > self.rate_limit_rpm:
+                self.counts["429"] += 1
+                return 429
+            roll = self.random.random()
+            if roll < self.error_rate / 2:
+                self.counts["429"] += 1
+                return 429
+            if roll < self.error_rate:
+                self.counts["500"] += 1
+                return 500
+            self.counts["ok"] += 1
+            return 200
+
+
+def make_handler(state):
+    class StubHandler(BaseHTTPRequestHandler):
+        """Answers OpenAI and Azure style completion requests with canned text."""
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.startswith("/stats"):
+                self._send_json(200, state.counts)
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.split("?")[0].endswith("/completions"):
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+
+            time.sleep(max(0.0, state.latency + state.random.uniform(-state.jitter, state.jitter)))
+            status = state.decide()
+            if status == 429:
+                self._send_json(429, {"error": {"message": "Rate limit reached"}}, {"Retry-After": "1"})
+                return
+            if status == 500:
+                self._send_json(500, {"error": {"message": "The server had an error"}})
+                return
+
+            prompt = request.get("prompt", "")
+            prompt_tokens = max(1, len(prompt) // 4)
+            text = f" Stub summary of a {len(prompt.splitlines())}-line prompt."
+            self._send_json(200, {
+                "id": "cmpl-stub",
+                "object": "text_completion",
+                "model": request.get("model", "stub"),
+                "choices": [{"text": text, "index": 0, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 10,
+                          "total_tokens": prompt_tokens + 10},
+            })
+
+    return StubHandler
+
+
+def start_stub_server(host="127.0.0.1", port=0, **state_kwargs):
+    """Starts the stub server in a background thread and returns (server, base_url)."""
+    state = StubState(**state_kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.state = state
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI/Azure completions API")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8089, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.05, help="Base response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Random latency jitter in seconds")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Fraction of requests answered with 429/500")
+    parser.add_argument("--rate_limit_rpm", type=int, default=0, help="Answer 429 above this many requests per minute")
+    args = parser.parse_args()
+
+    state = StubState(args.latency, args.jitter, args.error_rate, args.rate_limit_rpm)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"Stub LLM server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Request counts: {state.counts}")
+
+# Usage example:
+# python llm_stub_server.py --port 8089 --latency 0.1 --error_rate 0.1
@@ -0,0 +1,324 @@
+import os
+import re
+import json
+import time
+import fnmatch
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import profiling
+from cody_docu import (AVAILABLE_MODELS, extract_functions, get_github_file_content, initialize_model,
+                       summarize_function)
+from compiled import add_compile_arguments
+from dedup import Deduplicator
+from fast_path import DOCSTRING_POLICIES, FastPath
+from github_graphql import GraphQLBlobFetcher, list_tree
+from journal import add_journal_arguments, journal_from_args
+from near_dup import NearDuplicateSummarizer, index_from_args
+from summary_store import SummaryStore
+
+
+def _entry(item, defaults):
+    """Normalizes one manifest entry ("owner/repo[@branch]" or a dict) to {owner, repo, branch, include, exclude}."""
+    if isinstance(item, str):
+        name, _, branch = item.partition("@")
+        item = {"name": name, **({"branch": branch} if branch else {})}
+    entry = {"branch": "main", "include": ["*.py"], "exclude": [], **defaults, **item}
+    if "name" in entry:
+        entry["owner"], _, entry["repo"] = entry.pop("name").partition("/")
+    if not entry.get("owner") or not entry.get("repo"):
+        raise ValueError(f"Manifest entry needs owner and repo (or name: owner/repo): {item}")
+    for key in ("include", "exclude"):
+        if isinstance(entry[key], str):
+            entry[key] = [entry[key]]
+    return entry
+
+
+def load_manifest(path):
+    """Reads a JSON or YAML manifest: a list of repositories, or {"defaults": {...}, "repos": [...]}.
+
+    Each repository is "owner/repo", "owner/repo@branch", or a mapping with owner, repo (or name),
+    branch, and include/exclude globs matched against paths in the repository.
+    """
+    with open(path, 'r') as file:
+        text = file.read()
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("YAML manifests need PyYAML (pip install pyyaml); JSON manifests work without it")
+        manifest = yaml.safe_load(text)
+    else:
+        manifest = json.loads(text)
+    if isinstance(manifest, list):
+        manifest = {"repos": manifest}
+    defaults = manifest.get("defaults", {})
+    return [_entry(item, defaults) for item in manifest.get("repos", [])]
+
+
+def label(entry):
+    return f"{entry['owner']}/{entry['repo']}@{entry['branch']}"
+
+
+def selected(path, entry):
+    return (any(fnmatch.fnmatch(path, pattern) for pattern in entry["include"])
+            and not any(fnmatch.fnmatch(path, pattern) for pattern in entry["exclude"]))
+
+
+def fetch_repo(entry, pool, graphql_batch=0):
+    """Lists one repository and fetches its selected files; runs ahead of inference in the prefetch thread.
+
+    Files come through the shared `pool` one Contents request each, or in batched GraphQL queries
+    when `graphql_batch` is set. Returns a dict with the sources and timings; errors are recorded
+    rather than raised so one bad repository doesn't stop the batch.
+    """
+    started = time.perf_counter()
+    fetched = {"entry": entry, "sources": [], "listed": 0, "error": None}
+    try:
+        sizes = list_tree(entry["owner"], entry["repo"], entry["branch"], pattern="*",
+                          token=os.getenv("GITHUB_TOKEN"))
+        paths = sorted(path for path in sizes if selected(path, entry))
+        fetched["listed"] = len(paths)
+        if not paths:
+            # list_tree has printed the HTTP error if listing failed; an empty selection is worth flagging either way
+            fetched["error"] = "no files listed or matched the filters"
+        if graphql_batch:
+            fetcher = GraphQLBlobFetcher(entry["owner"], entry["repo"], entry["branch"], batch_size=graphql_batch)
+            contents = list(fetcher.fetch(paths, sizes))
+        else:
+            contents = list(zip(paths, pool.map(
+                lambda path: get_github_file_content(entry["owner"], entry["repo"], path, entry["branch"]), paths)))
+        fetched["sources"] = [(path, text) for path, text in contents if text]
+    except Exception as e:
+        fetched["error"] = f"fetch failed: {e}"
+    fetched["fetch_seconds"] = round(time.perf_counter() - started, 3)
+    return fetched
+
+
+def write_repo_output(output_dir, entry, files):
+    """Writes one Markdown file per repository with a section per source file."""
+    path = os.path.join(output_dir, entry["owner"], re.sub(r"[^\w.-]", "_", f"{entry['repo']}@{entry['branch']}") + ".md")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        file.write(f"# {label(entry)}\n")
+        for filepath, functions, summaries in files:
+            file.write(f"\n## {filepath}\n")
+            for (name, _), summary in zip(functions, summaries):
+                file.write(f"\n### {name}\n\n{summary}\n")
+    return path
+
+
+class CallCounter:
+    """Counts calls that reach the model, so the report can tell model work from cache reuse per repository."""
+
+    def __init__(self, summarize):
+        self.summarize_with = summarize
+        self.calls = 0
+
+    def summarize(self, *args, **kwargs):
+        self.calls += 1
+        return self.summarize_with(*args, **kwargs)
+
+
+class BatchRunner:
+    """Documents every repository in a manifest with one loaded model and one set of caches.
+
+    The prefetch thread fetches up to `prefetch` repositories ahead while the main thread
+    summarizes the current one, so after the first repository fetch latency mostly hides
+    behind inference. `summarize` is the full wrapper chain and is shared by all repositories,
+    so a function copied between them is summarized once. `source_of(function)` tags each summary
+    with what produced it for the journal and the store.
+    """
+
+    def __init__(self, summarize, counter, journal, store=None, output_dir="manifest_docs", max_length=100,
+                 prefetch=1, fetch_workers=8, graphql_batch=0, source_of=None):
+        self.summarize = summarize
+        self.counter = counter
+        self.journal = journal
+        self.store = store
+        self.output_dir = output_dir
+        self.max_length = max_length
+        self.prefetch = max(1, prefetch)
+        self.fetch_workers = fetch_workers
+        self.graphql_batch = graphql_batch
+        self.source_of = source_of
+
+    def document(self, fetched):
+        """Summarizes one fetched repository and writes its output; returns its report row."""
+        entry = fetched["entry"]
+        started, calls_before = time.perf_counter(), self.counter.calls
+        row = {"repo": label(entry), "listed": fetched["listed"], "files": 0, "functions": 0,
+               "fetch_seconds": fetched["fetch_seconds"], "error": fetched["error"]}
+        files = []
+        for filepath, code_content in fetched["sources"]:
+            key = f"{label(entry)}:{filepath}"
+            try:
+                functions = extract_functions(code_content)
+            except SyntaxError:
+                continue
+            if self.journal.file_done(key):
+                summaries = self.journal.file_summaries(key)
+            else:
+                summaries = self.journal.summarize_file(
+                    key, functions, lambda function: self.summarize(*function, self.max_length), self.source_of)
+                if self.store is not None:
+                    self.store.record_file(f"{entry['owner']}/{entry['repo']}", filepath, functions, summaries,
+                                           self.journal.file_sources(key, functions, self.source_of))
+            files.append((filepath, functions, summaries))
+            row["files"] += 1
+            row["functions"] += len(functions)
+        with metrics.stage("output"):
+            row["output"] = write_repo_output(self.output_dir, entry, files)
+        row["model_calls"] = self.counter.calls - calls_before
+        row["reused"] = row["functions"] - row["model_calls"]
+        row["summarize_seconds"] = round(time.perf_counter() - started, 3)
+        return row
+
+    def run(self, entries):
+        """Documents `entries` in order, fetching ahead; returns one report row per repository."""
+        rows = []
+        pending = iter(entries)
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as pool, \
+                ThreadPoolExecutor(max_workers=1) as prefetcher:
+            ahead = deque()
+
+            def refill():
+                while len(ahead) <= self.prefetch:
+                    entry = next(pending, None)
+                    if entry is None:
+                        return
+                    ahead.append(prefetcher.submit(fetch_repo, entry, pool, self.graphql_batch))
+
+            refill()
+            while ahead:
+                waited = time.perf_counter()
+                fetched = ahead.popleft().result()
+                refill()
+                wait_seconds = round(time.perf_counter() - waited, 3)
+                try:
+                    row = self.document(fetched)
+                except Exception as e:
+                    row = {"repo": label(fetched["entry"]), "listed": fetched["listed"], "files": 0, "functions": 0,
+                           "model_calls": 0, "reused": 0, "fetch_seconds": fetched["fetch_seconds"],
+                           "summarize_seconds": 0.0, "error": f"summarize failed: {e}"}
+                row["wait_seconds"] = wait_seconds
+                rows.append(row)
+                print(f"[{len(rows)}/{len(entries)}] {row['repo']}: {row['files']} files, "
+                      f"{row['functions']} functions, {row['model_calls']} model calls"
+                      + (f" ({row['error']})" if row["error"] else ""))
+        return rows
+
+
+def write_report(output_dir, rows, seconds, load_seconds):
+    """Writes the combined report as report.json and report.md next to the per-repository files."""
+    totals = {key: sum(row[key] for row in rows) for key in ("listed", "files", "functions", "model_calls", "reused")}
+    totals.update(repos=len(rows), failed=sum(1 for row in rows if row["error"]), seconds=round(seconds, 3),
+                  model_load_seconds=round(load_seconds, 3),
+                  fetch_wait_seconds=round(sum(row["wait_seconds"] for row in rows), 3))
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "report.json"), 'w') as file:
+        json.dump({"totals": totals, "repos": rows}, file, indent=2)
+    with open(os.path.join(output_dir, "report.md"), 'w') as file:
+        file.write(f"# Documentation batch\n\n{totals['repos']} repositories ({totals['failed']} failed), "
+                   f"{totals['files']} files, {totals['functions']} functions, {totals['model_calls']} model calls, "
+                   f"{totals['reused']} reused summaries in {totals['seconds']:.0f}s "
+                   f"(model loaded once in {totals['model_load_seconds']:.0f}s)\n\n")
+        file.write("| repository | files | functions | model calls | reused | fetch s | waited s | summarize s | error |\n")
+        file.write("|---|---|---|---|---|---|---|---|---|\n")
+        for row in rows:
+            file.write(f"| {row['repo']} | {row['files']} | {row['functions']} | {row['model_calls']} | {row['reused']} "
+                       f"| {row['fetch_seconds']} | {row['wait_seconds']} | {row['summarize_seconds']} "
+                       f"| {row['error'] or ''} |\n")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Document many GitHub repositories listed in a manifest in one run")
+    parser.add_argument("manifest", help="JSON or YAML list of repositories (see load_manifest)")
+    parser.add_argument("--model", choices=AVAILABLE_MODELS.keys(), default="bart",
+                        help="Model loaded once and shared by every repository")
+    parser.add_argument("--max_length", type=int, default=100, help="Maximum length of the summary")
+    parser.add_argument("--output_dir", default="manifest_docs", help="Per-repository Markdown and the combined report")
+    parser.add_argument("--prefetch", type=int, default=1, help="Repositories fetched ahead of the one being summarized")
+    parser.add_argument("--fetch_workers", type=int, default=8, help="Parallel Contents requests per repository")
+    parser.add_argument("--graphql_batch", type=int, default=0,
+                        help="Fetch files in batched GraphQL queries of this many instead (needs GITHUB_TOKEN)")
+    parser.add_argument("--dedup_names", action="store_true",
+                        help="Also treat functions that differ only in identifier names as copies")
+    parser.add_argument("--near_dup", type=float, metavar="THRESHOLD",
+                        help="Reuse the summary of an earlier near-clone with at least this MinHash similarity")
+    parser.add_argument("--near_dup_index", help="Load/save the near-clone index here to reuse summaries across runs")
+    parser.add_argument("--near_dup_adapt", action="store_true",
+                        help="Swap the near-clone's name for the function's own name in reused summaries")
+    parser.add_argument("--fast_path", action="store_true",
+                        help="Answer trivial functions and well-documented ones by rule instead of the model")
+    parser.add_argument("--docstring_policy", choices=DOCSTRING_POLICIES, default="good",
+                        help="With --fast_path, which existing docstrings to reuse as the summary")
+    parser.add_argument("--store", help="Also save summaries to this SQLite full-text store (see summary_store.py)")
+    parser.add_argument("--metrics_dir", help="Collect per-stage metrics and write Prometheus/JSON reports here")
+    add_journal_arguments(parser)
+    add_compile_arguments(parser)
+    profiling.add_profile_arguments(parser)
+    args = parser.parse_args()
+    entries = load_manifest(args.manifest)
+    journal = journal_from_args(parser, args)
+    store = SummaryStore(args.store) if args.store else None
+
+    if args.metrics_dir:
+        metrics.enable()
+
+    with profiling.profiler_from_args(args):
+        try:
+            started = time.perf_counter()
+            summarization_pipeline = initialize_model(args.model, args.compile, args.buckets)
+            load_seconds = time.perf_counter() - started
+
+            def summarize(name, func_code, max_length, min_length=30):
+                return summarize_function(name, func_code, summarization_pipeline, max_length, min_length)
+
+            counter = CallCounter(summarize)
+            summarize = counter.summarize
+            near_dup = None
+            if args.near_dup is not None:
+                near_dup = NearDuplicateSummarizer(summarize, index_from_args(args), args.near_dup_adapt)
+                summarize = near_dup.summarize
+            # Copies across repositories (vendored helpers, generated clients) are common, so exact reuse is always on
+            deduplicator = Deduplicator(summarize, ignore_names=args.dedup_names)
+            summarize = deduplicator.summarize
+            fast_path = None
+            if args.fast_path:
+                fast_path = FastPath(summarize, args.docstring_policy)
+                summarize = fast_path.summarize
+
+            runner = BatchRunner(summarize, counter, journal, store, args.output_dir, args.max_length, args.prefetch,
+                                 args.fetch_workers, args.graphql_batch,
+                                 fast_path.source_of if fast_path is not None else None)
+            print(f"Documenting {len(entries)} repositories with {args.model}")
+            rows = runner.run(entries)
+            totals = write_report(args.output_dir, rows, time.perf_counter() - started, load_seconds)
+            print(f"{totals['repos']} repositories ({totals['failed']} failed), {totals['functions']} functions, "
+                  f"{totals['model_calls']} model calls, {totals['fetch_wait_seconds']:.1f}s waiting on fetches; "
+                  f"report in {os.path.join(args.output_dir, 'report.md')}")
+            if fast_path is not None:
+                print(fast_path.report())
+            print(deduplicator.report())
+            if near_dup is not None:
+                print(near_dup.report())
+                if args.near_dup_index:
+                    near_dup.index.save(args.near_dup_index)
+        except Exception as e:
+            print(f"An error occurred: {str(e)}")
+            if args.journal:
+                print(f"Completed work is saved in {args.journal}; rerun with --resume to continue")
+        finally:
+            journal.close()
+            if store is not None:
+                store.close()
+            if args.metrics_dir:
+                metrics.print_summary()
+                metrics.write_reports(args.metrics_dir)
+
+#usage python manifest.py repos.json --model codet5 --output_dir docs --journal batch.journal
+#usage python manifest.py repos.yaml --prefetch 2 --graphql_batch 100 --store summaries.db --resume --journal batch.journal
@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import threading
+
+# Upper bounds (seconds) of the wall-time histogram buckets; +Inf is implicit
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+# Per-stage counters that callers can bump through Stage.add() or count()
+COUNTERS = ("bytes", "tokens_in", "tokens_out", "cache_hits", "retries", "errors")
+
+_enabled = False
+_lock = threading.Lock()
+_stages = {}
+_started_at = time.time()
+
+
+class _NullStage:
+    """Stand-in returned while metrics are disabled so instrumented code costs next to nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def add(self, **counts):
+        pass
+
+
+NULL_STAGE = _NullStage()
+
+
+def _new_stage():
+    return {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+            "buckets": [0] * (len(BUCKETS) + 1), **{name: 0 for name in COUNTERS}}
+
+
+class Stage:
+    """Times one pass through a pipeline stage and accumulates its counters on exit."""
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = {}
+
+    def __enter__(self):
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+        if exc_type is not None:
+            self.counts["errors"] = self.counts.get("errors", 0) + 1
+        with _lock:
+            stats = _stages.setdefault(self.name, _new_stage())
+            stats["calls"] += 1
+            stats["wall_seconds"] += wall
+            stats["cpu_seconds"] += cpu
+            bucket = 0
+            while bucket < len(BUCKETS) and wall > BUCKETS[bucket]:
+                bucket += 1
+            stats["buckets"][bucket] += 1
+            for name, value in self.counts.items():
+                stats[name] += value
+        return False
+
+    def add(self, **counts):
+        """Adds to this stage's counters (bytes, tokens_in, tokens_out, cache_hits, retries, errors)."""
+        for name, value in counts.items():
+            self.counts[name] = self.counts.get(name, 0) + value
+
+
+def enable():
+    """Turns on metrics collection for the rest of the process."""
+    global _enabled, _started_at
+    _enabled = True
+    _started_at = time.time()
+
+
+def enabled():
+    return _enabled
+
+
+def stage(name):
+    """Returns a context manager that times a stage, or a no-op one when metrics are disabled."""
+    if not _enabled:
+        return NULL_STAGE
+    return Stage(name)
+
+
+def count(stage_name, **counts):
+    """Adds to a stage's counters without timing anything (e.g. cache hits or retries)."""
+    if not _enabled:
+        return
+    with _lock:
+        stats = _stages.setdefault(stage_name, _new_stage())
+        for name, value in counts.items():
+            stats[name] += value
+
+
+def instrument_pipeline(pipeline_model):
+    """Records encoder forward passes of a transformers pipeline as a separate "encode" stage.
+
+    Decoder time is what remains of the surrounding "generate" stage.
+    """
+    model = getattr(pipeline_model, "model", pipeline_model)
+    if not _enabled or not hasattr(model, "get_encoder"):
+        return
+    encoder = model.get_encoder()
+    active = threading.local()
+
+    def before(module, inputs):
+        active.stage = Stage("encode").__enter__()
+
+    def after(module, inputs, output):
+        current = getattr(active, "stage", None)
+        if current is not None:
+            current.__exit__(None, None, None)
+            active.stage = None
+
+    encoder.register_forward_pre_hook(before)
+    encoder.register_forward_hook(after)
+
+
+def _quantile(stats, fraction):
+    """Approximates a wall-time quantile as the upper bound of the bucket that contains it."""
+    target = fraction * stats["calls"]
+    seen = 0
+    for bound, bucket_count in zip(BUCKETS + (float("inf"),), stats["buckets"]):
+        seen += bucket_count
+        if seen >= target:
+            return bound
+    return float("inf")
+
+
+def snapshot():
+    """Returns a copy of the per-stage statistics collected so far."""
+    with _lock:
+        return {name: dict(stats, buckets=list(stats["buckets"])) for name, stats in _stages.items()}
+
+
+def summary():
+    """Builds the end-of-run summary: per-stage totals, share of wall time and approximate p50/p95."""
+    stages = snapshot()
+    total_wall = sum(stats["wall_seconds"] for name, stats in stages.items() if name != "encode") or 1.0
+    report = {"started_at": _started_at, "elapsed_seconds": round(time.time() - _started_at, 3), "stages": {}}
+    for name, stats in stages.items():
+        entry = {key: value for key, value in stats.items() if key != "buckets"}
+        entry["wall_seconds"] = round(entry["wall_seconds"], 6)
+        entry["cpu_seconds"] = round(entry["cpu_seconds"], 6)
+        entry["wall_share"] = round(stats["wall_seconds"] / total_wall, 4)
+        if stats["calls"]:
+            entry["p50_le_seconds"] = _quantile(stats, 0.5)
+            entry["p95_le_seconds"] = _quantile(stats, 0.95)
+        report["stages"][name] = entry
+    return report
+
+
+def prometheus_text(prefix="docsummarizer"):
+    """Renders the collected metrics in the Prometheus text exposition format."""
+    stages = snapshot()
+    lines = []
+
+    def family(metric, kind, help_text):
+        lines.append(f"# HELP {prefix}_{metric} {help_text}")
+        lines.append(f"# TYPE {prefix}_{metric} {kind}")
+
+    family("stage_calls_total", "counter", "Number of times each stage ran.")
+    for name, stats in stages.items():
+        lines.append(f'{prefix}_stage_calls_total{{stage="{name}"}} {stats["calls"]}')
+    family("stage_cpu_seconds_total", "counter", "Process CPU time spent in each stage.")
+    for name, stats in stages.items():
+        lines.append(f'{prefix}_stage_cpu_seconds_total{{stage="{name}"}} {stats["cpu_seconds"]:.6f}')
+    for counter in COUNTERS:
+        family(f"stage_{counter}_total", "counter", f"Total {counter.replace('_', ' ')} per stage.")
+        for name, stats in stages.items():
+            lines.append(f'{prefix}_stage_{counter}_total{{stage="{name}"}} {stats[counter]}')
+    family("stage_wall_seconds", "histogram", "Wall-clock time per stage call.")
+    for name, stats in stages.items():
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS + (float("inf"),), stats["buckets"]):
+            cumulative += bucket_count
+            label = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{prefix}_stage_wall_seconds_bucket{{stage="{name}",le="{label}"}} {cumulative}')
+        lines.append(f'{prefix}_stage_wall_seconds_sum{{stage="{name}"}} {stats["wall_seconds"]:.6f}')
+        lines.append(f'{prefix}_stage_wall_seconds_count{{stage="{name}"}} {stats["calls"]}')
+    return "\n".join(lines) + "\n"
+
+
+def _atomic_write(path, text):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as file:
+        file.write(text)
+    os.replace(temp_path, path)
+
+
+def write_reports(directory, prefix="docsummarizer"):
+    """Writes `<prefix>.prom` (textfile collector format) and `run_summary.json` into a directory."""
+    os.makedirs(directory, exist_ok=True)
+    _atomic_write(os.path.join(directory, f"{prefix}.prom"), prometheus_text(prefix))
+    _atomic_write(os.path.join(directory, "run_summary.json"), json.dumps(summary(), indent=2))
+
+
+def print_summary():
+    """Prints a short per-stage table of the collected metrics."""
+    report = summary()
+    print(f"{'stage':<12}{'calls':>8}{'wall s':>10}{'cpu s':>10}{'share':>8}{'tokens in':>11}{'tokens out':>11}")
+    for name, entry in sorted(report["stages"].items(), key=lambda item: -item[1]["wall_seconds"]):
+        print(f"{name:<12}{entry['calls']:>8}{entry['wall_seconds']:>10.2f}{entry['cpu_seconds']:>10.2f}"
+              f"{entry['wall_share']:>8.1%}{entry['tokens_in']:>11}{entry['tokens_out']:>11}")
@@ -0,0 +1,89 @@
+import json
+import time
+
+from code_units import function_features
+
+# Tiers are tried in order; a function goes to the first tier whose limits it satisfies.
+# The last tier has no limits and catches everything else.
+DEFAULT_TIERS = [
+    {"model": "codet5-small", "max_statements": 4, "max_complexity": 2, "max_tokens": 150, "max_depth": 1},
+    {"model": "codet5", "max_statements": 30, "max_complexity": 8, "max_tokens": 800, "max_depth": 3},
+    {"model": "codet5-large"},
+]
+
+# Maps tier limit names to the feature they bound
+_LIMITS = {
+    "max_statements": "statements",
+    "max_complexity": "complexity",
+    "max_tokens": "tokens",
+    "max_depth": "depth",
+}
+
+
+def load_tiers(path=None):
+    """Loads routing tiers from a JSON file, falling back to DEFAULT_TIERS."""
+    if not path:
+        return DEFAULT_TIERS
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def choose_tier(features, tiers):
+    """Returns the first (cheapest) tier whose limits the features satisfy."""
+    for tier in tiers:
+        if all(features[feature] <= tier[limit] for limit, feature in _LIMITS.items() if limit in tier):
+            return tier
+    return tiers[-1]
+
+
+class ModelRouter:
+    """Routes each function to the cheapest model tier that can handle it and tracks per-tier compute.
+
+    Pipelines are loaded lazily with `loader(model_choice)` and reused; `summarize` is called as
+    `summarize(name, func_code, pipeline, max_length, min_length)`.
+    """
+
+    def __init__(self, models, loader, summarize, tiers=None):
+        self.models = models
+        self.loader = loader
+        self.summarize_with = summarize
+        self.tiers = tiers or DEFAULT_TIERS
+        unknown = [tier["model"] for tier in self.tiers if tier["model"] not in models]
+        if unknown:
+            raise ValueError(f"Routing tiers use unknown models: {', '.join(unknown)}")
+        self.pipelines = {}
+        self.usage = {tier["model"]: {"functions": 0, "tokens": 0, "seconds": 0.0} for tier in self.tiers}
+
+    def route(self, func_code):
+        """Returns (model_choice, features) for a function."""
+        features = function_features(func_code)
+        return choose_tier(features, self.tiers)["model"], features
+
+    def get_pipeline(self, model_choice):
+        if model_choice not in self.pipelines:
+            self.pipelines[model_choice] = self.loader(model_choice)
+        return self.pipelines[model_choice]
+
+    def summarize(self, name, func_code, max_length=100, min_length=30):
+        """Summarizes a function with the model its complexity calls for."""
+        model_choice, features = self.route(func_code)
+        pipeline_model = self.get_pipeline(model_choice)
+        start = time.perf_counter()
+        summary = self.summarize_with(name, func_code, pipeline_model, max_length, min_length)
+        usage = self.usage[model_choice]
+        usage["functions"] += 1
+        usage["tokens"] += features["tokens"]
+        usage["seconds"] += time.perf_counter() - start
+        return summary
+
+    def report(self):
+        """Returns a table of functions, input tokens, wall time and estimated compute per tier."""
+        lines = [f"{'model':<14}{'functions':>10}{'tokens':>10}{'seconds':>10}{'compute':>12}{'share':>8}"]
+        compute = {model: usage["tokens"] * self.models[model].get("params", 1)
+                   for model, usage in self.usage.items()}
+        total = sum(compute.values()) or 1
+        for model, usage in self.usage.items():
+            lines.append(f"{model:<14}{usage['functions']:>10}{usage['tokens']:>10}{usage['seconds']:>10.1f}"
+                         f"{compute[model]:>12}{compute[model] / total:>8.1%}")
+        lines.append("compute = input tokens x model parameters (millions)")
+        return "\n".join(lines)
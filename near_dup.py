@@ -0,0 +1,188 @@
+import os
+import re
+import ast
+import json
+import zlib
+import argparse
+
+import numpy as np
+
+import metrics
+from code_units import code_tokens, extract_units, parse_function_code
+from source_scan import scan_source_files
+
+# Mersenne prime 2**31 - 1: shingle hashes are reduced below it so a * x + b fits in uint64
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+def shingles(func_code, size=5):
+    """Hashes the overlapping `size`-token windows of a function, ignoring comments and formatting."""
+    try:
+        text = ast.unparse(parse_function_code(func_code))
+    except SyntaxError:
+        text = func_code
+    tokens = code_tokens(text)
+    windows = [" ".join(tokens[i:i + size]) for i in range(max(1, len(tokens) - size + 1))]
+    return np.unique(np.array([zlib.crc32(window.encode("utf-8")) for window in windows], dtype=np.uint64))
+
+
+class MinHashIndex:
+    """MinHash signatures over token shingles with LSH banding to find near-duplicate functions.
+
+    Signatures have `num_perm` values split into `bands` bands; two functions become candidates
+    when any band matches exactly, and candidates are kept when their estimated Jaccard similarity
+    reaches `threshold`. Each entry carries an arbitrary JSON-serializable payload.
+    """
+
+    def __init__(self, num_perm=128, bands=32, threshold=0.8, shingle_size=5, seed=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self.signatures = []
+        self.payloads = []
+        self.buckets = {}
+
+    def signature(self, func_code):
+        """Returns the MinHash signature of a function as a uint32 vector."""
+        values = shingles(func_code, self.shingle_size) % _PRIME
+        hashed = (self._a[:, None] * values[None, :] + self._b[:, None]) % _PRIME
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [(band, rows.tobytes()) for band, rows in enumerate(signature.reshape(self.bands, -1))]
+
+    def add(self, signature, payload):
+        index = len(self.signatures)
+        self.signatures.append(signature)
+        self.payloads.append(payload)
+        for key in self._band_keys(signature):
+            self.buckets.setdefault(key, []).append(index)
+        return index
+
+    def query(self, signature):
+        """Returns (similarity, payload) pairs at or above the threshold, most similar first."""
+        candidates = sorted({index for key in self._band_keys(signature) for index in self.buckets.get(key, ())})
+        if not candidates:
+            return []
+        similarities = (np.stack([self.signatures[index] for index in candidates]) == signature).mean(axis=1)
+        matches = [(float(similarity), self.payloads[index])
+                   for similarity, index in zip(similarities, candidates) if similarity >= self.threshold]
+        return sorted(matches, key=lambda match: -match[0])
+
+    def save(self, path):
+        """Saves the index to an .npz file so it can be reused across runs and repositories."""
+        settings = {"num_perm": self.num_perm, "bands": self.bands, "threshold": self.threshold,
+                    "shingle_size": self.shingle_size, "seed": self.seed}
+        signatures = np.stack(self.signatures) if self.signatures else np.zeros((0, self.num_perm), np.uint32)
+        temp_path = f"{path}.tmp.npz"
+        np.savez_compressed(temp_path, signatures=signatures,
+                            meta=np.array(json.dumps({"settings": settings, "payloads": self.payloads})))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, threshold=None):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            signatures = data["signatures"]
+        settings = meta["settings"]
+        if threshold is not None:
+            settings["threshold"] = threshold
+        index = cls(**settings)
+        for signature, payload in zip(signatures, meta["payloads"]):
+            index.add(signature, payload)
+        return index
+
+
+def adapt_summary(summary, source_name, name):
+    """Lightly adapts a reused summary by swapping the source function's name for the new one."""
+    if source_name == name:
+        return summary
+    return re.sub(rf"\b{re.escape(source_name)}\b", name, summary)
+
+
+class NearDuplicateSummarizer:
+    """Reuses the summary of a near-clone instead of running the model again.
+
+    `summarize` is called as `summarize(name, func_code, *args, **kwargs)` for functions with no
+    indexed near-clone; their summaries are added to the index for later functions to reuse.
+    """
+
+    def __init__(self, summarize, index=None, adapt=False):
+        self.summarize_with = summarize
+        self.index = index or MinHashIndex()
+        self.adapt = adapt
+        self.functions = 0
+        self.reused = 0
+
+    def summarize(self, name, func_code, *args, **kwargs):
+        """Summarizes a function, or reuses the summary of its most similar indexed near-clone."""
+        self.functions += 1
+        signature = self.index.signature(func_code)
+        matches = self.index.query(signature)
+        if matches:
+            similarity, payload = matches[0]
+            self.reused += 1
+            metrics.count("generate", cache_hits=1)
+            if self.adapt:
+                return adapt_summary(payload["summary"], payload["name"], name)
+            return payload["summary"]
+        summary = self.summarize_with(name, func_code, *args, **kwargs)
+        self.index.add(signature, {"name": name, "summary": summary})
+        return summary
+
+    def report(self):
+        ratio = self.reused / self.functions if self.functions else 0.0
+        return (f"near-dup: {self.functions} functions, {self.functions - self.reused} model calls, "
+                f"{self.reused} reused at similarity >= {self.index.threshold} ({ratio:.1%})")
+
+
+def index_from_args(args):
+    """Loads the saved index named by --near_dup_index, or starts an empty one at the --near_dup threshold."""
+    if args.near_dup_index and os.path.exists(args.near_dup_index):
+        return MinHashIndex.load(args.near_dup_index, threshold=args.near_dup)
+    return MinHashIndex(threshold=args.near_dup)
+
+
+def find_near_clones(paths, index):
+    """Yields (similarity, unit id, clone id) for every function with an earlier near-clone in `paths`."""
+    for path in paths:
+        for filepath in scan_source_files(path):
+            with open(filepath, 'r') as file:
+                code = file.read()
+            try:
+                units = extract_units(code, filepath)
+            except SyntaxError:
+                print(f"Skipping {filepath}: not valid Python")
+                continue
+            for unit in units:
+                signature = index.signature(unit["code"])
+                for similarity, payload in index.query(signature):
+                    yield similarity, unit["id"], payload["id"]
+                index.add(signature, {"id": unit["id"]})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find near-duplicate functions across one or more repositories")
+    parser.add_argument("paths", nargs="+", help="Python files or directories to scan")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Minimum estimated Jaccard similarity")
+    parser.add_argument("--num_perm", type=int, default=128, help="MinHash signature length")
+    parser.add_argument("--bands", type=int, default=32, help="Number of LSH bands")
+    parser.add_argument("--shingle_size", type=int, default=5, help="Tokens per shingle")
+    args = parser.parse_args()
+
+    index = MinHashIndex(args.num_perm, args.bands, args.threshold, args.shingle_size)
+    pairs = 0
+    for similarity, unit_id, clone_id in find_near_clones(args.paths, index):
+        print(f"{similarity:.2f}  {unit_id}  ~  {clone_id}")
+        pairs += 1
+    print(f"{pairs} near-clone pairs among {len(index.signatures)} functions")
+
+#usage python near_dup.py . --threshold 0.7
+#usage python near_dup.py path/to/repo_a path/to/repo_b
@@ -7,6 +7,8 @@ from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
 
 import openai
 
+from remote_llm import summarize_chunks_remote
+
 openai.api_key = ''
 
 def summarize_code(code):
@@ -62,6 +64,15 @@ def process_code_in_chunks(code):
             summaries.append(summary)
     return "\n\n".join(summaries)
 
+def process_code_in_chunks_remote(code, base_url, concurrency=8, rpm=60, tpm=90000):
+    """Summarizes each function chunk concurrently through the rate-limited remote API."""
+    chunks = ["def " + function for function in code.split("def ") if function.strip()]
+    summaries = summarize_chunks_remote(
+        chunks, base_url=base_url, api_key=openai.api_key or os.getenv("OPENAI_API_KEY"), model="text-davinci-003",
+        max_concurrency=concurrency, requests_per_minute=rpm, tokens_per_minute=tpm
+    )
+    return "\n\n".join(summaries)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Summarize Python code files from local path or GitHub")
     parser.add_argument("--github", action="store_true", help="Fetch file from GitHub")
@@ -71,13 +82,23 @@ if __name__ == "__main__":
     parser.add_argument("--filepath", default="src/sample/simple.py", help="File path in the GitHub repository")
     parser.add_argument("--branch", default="main", help="GitHub branch")
     parser.add_argument("--max_length", type=int, default=500, help="Maximum length of the summary")  # Increased max_length
+    parser.add_argument("--remote", action="store_true", help="Summarize through the remote completions API")
+    parser.add_argument("--base_url", default="https://api.openai.com/v1", help="Remote API base URL")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum remote requests in flight")
+    parser.add_argument("--rpm", type=int, default=60, help="Remote requests-per-minute limit")
+    parser.add_argument("--tpm", type=int, default=90000, help="Remote tokens-per-minute limit")
     args = parser.parse_args()
 
+    def summarize(code_content):
+        if args.remote:
+            return process_code_in_chunks_remote(code_content, args.base_url, args.concurrency, args.rpm, args.tpm)
+        return process_code_in_chunks(code_content)
+
     try:
         if args.github:
             code_content = get_github_file_content(args.owner, args.repo, args.filepath, args.branch)
             if code_content:
-                summary = process_code_in_chunks(code_content)
+                summary = summarize(code_content)
                 print(f"Summary of {args.filepath} from {args.owner}/{args.repo}:")
                 print(summary)
             else:
@@ -86,7 +107,7 @@ if __name__ == "__main__":
             if os.path.exists(args.local):
                 with open(args.local, 'r') as file:
                     code_content = file.read()
-                summary = process_code_in_chunks(code_content)
+                summary = summarize(code_content)
                 print(f"Summary of local file {args.local}:")
                 print(summary)
             else:
@@ -99,3 +120,4 @@ if __name__ == "__main__":
 # Usage examples:
 # python copilot_docu.py --github --owner pypa --repo sampleproject --filepath src/sample/simple.py --branch main
 # python copilot_docu.py --local path/to/your/local/file.py
+# python openai_docu.py --local path/to/your/local/file.py --remote --concurrency 8 --rpm 60
@@ -0,0 +1,267 @@
+import os
+import re
+import ast
+import json
+import math
+import time
+import random
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from code_units import extract_units
+from fast_path import docstring_summary
+from source_scan import scan_source_files
+from benchmark import RESULTS_DIR, git_commit, peak_rss_mb, percentile
+
+SEBIS_MODEL = "SEBIS/code_trans_t5_large_source_code_summarization_python_multitask_finetune"
+PRECISIONS = ("fp32", "bf16", "int8")
+LENGTH_MODES = ("fixed", "adaptive")
+QUALITY_METRICS = ("rouge1", "rouge2", "rougeL", "bleu")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def eval_models():
+    """The models cody_docu.py offers, plus the SEBIS CodeTrans T5 that main.py uses on whole files."""
+    from cody_docu import AVAILABLE_MODELS
+
+    models = {key: dict(info, prompt="instruction") for key, info in AVAILABLE_MODELS.items()}
+    # main.py feeds CodeTrans space-joined tokenizer pieces of the code instead of an instruction prompt
+    models["sebis"] = {"name": SEBIS_MODEL, "type": "summarization", "params": 770, "prompt": "tokens"}
+    return models
+
+
+def strip_docstring(func_code, node):
+    """Returns the function's source without its docstring lines (None if nothing else is left)."""
+    if not (node.body and isinstance(node.body[0], ast.Expr)):
+        return func_code
+    docstring = node.body[0]
+    if len(node.body) == 1:
+        return None
+    lines = func_code.split("\n")
+    start, end = docstring.lineno - node.lineno, docstring.end_lineno - node.lineno
+    return "\n".join(lines[:start] + lines[end + 1:])
+
+
+def build_corpus(root, limit=200, seed=0, min_words=5):
+    """Collects functions with a useful docstring as [{"id", "name", "code", "reference"}].
+
+    The reference is the docstring's first paragraph; the code the models see has it removed.
+    """
+    items = []
+    for path in scan_source_files(root):
+        with open(path, 'r', errors="replace") as file:
+            code = file.read()
+        try:
+            units = extract_units(code, path)
+        except SyntaxError:
+            continue
+        for unit in units:
+            reference = docstring_summary(unit["docstring"], "good", min_words)
+            stripped = strip_docstring(unit["code"], unit["node"]) if reference else None
+            if stripped:
+                items.append({"id": unit["id"], "name": unit["name"], "code": stripped, "reference": reference})
+    random.Random(seed).shuffle(items)
+    return sorted(items[:limit], key=lambda item: item["id"]) if limit else items
+
+
+def load_corpus(path, root, limit, seed):
+    """Loads the JSONL corpus at `path`, building it from `root` first if it doesn't exist, so runs stay comparable."""
+    if not os.path.exists(path):
+        items = build_corpus(root, limit, seed)
+        with open(path, 'w') as file:
+            file.writelines(json.dumps(item) + "\n" for item in items)
+        print(f"Wrote {len(items)} reference functions to {path}")
+    with open(path, 'r') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def words(text):
+    return _WORD.findall(text.lower())
+
+
+def _ngrams(tokens, n):
+    return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+
+def rouge_n(candidate, reference, n):
+    """ROUGE-N F1 over lowercased word tokens."""
+    candidate, reference = _ngrams(words(candidate), n), _ngrams(words(reference), n)
+    overlap = sum((candidate & reference).values())
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / sum(candidate.values()), overlap / sum(reference.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_l(candidate, reference):
+    """ROUGE-L F1: longest common subsequence of word tokens."""
+    candidate, reference = words(candidate), words(reference)
+    if not candidate or not reference:
+        return 0.0
+    previous = [0] * (len(reference) + 1)
+    for token in candidate:
+        current = [0]
+        for j, other in enumerate(reference):
+            current.append(previous[j] + 1 if token == other else max(previous[j + 1], current[j]))
+        previous = current
+    lcs = previous[-1]
+    if not lcs:
+        return 0.0
+    precision, recall = lcs / len(candidate), lcs / len(reference)
+    return 2 * precision * recall / (precision + recall)
+
+
+def bleu(candidate, reference, max_n=4):
+    """Sentence BLEU with add-one smoothing of the higher-order precisions and the brevity penalty."""
+    candidate, reference = words(candidate), words(reference)
+    if not candidate or not reference:
+        return 0.0
+    log_total = 0.0
+    for n in range(1, max_n + 1):
+        counts, references = _ngrams(candidate, n), _ngrams(reference, n)
+        overlap, total = sum((counts & references).values()), sum(counts.values())
+        if n > 1:
+            overlap, total = overlap + 1, total + 1
+        if not overlap or not total:
+            return 0.0
+        log_total += math.log(overlap / total) / max_n
+    penalty = min(0.0, 1 - len(reference) / len(candidate))
+    return math.exp(log_total + penalty)
+
+
+def score(candidate, reference):
+    return {"rouge1": rouge_n(candidate, reference, 1), "rouge2": rouge_n(candidate, reference, 2),
+            "rougeL": rouge_l(candidate, reference), "bleu": bleu(candidate, reference)}
+
+
+def load_pipeline(model_info, precision):
+    """Loads a pipeline for one model at fp32, bf16, or int8 (dynamic quantization of the Linear layers)."""
+    import torch
+    from transformers import pipeline
+
+    dtype = torch.bfloat16 if precision == "bf16" else torch.float32
+    summarization_pipeline = pipeline(model_info["type"], model=model_info["name"], tokenizer=model_info["name"],
+                                      torch_dtype=dtype, device=-1)
+    if precision == "int8":
+        summarization_pipeline.model = torch.quantization.quantize_dynamic(
+            summarization_pipeline.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return summarization_pipeline
+
+
+def evaluate_config(config, corpus, max_length=100, length_policy=None, threads=1):
+    """Summarizes the corpus with one configuration; meant to run in its own process so peak memory is its own."""
+    import torch
+    from cody_docu import summarize_function
+    from length_policy import LengthPolicy
+
+    torch.set_num_threads(threads)
+    model_info = eval_models()[config["model"]]
+    start = time.perf_counter()
+    summarization_pipeline = load_pipeline(model_info, config["precision"])
+    load_seconds = time.perf_counter() - start
+    policy = LengthPolicy.load(length_policy) if config["lengths"] == "adaptive" else None
+
+    def summarize(item):
+        min_length, max_length_for_item = policy.lengths(item["code"], max_length) if policy else (30, max_length)
+        if model_info["prompt"] == "tokens":
+            tokens = " ".join(summarization_pipeline.tokenizer.tokenize(item["code"]))
+            result = summarization_pipeline([tokens], max_length=max_length_for_item, min_length=min_length)
+            return result[0]["summary_text"]
+        return summarize_function(item["name"], item["code"], summarization_pipeline, max_length_for_item, min_length)
+
+    # One warm-up call so lazy initialization isn't billed to the first function
+    summarize(corpus[0])
+    latencies, scores = [], []
+    for item in corpus:
+        started = time.perf_counter()
+        summary = summarize(item)
+        latencies.append(time.perf_counter() - started)
+        scores.append(score(summary, item["reference"]))
+    total = sum(latencies)
+    result = {**config, "functions": len(corpus), "load_seconds": round(load_seconds, 2),
+              "functions_per_sec": round(len(corpus) / total, 3) if total else 0.0,
+              "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+              "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+              "peak_rss_mb": round(peak_rss_mb(), 1)}
+    result.update({metric: round(sum(item[metric] for item in scores) / len(scores), 4) for metric in QUALITY_METRICS})
+    return result
+
+
+def pareto_frontier(results, quality="rougeL"):
+    """Returns the results no other result beats on quality, functions/sec and peak memory at once."""
+    def dominates(a, b):
+        at_least = (a[quality] >= b[quality] and a["functions_per_sec"] >= b["functions_per_sec"]
+                    and a["peak_rss_mb"] <= b["peak_rss_mb"])
+        better = (a[quality] > b[quality] or a["functions_per_sec"] > b["functions_per_sec"]
+                  or a["peak_rss_mb"] < b["peak_rss_mb"])
+        return at_least and better
+
+    return [result for result in results if not any(dominates(other, result) for other in results)]
+
+
+def config_name(config):
+    return f"{config['model']}/{config['precision']}/{config['lengths']}"
+
+
+def print_table(results, frontier, quality="rougeL"):
+    on_frontier = {config_name(result) for result in frontier}
+    print(f"{'configuration':<30}{quality:>8}{'bleu':>8}{'fn/s':>8}{'p95 ms':>10}{'peak MB':>10}  pareto")
+    for result in sorted(results, key=lambda result: -result[quality]):
+        name = config_name(result)
+        print(f"{name:<30}{result[quality]:>8.3f}{result['bleu']:>8.3f}{result['functions_per_sec']:>8.2f}"
+              f"{result['p95_ms']:>10.0f}{result['peak_rss_mb']:>10.0f}  {'*' if name in on_frontier else ''}")
+
+
+def run(args):
+    unknown = set(args.models) - set(eval_models())
+    if unknown:
+        raise ValueError(f"Unknown models {', '.join(sorted(unknown))}; available: {', '.join(eval_models())}")
+    corpus = load_corpus(args.corpus, args.root, args.limit, args.seed)
+    configs = [{"model": model, "precision": precision, "lengths": lengths}
+               for model in args.models for precision in args.precisions for lengths in args.lengths]
+    results = []
+    for config in configs:
+        print(f"Evaluating {config_name(config)} on {len(corpus)} functions")
+        try:
+            # A fresh process per configuration keeps models and peak memory from carrying over
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                results.append(executor.submit(evaluate_config, config, corpus, args.max_length,
+                                               args.length_policy, args.threads).result())
+        except Exception as e:
+            print(f"{config_name(config)} failed: {e}")
+    frontier = pareto_frontier(results, args.quality)
+    print_table(results, frontier, args.quality)
+    report = {"meta": {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "corpus": args.corpus, "functions": len(corpus), "quality_metric": args.quality,
+                       "args": vars(args)},
+              "results": results, "frontier": [config_name(result) for result in frontier]}
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"pareto_{report['meta']['timestamp'].replace(':', '').replace('-', '')}_"
+                                         f"{report['meta']['commit']}.json")
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {path}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Speed/quality/memory Pareto evaluation of summarization settings")
+    parser.add_argument("--corpus", default="eval_corpus.jsonl", help="Reference corpus (built from --root if missing)")
+    parser.add_argument("--root", default=".", help="Source tree to mine documented functions from")
+    parser.add_argument("--limit", type=int, default=200, help="Functions in a newly built corpus (0 = all)")
+    parser.add_argument("--models", nargs="+", default=["bart", "t5", "codet5", "sebis"], help="Models to evaluate")
+    parser.add_argument("--precisions", nargs="+", choices=PRECISIONS, default=["fp32"], help="Weight precisions")
+    parser.add_argument("--lengths", nargs="+", choices=LENGTH_MODES, default=["fixed"], help="Length policies")
+    parser.add_argument("--length_policy", help="Calibrated length policy JSON for the adaptive mode")
+    parser.add_argument("--max_length", type=int, default=100, help="Maximum summary length")
+    parser.add_argument("--quality", choices=QUALITY_METRICS, default="rougeL", help="Quality axis of the frontier")
+    parser.add_argument("--threads", type=int, default=1, help="Torch intra-op threads per configuration")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for sampling a new corpus")
+    parser.add_argument("--output_dir", default=RESULTS_DIR, help="Directory for the JSON report")
+    args = parser.parse_args()
+    run(args)
+
+#usage python pareto.py --root path/to/project --models bart t5 codet5 sebis --precisions fp32 bf16 int8 --lengths fixed adaptive
+#usage python pareto.py --corpus eval_corpus.jsonl --models codet5-small codet5 --quality bleu
@@ -0,0 +1,210 @@
+import os
+import sys
+import html
+import pstats
+import cProfile
+import zlib
+import threading
+import contextlib
+from collections import Counter
+
+# Source function currently being summarized, per thread, used to attribute samples
+_current_function = {}
+
+
+@contextlib.contextmanager
+def summarizing(name):
+    """Marks the source function being summarized so profiler samples can be attributed to it."""
+    thread_id = threading.get_ident()
+    previous = _current_function.get(thread_id)
+    _current_function[thread_id] = name
+    try:
+        yield
+    finally:
+        if previous is None:
+            _current_function.pop(thread_id, None)
+        else:
+            _current_function[thread_id] = previous
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    label = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    # ';' separates frames in the collapsed format
+    return label.replace(";", ":")
+
+
+class SamplingProfiler:
+    """Samples the Python stack of one thread at a fixed interval and aggregates collapsed stacks."""
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.by_function = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.reverse()
+            function = _current_function.get(self.thread_id)
+            if function is not None:
+                stack.insert(0, f"[summarizing {function}]".replace(";", ":"))
+                self.by_function[function] += 1
+            self.stacks[";".join(stack)] += 1
+            self.samples += 1
+
+
+def write_collapsed(stacks, path):
+    """Writes stacks in the collapsed format used by flamegraph.pl and speedscope."""
+    with open(path, "w") as file:
+        for stack, count in sorted(stacks.items()):
+            file.write(f"{stack} {count}\n")
+
+
+def _build_tree(stacks):
+    root = {"name": "all", "value": 0, "children": {}}
+    for stack, count in stacks.items():
+        root["value"] += count
+        node = root
+        for frame in stack.split(";"):
+            node = node["children"].setdefault(frame, {"name": frame, "value": 0, "children": {}})
+            node["value"] += count
+    return root
+
+
+def render_flamegraph(stacks, title="Flamegraph"):
+    """Renders collapsed stacks as a self-contained HTML icicle graph (root on top)."""
+    root = _build_tree(stacks)
+    total = root["value"] or 1
+    row_height = 18
+    boxes = []
+    max_depth = 0
+
+    def place(node, left, depth):
+        nonlocal max_depth
+        max_depth = max(max_depth, depth)
+        width = 100.0 * node["value"] / total
+        if width >= 0.05:
+            hue = zlib.crc32(node["name"].split(" (")[0].encode()) % 60
+            tooltip = f"{node['name']} - {node['value']} samples ({100.0 * node['value'] / total:.1f}%)"
+            boxes.append(
+                f'<div class="box" style="left:{left:.4f}%;width:{width:.4f}%;top:{depth * row_height}px;'
+                f'background:hsl({hue},85%,62%)" title="{html.escape(tooltip)}">{html.escape(node["name"])}</div>'
+            )
+        offset = left
+        for child in sorted(node["children"].values(), key=lambda child: child["name"]):
+            place(child, offset, depth + 1)
+            offset += 100.0 * child["value"] / total
+
+    place(root, 0.0, 0)
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<style>
+body {{ font-family: monospace; font-size: 11px; margin: 12px; }}
+#graph {{ position: relative; height: {(max_depth + 1) * row_height}px; }}
+.box {{ position: absolute; height: {row_height - 1}px; line-height: {row_height - 1}px; overflow: hidden;
+        white-space: nowrap; box-sizing: border-box; border-right: 1px solid #fff; padding-left: 2px; }}
+.box:hover {{ outline: 1px solid #000; z-index: 1; }}
+</style></head>
+<body><h3>{html.escape(title)} ({total} samples)</h3><div id="graph">
+{chr(10).join(boxes)}
+</div></body></html>
+"""
+
+
+class RunProfiler:
+    """Profiles a whole run and writes its reports into `output_dir` when stopped.
+
+    mode "sampling" writes stacks.collapsed, flamegraph.html and by_function.txt;
+    mode "cprofile" writes profile.pstats and profile.txt. With `torch_profiler` the
+    torch profiler also records model ops into torch_trace.json and torch_ops.txt.
+    """
+
+    def __init__(self, output_dir, mode="sampling", interval=0.005, torch_profiler=False):
+        self.output_dir = output_dir
+        self.mode = mode
+        self.sampler = SamplingProfiler(interval) if mode == "sampling" else None
+        self.cprofile = cProfile.Profile() if mode == "cprofile" else None
+        self.torch_profile = None
+        if torch_profiler:
+            import torch.profiler
+            self.torch_profile = torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True
+            )
+
+    def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.torch_profile is not None:
+            self.torch_profile.__enter__()
+        if self.sampler is not None:
+            self.sampler.start()
+        if self.cprofile is not None:
+            self.cprofile.enable()
+
+    def stop(self):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(os.path.join(self.output_dir, "profile.pstats"))
+            with open(os.path.join(self.output_dir, "profile.txt"), "w") as file:
+                pstats.Stats(self.cprofile, stream=file).sort_stats("cumulative").print_stats(60)
+        if self.sampler is not None:
+            self.sampler.stop()
+            write_collapsed(self.sampler.stacks, os.path.join(self.output_dir, "stacks.collapsed"))
+            with open(os.path.join(self.output_dir, "flamegraph.html"), "w") as file:
+                file.write(render_flamegraph(self.sampler.stacks, "Summarization run"))
+            with open(os.path.join(self.output_dir, "by_function.txt"), "w") as file:
+                total = self.sampler.samples or 1
+                for function, count in self.sampler.by_function.most_common():
+                    file.write(f"{count:>8} {100.0 * count / total:6.1f}%  {function}\n")
+        if self.torch_profile is not None:
+            self.torch_profile.__exit__(None, None, None)
+            self.torch_profile.export_chrome_trace(os.path.join(self.output_dir, "torch_trace.json"))
+            with open(os.path.join(self.output_dir, "torch_ops.txt"), "w") as file:
+                file.write(self.torch_profile.key_averages().table(sort_by="self_cpu_time_total", row_limit=40))
+        print(f"Profile written to {self.output_dir}")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+
+def add_profile_arguments(parser):
+    """Adds the shared --profile options to a summarization CLI."""
+    parser.add_argument("--profile", metavar="DIR", help="Profile the run and write reports to this directory")
+    parser.add_argument("--profile_mode", choices=["sampling", "cprofile"], default="sampling",
+                        help="Sampling profiler with flamegraph output, or deterministic cProfile")
+    parser.add_argument("--profile_interval", type=float, default=0.005, help="Sampling interval in seconds")
+    parser.add_argument("--profile_torch", action="store_true", help="Also record model ops with the torch profiler")
+
+
+def profiler_from_args(args):
+    """Returns a RunProfiler for the parsed --profile options, or a no-op context when profiling is off."""
+    if not args.profile:
+        return contextlib.nullcontext()
+    return RunProfiler(args.profile, args.profile_mode, args.profile_interval, args.profile_torch)
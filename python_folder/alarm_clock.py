@@ -5,6 +5,9 @@ import argparse
 import ast
 from transformers import pipeline
 
+# Directories that never hold project sources
+SKIP_DIRS = {".git", ".hg", ".svn", "__pycache__", "node_modules", "site-packages", "venv", ".venv", ".tox"}
+
 # Initialize the pipeline with `facebook/bart-large-cnn`
 summarization_pipeline = pipeline("summarization", model="facebook/bart-large-cnn", tokenizer="facebook/bart-large-cnn")
 
@@ -37,6 +40,8 @@ if __name__ == "__main__":
 			summaries = []
 			print(f"Scanning directory: {args.local}")
 			for root, dirs, files in os.walk(args.local):
+				# Don't descend into VCS metadata, virtualenvs or vendored packages
+				dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
 				print(f"Checking directory: {root}")  # Debug statement
 				for file in files:
 					if file.endswith(".py"):
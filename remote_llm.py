@@ -0,0 +1,210 @@
+import os
+import time
+import random
+import asyncio
+import argparse
+
+import aiohttp
+
+import metrics
+
+# HTTP status codes that are worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class RemoteLLMError(Exception):
+    """Raised when a remote completion request fails for good."""
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute up to `capacity` and hands them out on demand."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount=1):
+        """Waits until `amount` units are available and takes them."""
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """Combines a requests-per-minute bucket with a tokens-per-minute bucket."""
+
+    def __init__(self, requests_per_minute=60, tokens_per_minute=90000):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    async def acquire(self, token_count):
+        await self.requests.acquire(1)
+        await self.tokens.acquire(token_count)
+
+
+def estimate_tokens(text):
+    """Roughly estimates the number of tokens in a piece of text (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Returns a full-jitter exponential backoff delay for the given retry attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AsyncLLMClient:
+    """Async completion client for OpenAI or Azure OpenAI with bounded concurrency, rate limiting and retries.
+
+    One client (and its HTTP session) is meant to be created per run and reused for every call.
+    """
+
+    def __init__(self, base_url="https://api.openai.com/v1", api_key=None, model="text-davinci-003",
+                 azure=False, api_version="2023-05-15", max_concurrency=8,
+                 requests_per_minute=60, tokens_per_minute=90000, max_retries=6, timeout=60):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key if api_key is not None else os.getenv("OPENAI_API_KEY", "")
+        self.model = model
+        self.azure = azure
+        self.api_version = api_version
+        self.max_retries = max_retries
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.session = None
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "tokens": 0}
+
+    def _endpoint(self):
+        if self.azure:
+            return (f"{self.base_url}/openai/deployments/{self.model}/completions"
+                    f"?api-version={self.api_version}")
+        return f"{self.base_url}/completions"
+
+    def _headers(self):
+        if self.azure:
+            return {"api-key": self.api_key}
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    async def _get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=self.timeout, headers=self._headers())
+        return self.session
+
+    async def complete(self, prompt, max_tokens=150):
+        """Sends a single completion request, retrying on 429/5xx and network errors."""
+        payload = {"prompt": prompt, "max_tokens": max_tokens}
+        if not self.azure:
+            payload["model"] = self.model
+        token_cost = estimate_tokens(prompt) + max_tokens
+        session = await self._get_session()
+
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(token_cost)
+            retry_after = None
+            async with self.semaphore:
+                self.stats["requests"] += 1
+                try:
+                    async with session.post(self._endpoint(), json=payload) as response:
+                        if response.status == 200:
+                            data = await response.json()
+                            usage = data.get("usage", {})
+                            self.stats["tokens"] += usage.get("total_tokens", token_cost)
+                            return data["choices"][0]["text"].strip()
+                        body = await response.text()
+                        if response.status not in RETRYABLE_STATUS:
+                            self.stats["failures"] += 1
+                            raise RemoteLLMError(f"Request failed with status {response.status}: {body}")
+                        retry_after = response.headers.get("Retry-After")
+                        error = f"status {response.status}"
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = str(e) or type(e).__name__
+
+            if attempt == self.max_retries:
+                break
+            self.stats["retries"] += 1
+            metrics.count("generate", retries=1)
+            delay = backoff_delay(attempt)
+            if retry_after:
+                try:
+                    delay = max(delay, float(retry_after))
+                except ValueError:
+                    pass
+            await asyncio.sleep(delay)
+
+        self.stats["failures"] += 1
+        raise RemoteLLMError(f"Giving up after {self.max_retries + 1} attempts: {error}")
+
+    async def complete_many(self, prompts, max_tokens=150):
+        """Runs many prompts concurrently; failed prompts come back as RemoteLLMError instances."""
+        tasks = [self.complete(prompt, max_tokens) for prompt in prompts]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+def summarize_chunks_remote(chunks, **client_kwargs):
+    """Summarizes code chunks through one shared AsyncLLMClient and returns the summaries in order."""
+    async def run():
+        async with AsyncLLMClient(**client_kwargs) as client:
+            prompts = [f"Summarize the following Python code:\n\n{chunk}" for chunk in chunks]
+            return await client.complete_many(prompts)
+
+    results = asyncio.run(run())
+    summaries = []
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, Exception):
+            print(f"Failed to summarize chunk: {result}")
+            summaries.append("")
+        else:
+            summaries.append(result)
+    return summaries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput check for the async remote LLM client")
+    parser.add_argument("--base_url", default="http://127.0.0.1:8089/v1", help="Completions API base URL")
+    parser.add_argument("--requests", type=int, default=100, help="Number of prompts to send")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum requests in flight")
+    parser.add_argument("--rpm", type=int, default=600, help="Requests per minute limit")
+    parser.add_argument("--tpm", type=int, default=200000, help="Tokens per minute limit")
+    parser.add_argument("--azure", action="store_true", help="Use the Azure OpenAI URL layout")
+    args = parser.parse_args()
+
+    async def main():
+        prompts = [f"def f{i}(x):\n    return x + {i}\n" for i in range(args.requests)]
+        async with AsyncLLMClient(base_url=args.base_url, api_key="test", azure=args.azure,
+                                  max_concurrency=args.concurrency, requests_per_minute=args.rpm,
+                                  tokens_per_minute=args.tpm) as client:
+            start = time.perf_counter()
+            results = await client.complete_many(prompts, max_tokens=20)
+            elapsed = time.perf_counter() - start
+        failed = sum(1 for result in results if isinstance(result, Exception))
+        print(f"{len(prompts)} prompts in {elapsed:.2f}s ({len(prompts) / elapsed:.1f} req/s), "
+              f"{failed} failed, stats: {client.stats}")
+
+    asyncio.run(main())
+
+# Usage example (against the local stub server):
+# python llm_stub_server.py --port 8089 --error_rate 0.2
+# python remote_llm.py --base_url http://127.0.0.1:8089/v1 --requests 200
@@ -0,0 +1,252 @@
+import os
+import ast
+import re
+import argparse
+from collections import defaultdict
+
+from code_units import estimate_tokens
+from source_scan import scan_source_files
+
+FILE_PROMPT = """Below is an outline of one Python module: its docstring, imports, top-level names and a
+one-line summary of each function and method. Summarize what the module does and how its parts fit
+together in two to four sentences.
+
+{digest}
+Summary:"""
+
+PACKAGE_PROMPT = """Below are summaries of the modules and subpackages of one Python package. Summarize
+what the package is for and what each part contributes in two to four sentences.
+
+{digest}
+Summary:"""
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def first_sentence(text):
+    text = " ".join((text or "").split())
+    return _SENTENCE_END.split(text, 1)[0] if text else ""
+
+
+def file_outline(code):
+    """Returns the module docstring, imported modules, constants, and top-level classes and functions.
+
+    Classes come as (name, bases, docstring, [method nodes]) and functions as nodes, both in source order.
+    """
+    tree = ast.parse(code)
+    imports, constants, classes, functions = [], [], [], []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            imports.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            imports.append("." * node.level + node.module)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            constants.extend(target.id for target in targets if isinstance(target, ast.Name) and target.id.isupper())
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.append(node)
+        elif isinstance(node, ast.ClassDef):
+            methods = [child for child in node.body if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            classes.append((node.name, [ast.unparse(base) for base in node.bases], ast.get_docstring(node), methods))
+    return {"docstring": ast.get_docstring(tree), "imports": list(dict.fromkeys(imports)),
+            "constants": constants, "classes": classes, "functions": functions}
+
+
+def file_digest(path, code, summaries, token_budget=800):
+    """Builds the model input for a file summary from its outline and its function summaries.
+
+    `summaries` maps a function's source segment to its summary. If the digest exceeds
+    `token_budget`, summaries are cut to their first sentence, then private names are dropped.
+    """
+    outline = file_outline(code)
+
+    def entry(node, indent=""):
+        summary = summaries.get(ast.get_source_segment(code, node), "")
+        return node.name, f"{indent}- {node.name}: {summary}" if summary else f"{indent}- {node.name}"
+
+    header = [f"Module: {path}"]
+    if outline["docstring"]:
+        header.append(f"Docstring: {first_sentence(outline['docstring'])}")
+    if outline["imports"]:
+        header.append(f"Imports: {', '.join(outline['imports'])}")
+    if outline["constants"]:
+        header.append(f"Constants: {', '.join(outline['constants'])}")
+    entries = []
+    for name, bases, docstring, methods in outline["classes"]:
+        line = f"Class {name}({', '.join(bases)})" if bases else f"Class {name}"
+        entries.append((name, f"{line}: {first_sentence(docstring)}" if docstring else line))
+        entries.extend(entry(method, "  ") for method in methods)
+    if outline["functions"]:
+        entries.append(("", "Functions:"))
+        entries.extend(entry(node) for node in outline["functions"])
+
+    def render(lines):
+        return "\n".join(header + [line for _, line in lines])
+
+    digest = render(entries)
+    if estimate_tokens(digest) > token_budget:
+        entries = [(name, line.split(": ", 1)[0] + ": " + first_sentence(line.split(": ", 1)[1]) if ": " in line else line)
+                   for name, line in entries]
+        digest = render(entries)
+    if estimate_tokens(digest) > token_budget:
+        entries = [(name, line) for name, line in entries if not name.startswith("_") or name.startswith("__init__")]
+        digest = render(entries)
+    return digest[:token_budget * 4]
+
+
+def package_digest(package, children, token_budget=800):
+    """Builds the model input for a package summary from [(kind, name, summary)] of its modules and subpackages."""
+    lines = [f"Package: {package}"]
+    lines.extend(f"- {kind} {name}: {summary}" for kind, name, summary in children)
+    digest = "\n".join(lines)
+    if estimate_tokens(digest) > token_budget:
+        lines = lines[:1] + [f"- {kind} {name}: {first_sentence(summary)}" for kind, name, summary in children]
+        digest = "\n".join(lines)
+    return digest[:token_budget * 4]
+
+
+def extractive_summary(digest):
+    """Model-free summary of a digest: its docstring, or the first sentences of its first few entries."""
+    docstring = re.search(r"^Docstring: (.+)$", digest, flags=re.MULTILINE)
+    if docstring:
+        return docstring.group(1)
+    parts = [match.group(1) + ": " + first_sentence(match.group(2))
+             for match in re.finditer(r"^\s*- (?:\w+ )?([\w.]+): (.+)$", digest, flags=re.MULTILINE)]
+    parts = [part for part in parts if not part.lstrip().startswith("_")] or parts
+    if not parts:
+        names = re.findall(r"^\s*- (?:\w+ )?([\w.]+)$", digest, flags=re.MULTILINE)
+        return f"Defines {', '.join(names[:8])}." if names else ""
+    return " ".join(parts[:3])
+
+
+def _parent(path):
+    """The directory of a normalized path, with "." rather than "" for top-level entries."""
+    return os.path.dirname(path) or "."
+
+
+def _inside(directory, root):
+    """True if `directory` lies below `root`; "." contains every relative path."""
+    if root == ".":
+        return not os.path.isabs(directory) and directory != ".." and not directory.startswith(".." + os.sep)
+    return directory.startswith(root.rstrip(os.sep) + os.sep)
+
+
+class Rollup:
+    """Builds file and package summaries bottom-up from function summaries.
+
+    Files are summarized from a digest of their outline and function summaries instead of their raw
+    source; each package is summarized from the summaries of its modules and subpackages, deepest
+    first, up to `root`. `summarize_text(prompt, max_length)` returns a summary; without it the
+    summaries are extractive. Input tokens are tallied against those of the raw sources.
+    """
+
+    def __init__(self, summarize_text=None, max_length=150, token_budget=800):
+        self.summarize_text = summarize_text
+        self.max_length = max_length
+        self.token_budget = token_budget
+        self.files = {}
+        self.packages = {}
+        self.source_tokens = 0
+        self.digest_tokens = 0
+
+    def _summarize(self, template, digest):
+        self.digest_tokens += estimate_tokens(digest)
+        if self.summarize_text is None:
+            return extractive_summary(digest)
+        return self.summarize_text(template.format(digest=digest), self.max_length)
+
+    def add_file(self, path, code, summaries):
+        """Summarizes one file; `summaries` maps each function's source to its summary."""
+        self.source_tokens += estimate_tokens(code)
+        try:
+            digest = file_digest(path, code, summaries, self.token_budget)
+        except SyntaxError as e:
+            print(f"Skipping rollup of {path}: {e}")
+            return None
+        self.files[path] = self._summarize(FILE_PROMPT, digest)
+        return self.files[path]
+
+    def add_functions(self, path, code, functions, summaries):
+        """Like add_file, for the (name, func_code, ...) tuples and aligned summaries of extract_functions."""
+        return self.add_file(path, code, {function[1]: summary for function, summary in zip(functions, summaries)})
+
+    def build_packages(self, root=None):
+        """Summarizes every package from its modules and subpackages, deepest first, up to `root`.
+
+        `root` defaults to the directory shared by all summarized files. Returns {package: summary}.
+        """
+        files = {os.path.normpath(path): summary for path, summary in self.files.items() if summary}
+        if not files:
+            return self.packages
+        root = os.path.normpath(root) if root else os.path.commonpath([_parent(path) for path in files]) or "."
+        if os.path.isfile(root):
+            root = _parent(root)
+        children = defaultdict(list)
+        for path, summary in files.items():
+            children[_parent(path)].append(("module", os.path.basename(path), summary))
+        directories = set()
+        for directory in list(children):
+            while directory not in directories:
+                directories.add(directory)
+                if directory == root or not _inside(directory, root):
+                    break
+                directory = _parent(directory)
+        depth = {directory: 0 if directory == root else len(os.path.relpath(directory, root).split(os.sep))
+                 for directory in directories}
+        for directory in sorted(directories, key=depth.get, reverse=True):
+            summary = self._summarize(PACKAGE_PROMPT, package_digest(directory, children[directory], self.token_budget))
+            self.packages[directory] = summary
+            if directory != root:
+                children[_parent(directory)].append(("package", os.path.basename(directory), summary))
+        return self.packages
+
+    def report(self):
+        saved = 1 - self.digest_tokens / self.source_tokens if self.source_tokens else 0.0
+        return (f"rollup: {len(self.files)} files, {len(self.packages)} packages from {self.digest_tokens} input tokens "
+                f"instead of {self.source_tokens} source tokens ({saved:.1%} fewer)")
+
+    def render(self):
+        """Renders package and file summaries as Markdown, packages outermost first."""
+        sections = []
+        for package in sorted(self.packages, key=lambda name: (name.count(os.sep), name)):
+            lines = [f"## {package}", "", self.packages[package]]
+            for path in sorted(self.files):
+                if _parent(os.path.normpath(path)) == package and self.files[path]:
+                    lines.extend(["", f"### {os.path.basename(path)}", "", self.files[path]])
+            sections.append("\n".join(lines))
+        return "\n\n".join(sections) + "\n"
+
+    def write(self, output_path):
+        with open(output_path, 'w') as file:
+            file.write(self.render())
+
+
+if __name__ == "__main__":
+    from summary_store import SummaryStore
+
+    parser = argparse.ArgumentParser(description="Build module and package summaries from stored function summaries")
+    parser.add_argument("root", help="Project directory whose functions were summarized with --store")
+    parser.add_argument("--store", default="summaries.db", help="SQLite store written with --store")
+    parser.add_argument("--repo", help="Repository label in the store (defaults to the absolute root path)")
+    parser.add_argument("--token_budget", type=int, default=800, help="Maximum tokens per digest")
+    parser.add_argument("--output", help="Write the Markdown here instead of printing it")
+    args = parser.parse_args()
+
+    store = SummaryStore(args.store)
+    summaries = defaultdict(dict)
+    for _, _, filepath, _, _, summary, code in store.rows(args.repo or os.path.abspath(args.root)):
+        summaries[filepath][code] = summary
+    store.close()
+
+    rollup = Rollup(token_budget=args.token_budget)
+    for filepath in scan_source_files(args.root):
+        with open(filepath, 'r') as file:
+            rollup.add_file(filepath, file.read(), summaries.get(filepath, {}))
+    rollup.build_packages(args.root)
+    if args.output:
+        rollup.write(args.output)
+    else:
+        print(rollup.render())
+    print(rollup.report())
+
+#usage python rollup.py path/to/project --store summaries.db --output ARCHITECTURE.md
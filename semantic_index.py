@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+
+from batching import AdaptiveBatcher
+from summary_store import SummaryStore
+
+ENCODER_MODEL = "microsoft/codebert-base"
+# Above this many vectors a coarse quantizer is built by default, so queries scan only a few lists
+IVF_THRESHOLD = 20000
+_SEARCH_CHUNK = 16384
+
+
+class CodeBertEncoder:
+    """Encodes (summary, code) pairs and queries into unit-length vectors with CodeBERT.
+
+    Pairs go in as CodeBERT's bimodal `text </s> code` input; vectors are the attention-masked
+    mean of the last hidden states, normalized so a dot product is the cosine similarity.
+    """
+
+    def __init__(self, model_name=ENCODER_MODEL, batch_size=32, max_length=256, device="cpu", batcher=None):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).to(device).eval()
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.device = device
+        self.batcher = batcher
+        self.dimension = self.model.config.hidden_size
+
+    def _encode_batch(self, batch, second):
+        inputs = self.tokenizer(batch, second, padding=True, truncation=True,
+                                max_length=self.max_length, return_tensors="pt").to(self.device)
+        hidden = self.model(**inputs).last_hidden_state
+        mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1.0)
+        pooled = self.torch.nn.functional.normalize(pooled, dim=-1)
+        return pooled.cpu().numpy().astype(np.float32)
+
+    def encode(self, texts, pairs=None):
+        """Returns a float32 matrix with one normalized row per text (or per (text, pair) input).
+
+        With a `batcher` (batching.AdaptiveBatcher) batch sizes follow its memory guard instead of `batch_size`.
+        """
+        if not len(texts):
+            return np.zeros((0, self.dimension), np.float32)
+        with self.torch.inference_mode():
+            if self.batcher is not None:
+                inputs = list(zip(texts, pairs if pairs is not None else [None] * len(texts)))
+                rows = self.batcher.run(
+                    inputs,
+                    lambda batch: list(self._encode_batch([text for text, _ in batch],
+                                                          [pair for _, pair in batch] if pairs is not None else None)),
+                    # About four characters per BPE token on code and English, capped where the tokenizer truncates
+                    lambda item: min(self.max_length, (len(item[0]) + len(item[1] or "")) // 4 + 2))
+                return np.stack(rows)
+            batches = []
+            for start in range(0, len(texts), self.batch_size):
+                second = pairs[start:start + self.batch_size] if pairs is not None else None
+                batches.append(self._encode_batch(texts[start:start + self.batch_size], second))
+        return np.concatenate(batches)
+
+
+def kmeans(vectors, clusters, iterations=10, sample=50000, seed=0):
+    """Spherical k-means on normalized vectors; returns float32 unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(vectors), size=min(sample, len(vectors)), replace=False)
+    data = np.asarray(vectors[np.sort(rows)], dtype=np.float32)
+    centroids = data[rng.choice(len(data), size=clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # Re-seed clusters that lost all their points
+        sums[empty] = data[rng.choice(len(data), size=int(empty.sum()), replace=False)]
+        norms[empty] = 1.0
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+
+class EmbeddingIndex:
+    """Function embeddings kept as a memory-mapped float16 matrix with vectorized top-k cosine search.
+
+    The directory holds `vectors.npy` (float16, one unit-length row per function), `meta.json`
+    (the matching rows of the summary store) and, for large corpora, `ivf.npz`: centroids plus the
+    rows of each inverted list, so a query only scans the `nprobe` lists nearest to it.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "meta.json"), 'r') as file:
+            self.meta = json.load(file)
+        self.centroids = None
+        ivf_path = os.path.join(directory, "ivf.npz")
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as ivf:
+                self.centroids = ivf["centroids"]
+                self.order = ivf["order"]
+                self.offsets = ivf["offsets"]
+
+    @classmethod
+    def build(cls, directory, store, encoder, repo=None, clusters=None):
+        """Encodes every function in the store in batches and writes the index to `directory`."""
+        os.makedirs(directory, exist_ok=True)
+        total = store.count(repo)
+        vectors = np.lib.format.open_memmap(os.path.join(directory, "vectors.npy"), mode="w+",
+                                            dtype=np.float16, shape=(total, encoder.dimension))
+        meta = []
+        batch = []
+
+        def flush():
+            summaries = [row[5] or row[4] for row in batch]
+            codes = [row[6] or row[4] for row in batch]
+            vectors[len(meta):len(meta) + len(batch)] = encoder.encode(summaries, codes)
+            meta.extend({"id": row[0], "repo": row[1], "file": row[2], "name": row[3], "signature": row[4],
+                         "summary": row[5]} for row in batch)
+            batch.clear()
+
+        for row in store.rows(repo):
+            batch.append(row)
+            if len(batch) == encoder.batch_size * 8:
+                flush()
+        if batch:
+            flush()
+        vectors.flush()
+        with open(os.path.join(directory, "meta.json"), 'w') as file:
+            json.dump(meta, file)
+
+        if clusters is None and total >= IVF_THRESHOLD:
+            clusters = int(np.sqrt(total))
+        if clusters and clusters > total:
+            print(f"Only {total} functions to index; using {total} IVF lists instead of {clusters}")
+            clusters = total
+        if clusters:
+            centroids = kmeans(vectors, clusters)
+            assignment = np.concatenate([np.argmax(np.asarray(vectors[start:start + _SEARCH_CHUNK], np.float32)
+                                                   @ centroids.T, axis=1)
+                                         for start in range(0, total, _SEARCH_CHUNK)])
+            order = np.argsort(assignment, kind="stable").astype(np.int64)
+            offsets = np.searchsorted(assignment[order], np.arange(clusters + 1)).astype(np.int64)
+            np.savez(os.path.join(directory, "ivf.npz"), centroids=centroids, order=order, offsets=offsets)
+        elif os.path.exists(os.path.join(directory, "ivf.npz")):
+            os.remove(os.path.join(directory, "ivf.npz"))
+        return cls(directory)
+
+    def _candidates(self, query, nprobe):
+        lists = np.argsort(-(self.centroids @ query))[:nprobe]
+        return np.sort(np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists]))
+
+    def search(self, query_vector, k=10, nprobe=8, exact=False):
+        """Returns [(score, meta)] for the k rows with the highest cosine similarity to the query vector."""
+        query = np.asarray(query_vector, np.float32).reshape(-1)
+        if self.centroids is not None and not exact:
+            rows = self._candidates(query, nprobe)
+            scores = np.asarray(self.vectors[rows], np.float32) @ query
+        else:
+            rows = None
+            # float16 has no BLAS path; upcast in chunks so memory stays bounded
+            scores = np.concatenate([np.asarray(self.vectors[start:start + _SEARCH_CHUNK], np.float32) @ query
+                                     for start in range(0, len(self.vectors), _SEARCH_CHUNK)])
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        positions = top if rows is None else rows[top]
+        return [(float(scores[i]), self.meta[position]) for i, position in zip(top, positions)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Natural-language code search over stored summaries")
+    parser.add_argument("command", choices=["build", "search"])
+    parser.add_argument("query", nargs="*", help="search: what the function should do")
+    parser.add_argument("--store", default="summaries.db", help="SQLite store written with --store")
+    parser.add_argument("--index", default="semantic_index", help="Directory of the embedding index")
+    parser.add_argument("--repo", help="build: only index this repository")
+    parser.add_argument("--clusters", type=int, help="build: IVF lists (default sqrt(N) above 20k functions, 0 = none)")
+    parser.add_argument("--batch_size", type=int, default=32, help="Encoder batch size")
+    parser.add_argument("--memory_ceiling_mb", type=float,
+                        help="build: size encoder batches (up to --batch_size) to keep RSS under this ceiling")
+    parser.add_argument("--k", type=int, default=10, help="search: number of results")
+    parser.add_argument("--nprobe", type=int, default=8, help="search: IVF lists to scan")
+    parser.add_argument("--exact", action="store_true", help="search: scan every vector even if an IVF exists")
+    args = parser.parse_args()
+
+    batcher = AdaptiveBatcher(args.memory_ceiling_mb, args.batch_size) if args.memory_ceiling_mb else None
+    encoder = CodeBertEncoder(batch_size=args.batch_size, batcher=batcher)
+    if args.command == "build":
+        store = SummaryStore(args.store)
+        start = time.perf_counter()
+        index = EmbeddingIndex.build(args.index, store, encoder, args.repo, args.clusters)
+        store.close()
+        print(f"Indexed {len(index.meta)} functions in {time.perf_counter() - start:.1f}s "
+              f"({'IVF with %d lists' % len(index.centroids) if index.centroids is not None else 'exact'})")
+        if batcher is not None:
+            print(batcher.report())
+    else:
+        index = EmbeddingIndex(args.index)
+        start = time.perf_counter()
+        query_vector = encoder.encode([" ".join(args.query)])[0]
+        encoded = time.perf_counter()
+        results = index.search(query_vector, args.k, args.nprobe, args.exact)
+        searched = time.perf_counter()
+        for score, meta in results:
+            print(f"{score:.3f}  {meta['repo']}:{meta['file']}  {meta['signature']}\n       {meta['summary']}")
+        print(f"encode {1000 * (encoded - start):.1f} ms, search {1000 * (searched - encoded):.1f} ms")
+
+#usage python semantic_index.py build --store summaries.db --index semantic_index
+#usage python semantic_index.py build --store summaries.db --batch_size 128 --memory_ceiling_mb 3000
+#usage python semantic_index.py search "fetch a file from github with a token" --index semantic_index
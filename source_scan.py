@@ -0,0 +1,227 @@
+import os
+import re
+import json
+import hashlib
+import fnmatch
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Directories and files that never hold source worth summarizing
+DEFAULT_EXCLUDES = (
+    ".git", ".hg", ".svn", "__pycache__", "node_modules", "site-packages", "venv", ".venv", "env",
+    ".tox", ".nox", ".mypy_cache", ".pytest_cache", ".ruff_cache", "build", "dist", "*.egg-info",
+)
+
+
+def _gitignore_regex(pattern):
+    """Translates one .gitignore glob (without `!` or trailing `/`) into a regex over relative paths."""
+    anchored = "/" in pattern.rstrip("/")
+    pattern = pattern.lstrip("/")
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            regex += "/.*"
+            i += 3
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i)
+            if end == -1:
+                regex += re.escape(pattern[i])
+                i += 1
+            else:
+                regex += pattern[i:end + 1]
+                i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    prefix = "" if anchored else "(?:.*/)?"
+    return re.compile(f"^{prefix}{regex}$")
+
+
+class IgnoreRules:
+    """The .gitignore rules in effect for one directory, chained to those of its parents.
+
+    Supports comments, `!` negation, trailing `/` for directories only, leading `/` and inner `/`
+    anchoring, and `*`, `?`, `[...]` and `**` globs.
+    """
+
+    def __init__(self, base, rules=(), parent=None):
+        self.base = base
+        self.rules = rules
+        self.parent = parent
+
+    @classmethod
+    def load(cls, directory, parent=None):
+        path = os.path.join(directory, ".gitignore")
+        try:
+            with open(path, 'r', errors="replace") as file:
+                lines = file.read().splitlines()
+        except OSError:
+            return parent
+        rules = []
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            directory_only = line.endswith("/")
+            rules.append((_gitignore_regex(line.rstrip("/")), negated, directory_only))
+        return cls(directory, tuple(rules), parent) if rules else parent
+
+    def ignored(self, path, is_dir):
+        """Returns True/False if some rule decides `path`, checking the nearest .gitignore last."""
+        decision = self.parent.ignored(path, is_dir) if self.parent is not None else None
+        relative = os.path.relpath(path, self.base).replace(os.sep, "/")
+        for regex, negated, directory_only in self.rules:
+            if directory_only and not is_dir:
+                continue
+            if regex.match(relative):
+                decision = not negated
+        return decision
+
+
+def excluded(name, excludes=DEFAULT_EXCLUDES):
+    """Returns True if a file or directory name matches one of the exclude globs."""
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in excludes)
+
+
+def _scan_directory(directory, rules, excludes, use_gitignore, suffix):
+    """Lists one directory with os.scandir; returns (matching files, [(subdirectory, rules)])."""
+    if use_gitignore:
+        rules = IgnoreRules.load(directory, rules)
+    files, subdirectories = [], []
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return files, subdirectories
+    for entry in entries:
+        if excluded(entry.name, excludes):
+            continue
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+        except OSError:
+            continue
+        if rules is not None and rules.ignored(entry.path, is_dir):
+            continue
+        if is_dir:
+            subdirectories.append((entry.path, rules))
+        elif entry.name.endswith(suffix):
+            files.append(entry.path)
+    return files, subdirectories
+
+
+def scan_source_files(root, suffix=".py", excludes=DEFAULT_EXCLUDES, use_gitignore=True, workers=8):
+    """Returns the sorted paths of `suffix` files under `root`, skipping excluded and ignored paths.
+
+    Directories are listed with os.scandir, which gets file types from the directory entry and
+    needs no extra stat; with `workers` > 1 several directories are listed at once.
+    """
+    if os.path.isfile(root):
+        return [root] if root.endswith(suffix) else []
+    found = []
+    if workers <= 1:
+        pending = [(root, None)]
+        while pending:
+            directory, rules = pending.pop()
+            files, subdirectories = _scan_directory(directory, rules, excludes, use_gitignore, suffix)
+            found.extend(files)
+            pending.extend(subdirectories)
+        return sorted(found)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_scan_directory, root, None, excludes, use_gitignore, suffix)]
+        while futures:
+            files, subdirectories = futures.pop().result()
+            found.extend(files)
+            futures.extend(executor.submit(_scan_directory, directory, rules, excludes, use_gitignore, suffix)
+                           for directory, rules in subdirectories)
+    return sorted(found)
+
+
+def _file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FileIndex:
+    """Persistent (path, size, mtime, hash) index used to skip files that haven't changed.
+
+    A file whose size and mtime match its entry is unchanged without being read; one whose
+    stat changed is hashed, so a touch or checkout that leaves the content alone is still
+    skipped. Entries are only updated through `mark`, once a file has actually been processed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._pending = {}
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                self.entries = json.load(file)
+
+    def changed(self, paths):
+        """Returns the paths that are new or whose content changed since they were last marked."""
+        changed = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = self.entries.get(path)
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                continue
+            digest = _file_hash(path)
+            current = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": digest}
+            if entry and entry["sha1"] == digest:
+                self.entries[path] = current
+                continue
+            self._pending[path] = current
+            changed.append(path)
+        return changed
+
+    def mark(self, path):
+        """Records a processed file so later runs skip it until it changes."""
+        if path in self._pending:
+            self.entries[path] = self._pending.pop(path)
+
+    def save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(self.entries, file)
+        os.replace(temp_path, self.path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List the Python sources the summarizers would scan")
+    parser.add_argument("root", help="Directory to scan")
+    parser.add_argument("--no_gitignore", action="store_true", help="Don't honor .gitignore files")
+    parser.add_argument("--exclude", nargs="*", default=[], help="Extra exclude globs for file/directory names")
+    parser.add_argument("--workers", type=int, default=8, help="Directories listed in parallel")
+    parser.add_argument("--index", help="Only list files changed since the last run recorded in this index")
+    args = parser.parse_args()
+
+    files = scan_source_files(args.root, excludes=DEFAULT_EXCLUDES + tuple(args.exclude),
+                              use_gitignore=not args.no_gitignore, workers=args.workers)
+    if args.index:
+        index = FileIndex(args.index)
+        files = index.changed(files)
+        for path in files:
+            index.mark(path)
+        index.save()
+    print("\n".join(files))
+    print(f"{len(files)} files")
+
+#usage python source_scan.py path/to/project --exclude "*_pb2.py" --index .scan_index.json
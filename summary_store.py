@@ -0,0 +1,168 @@
+import re
+import time
+import hashlib
+import sqlite3
+import argparse
+
+from code_units import signature_of
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    id INTEGER PRIMARY KEY,
+    repo TEXT NOT NULL,
+    file TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    code TEXT NOT NULL DEFAULT '',
+    source TEXT,
+    code_hash TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (repo, file, position)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(
+    name, signature, summary, content='summaries', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS summaries_ai AFTER INSERT ON summaries BEGIN
+    INSERT INTO summaries_fts (rowid, name, signature, summary) VALUES (new.id, new.name, new.signature, new.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS summaries_ad AFTER DELETE ON summaries BEGIN
+    INSERT INTO summaries_fts (summaries_fts, rowid, name, signature, summary)
+    VALUES ('delete', old.id, old.name, old.signature, old.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS summaries_au AFTER UPDATE ON summaries BEGIN
+    INSERT INTO summaries_fts (summaries_fts, rowid, name, signature, summary)
+    VALUES ('delete', old.id, old.name, old.signature, old.summary);
+    INSERT INTO summaries_fts (rowid, name, signature, summary) VALUES (new.id, new.name, new.signature, new.summary);
+END;
+"""
+
+
+class SummaryStore:
+    """Persistent store of generated summaries with an FTS5 index over name, signature and summary.
+
+    Rows are keyed by (repo, file, position) so runs over many repositories share one database,
+    and each file is replaced in a single transaction as soon as it has been summarized.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.executescript(SCHEMA)
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(summaries)")}
+        if "code" not in columns:
+            # Stores created before the source was kept (needed for code embeddings)
+            self.connection.execute("ALTER TABLE summaries ADD COLUMN code TEXT NOT NULL DEFAULT ''")
+        if "source" not in columns:
+            # Stores created before the fast-path source of a summary was kept
+            self.connection.execute("ALTER TABLE summaries ADD COLUMN source TEXT")
+
+    def record_file(self, repo, filepath, functions, summaries, sources=None):
+        """Stores the summaries of one file's functions, given as the tuples from extract_functions.
+
+        Only the name and code (the first two items) are used; the signature is derived from the
+        code. `sources` optionally tags each summary with what produced it ("model", "docstring",
+        ...). Rows for functions that no longer exist in the file are removed.
+        """
+        now = time.time()
+        sources = sources or [None] * len(functions)
+        rows = []
+        for position, (function, summary, source) in enumerate(zip(functions, summaries, sources)):
+            name, func_code = function[0], function[1]
+            code_hash = hashlib.sha1(func_code.encode("utf-8")).hexdigest()
+            rows.append((repo, filepath, position, name, signature_of(func_code), summary, func_code, source,
+                         code_hash, now))
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO summaries (repo, file, position, name, signature, summary, code, source, code_hash, "
+                "updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (repo, file, position) DO UPDATE SET name = excluded.name, "
+                "signature = excluded.signature, summary = excluded.summary, code = excluded.code, "
+                "source = excluded.source, code_hash = excluded.code_hash, updated_at = excluded.updated_at", rows)
+            self.connection.execute(
+                "DELETE FROM summaries WHERE repo = ? AND file = ? AND position >= ?", (repo, filepath, len(rows)))
+
+    def search(self, query, repo=None, limit=20):
+        """Full-text search; returns dicts ranked by BM25 (name matches weigh most, then signature)."""
+        sql = ("SELECT s.repo, s.file, s.name, s.signature, s.summary, s.source, "
+               "bm25(summaries_fts, 10.0, 5.0, 1.0) AS rank "
+               "FROM summaries_fts JOIN summaries s ON s.id = summaries_fts.rowid "
+               "WHERE summaries_fts MATCH ?")
+        params = [query]
+        if repo:
+            sql += " AND s.repo = ?"
+            params.append(repo)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        columns = ("repo", "file", "name", "signature", "summary", "source", "rank")
+        return [dict(zip(columns, row)) for row in self.connection.execute(sql, params)]
+
+    def rows(self, repo=None):
+        """Yields (id, repo, file, name, signature, summary, code) for every stored function, in id order."""
+        sql = "SELECT id, repo, file, name, signature, summary, code FROM summaries"
+        params = ()
+        if repo:
+            sql += " WHERE repo = ?"
+            params = (repo,)
+        yield from self.connection.execute(sql + " ORDER BY id", params)
+
+    def count(self, repo=None):
+        if repo:
+            return self.connection.execute("SELECT COUNT(*) FROM summaries WHERE repo = ?", (repo,)).fetchone()[0]
+        return self.connection.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def stats(self):
+        """Returns (repo, files, functions) for every repository in the store."""
+        return self.connection.execute(
+            "SELECT repo, COUNT(DISTINCT file), COUNT(*) FROM summaries GROUP BY repo ORDER BY repo").fetchall()
+
+    def close(self):
+        self.connection.close()
+
+
+def match_query(text):
+    """Turns free text into an FTS5 query that matches rows containing every word (prefixes allowed).
+
+    Words are split on underscores and punctuation the way the unicode61 tokenizer indexed them,
+    so `get_github_file_content` finds the function of that name. Returns None when the text has
+    no words to search for, since FTS5 rejects an empty query.
+    """
+    words = re.findall(r"[^\W_]+", text)
+    return " ".join(f'"{word}"*' for word in words) if words else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search stored function summaries")
+    parser.add_argument("query", nargs="*", help="Words to look for in names, signatures and summaries")
+    parser.add_argument("--store", default="summaries.db", help="SQLite store written with --store")
+    parser.add_argument("--repo", help="Only search this repository")
+    parser.add_argument("--limit", type=int, default=10, help="Maximum number of results")
+    parser.add_argument("--raw", action="store_true", help="Pass the query to FTS5 unchanged (AND/OR/NEAR, column:)")
+    parser.add_argument("--stats", action="store_true", help="List the repositories in the store")
+    args = parser.parse_args()
+
+    store = SummaryStore(args.store)
+    try:
+        if args.stats or not args.query:
+            for repo, files, functions in store.stats():
+                print(f"{repo}: {files} files, {functions} functions")
+        else:
+            text = " ".join(args.query)
+            query = text if args.raw else match_query(text)
+            if not query:
+                print(f"no searchable words in {text!r}")
+            else:
+                start = time.perf_counter()
+                results = store.search(query, args.repo, args.limit)
+                elapsed = time.perf_counter() - start
+                for result in results:
+                    source = f"  [{result['source']}]" if result["source"] else ""
+                    print(f"{result['repo']}:{result['file']}  {result['signature']}{source}\n"
+                          f"    {result['summary']}")
+                print(f"{len(results)} results in {elapsed * 1000:.1f} ms")
+    finally:
+        store.close()
+
+#usage python summary_store.py github auth token --store summaries.db
+#usage python summary_store.py 'name:fetch* AND summary:github' --raw --repo pypa/sampleproject
@@ -0,0 +1,43 @@
+from rollup import Rollup
+
+
+def captured_rollup():
+    """A Rollup whose package prompts are recorded and answered with the package name."""
+    prompts = {}
+
+    def summarize_text(prompt, max_length):
+        package = prompt.split("Package: ", 1)[1].split("\n", 1)[0] if "Package: " in prompt else None
+        if package is None:
+            return "file summary"
+        prompts[package] = prompt
+        return f"summary of {package}"
+
+    return Rollup(summarize_text), prompts
+
+
+def test_dot_root_includes_subpackages():
+    rollup, prompts = captured_rollup()
+    rollup.files = {"./main.py": "entry point", "./pkg/core.py": "core logic", "./pkg/sub/util.py": "helpers"}
+    packages = rollup.build_packages(root=".")
+    assert set(packages) == {".", "pkg", "pkg/sub"}
+    assert "- package pkg: summary of pkg" in prompts["."]
+    assert "- package sub: summary of pkg/sub" in prompts["pkg"]
+
+
+def test_mixed_depths_without_root_attach_to_top():
+    rollup, prompts = captured_rollup()
+    rollup.files = {"setup.py": "packaging", "src/app.py": "the app", "src/lib/io.py": "file io", "docs/conf.py": "docs"}
+    packages = rollup.build_packages()
+    assert set(packages) == {".", "src", "src/lib", "docs"}
+    assert "- module setup.py: packaging" in prompts["."]
+    assert "- package src: summary of src" in prompts["."]
+    assert "- package docs: summary of docs" in prompts["."]
+    assert "- package lib: summary of src/lib" in prompts["src"]
+
+
+def test_nested_root_stops_at_root():
+    rollup, prompts = captured_rollup()
+    rollup.files = {"project/a.py": "a", "project/pkg/b.py": "b"}
+    packages = rollup.build_packages()
+    assert set(packages) == {"project", "project/pkg"}
+    assert "- package pkg: summary of project/pkg" in prompts["project"]
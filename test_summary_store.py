@@ -0,0 +1,19 @@
+from summary_store import SummaryStore, match_query
+
+
+def test_match_query_splits_on_underscores():
+    assert match_query("get_github_file content") == '"get"* "github"* "file"* "content"*'
+
+
+def test_match_query_without_words_is_none():
+    assert match_query("__") is None
+    assert match_query("-- ") is None
+
+
+def test_search_by_function_name(tmp_path):
+    store = SummaryStore(str(tmp_path / "summaries.db"))
+    functions = [("get_github_file_content", "def get_github_file_content(owner, repo, path):\n    pass\n")]
+    store.record_file("owner/repo", "cody_docu.py", functions, ["Fetches a file from GitHub."])
+    results = store.search(match_query("github_file"))
+    store.close()
+    assert [result["name"] for result in results] == ["get_github_file_content"]
@@ -0,0 +1,229 @@
+import os
+import sys
+import time
+import struct
+import select
+import ctypes
+import ctypes.util
+
+from code_units import extract_units
+from source_scan import excluded, scan_source_files
+
+# inotify event flags (see inotify(7))
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """Watches a directory tree for changed .py files through Linux inotify (via ctypes, no extra packages).
+
+    inotify reports changes by directory, so a single-file `root` is watched through its
+    directory and only that file's changes are reported.
+    """
+
+    def __init__(self, root):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.root = root
+        self.directories = {}
+        if os.path.isfile(root):
+            self.single_file = os.path.normpath(root)
+            self._watch_directory(os.path.dirname(root) or ".")
+        else:
+            self.single_file = None
+            self._watch_tree(root)
+
+    def _watch_directory(self, directory):
+        wd = self._add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd >= 0:
+            self.directories[wd] = directory
+
+    def _watch_tree(self, top):
+        for directory, subdirectories, _ in os.walk(top):
+            subdirectories[:] = [name for name in subdirectories if not excluded(name)]
+            self._watch_directory(directory)
+
+    def wait(self, timeout=None):
+        """Blocks up to `timeout` seconds (forever if None) and returns the set of changed .py paths."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0").decode(errors="replace")
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; report every file so nothing is missed
+                changed.update(scan_source_files(self.root))
+                continue
+            directory = self.directories.get(wd)
+            if directory is None or not name or excluded(name):
+                continue
+            path = os.path.join(directory, name)
+            if self.single_file is not None:
+                if not mask & IN_ISDIR and os.path.normpath(path) == self.single_file:
+                    changed.add(self.root)
+                continue
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_tree(path)
+                    changed.update(scan_source_files(path))
+            elif name.endswith(".py"):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback watcher that rescans the tree every `interval` seconds and compares size and mtime."""
+
+    def __init__(self, root, interval=1.0):
+        self.root = root
+        self.interval = interval
+        self.stats = self._snapshot()
+
+    def _snapshot(self):
+        stats = {}
+        for path in scan_source_files(self.root):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stats[path] = (stat.st_size, stat.st_mtime_ns)
+        return stats
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            pause = self.interval if deadline is None else min(self.interval, max(0.0, deadline - time.monotonic()))
+            time.sleep(pause)
+            stats = self._snapshot()
+            changed = {path for path in set(stats) | set(self.stats) if stats.get(path) != self.stats.get(path)}
+            self.stats = stats
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+def make_watcher(root, poll_interval=1.0):
+    """Returns an inotify watcher where available, otherwise a polling one."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}); falling back to polling")
+    return PollingWatcher(root, poll_interval)
+
+
+class LiveDocs:
+    """Per-function summaries of a source tree that are updated file by file.
+
+    A changed file is re-parsed, but only functions whose source span differs from the last
+    version are summarized again; the rest keep their summary. `summarize(name, func_code)`
+    is the warm, in-process summarizer.
+    """
+
+    def __init__(self, summarize):
+        self.summarize = summarize
+        self.files = {}
+
+    def update(self, path):
+        """Brings one file up to date; returns (summarized, reused, removed) function counts."""
+        if not os.path.exists(path):
+            removed = len(self.files.pop(path, {}))
+            return 0, 0, removed
+        with open(path, 'r') as file:
+            code = file.read()
+        try:
+            units = extract_units(code, path)
+        except SyntaxError as e:
+            # Mid-edit saves often don't parse; keep the last good docs until the next save
+            print(f"Keeping previous docs for {path}: {e}")
+            return 0, 0, 0
+        previous = self.files.get(path, {})
+        current = {}
+        summarized = 0
+        for unit in units:
+            old = previous.get(unit["qualname"])
+            if old is not None and old[0] == unit["code"]:
+                current[unit["qualname"]] = old
+            else:
+                current[unit["qualname"]] = (unit["code"], self.summarize(unit["name"], unit["code"]))
+                summarized += 1
+        self.files[path] = current
+        removed = len(set(previous) - set(current))
+        return summarized, len(current) - summarized, removed
+
+    def render(self):
+        """Renders all summaries as Markdown, files sorted by path and functions in source order."""
+        sections = []
+        for path in sorted(self.files):
+            lines = [f"## {path}"]
+            lines.extend(f"- `{qualname}`: {summary}" for qualname, (_, summary) in self.files[path].items())
+            sections.append("\n".join(lines))
+        return "\n\n".join(sections) + "\n"
+
+    def write(self, output_path):
+        temp_path = f"{output_path}.tmp"
+        with open(temp_path, 'w') as file:
+            file.write(self.render())
+        os.replace(temp_path, output_path)
+
+
+def watch(root, summarize, output_path=None, debounce=0.5, poll_interval=1.0):
+    """Summarizes `root`, then keeps the docs current as .py files change until interrupted."""
+    docs = LiveDocs(summarize)
+    for path in scan_source_files(root):
+        docs.update(path)
+    if output_path:
+        docs.write(output_path)
+    print(docs.render() if not output_path else f"Docs written to {output_path}")
+
+    watcher = make_watcher(root, poll_interval)
+    print(f"Watching {root} with {type(watcher).__name__} (Ctrl-C to stop)")
+    try:
+        while True:
+            changed = watcher.wait()
+            # Debounce: editors and formatters often save several times in a burst
+            while True:
+                more = watcher.wait(debounce)
+                if not more:
+                    break
+                changed |= more
+            started = time.perf_counter()
+            totals = [0, 0, 0]
+            for path in sorted(changed):
+                for position, count in enumerate(docs.update(path)):
+                    totals[position] += count
+            if output_path:
+                docs.write(output_path)
+            else:
+                for path in sorted(changed):
+                    for qualname, (_, summary) in docs.files.get(path, {}).items():
+                        print(f"{path}::{qualname}: {summary}")
+            print(f"Updated {len(changed)} files in {time.perf_counter() - started:.2f}s: "
+                  f"{totals[0]} summarized, {totals[1]} reused, {totals[2]} removed")
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    finally:
+        watcher.close()
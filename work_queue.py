@@ -0,0 +1,271 @@
+import os
+import time
+import socket
+import sqlite3
+import argparse
+import contextlib
+
+from batching import add_batching_arguments, batcher_from_args
+from compiled import add_compile_arguments
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    code TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    summary TEXT,
+    error TEXT,
+    UNIQUE (file, position)
+)
+"""
+
+
+class WorkQueue:
+    """Function-level summarization jobs with leases, kept in one SQLite file.
+
+    A coordinator enqueues jobs; any number of workers, on this host or on others sharing the
+    file over a network mount, claim them for `lease_seconds`. A job whose lease runs out before
+    its result is posted goes back to the queue, and a job that fails `max_attempts` times is
+    marked failed. Results are merged in (file, position) order, so the output does not depend
+    on which worker did what.
+    """
+
+    def __init__(self, path, lease_seconds=600, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute(SCHEMA)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can't claim the same job
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def enqueue(self, filepath, functions):
+        """Adds one job per (name, func_code) of a file; jobs already queued are left untouched."""
+        rows = [(filepath, position, name, func_code) for position, (name, func_code) in enumerate(functions)]
+        with self._transaction():
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO jobs (file, position, name, code) VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def claim(self, worker):
+        """Leases the next pending or expired job to `worker` and returns it as a dict, or None."""
+        jobs = self.claim_many(worker, 1)
+        return jobs[0] if jobs else None
+
+    def claim_many(self, worker, limit):
+        """Leases up to `limit` pending or expired jobs to `worker` at once and returns them as dicts."""
+        now = time.time()
+        with self._transaction():
+            self.connection.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired too many times' "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?", (now, self.max_attempts))
+            rows = self.connection.execute(
+                "SELECT id, file, position, name, code FROM jobs "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT ?", (now, limit)).fetchall()
+            self.connection.executemany(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE id = ?", [(worker, now + self.lease_seconds, row[0]) for row in rows])
+        return [dict(zip(("id", "file", "position", "name", "code"), row)) for row in rows]
+
+    def complete(self, job_id, worker, summary):
+        """Posts a result; returns False if the lease was lost to another worker in the meantime."""
+        cursor = self.connection.execute(
+            "UPDATE jobs SET status = 'done', summary = ?, error = NULL "
+            "WHERE id = ? AND status = 'leased' AND worker = ?", (summary, job_id, worker))
+        return cursor.rowcount == 1
+
+    def fail(self, job_id, worker, error):
+        """Releases a job after an error, or marks it failed once it has used up its attempts."""
+        self.connection.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = ?, worker = NULL, lease_expires = NULL "
+            "WHERE id = ? AND status = 'leased' AND worker = ?", (self.max_attempts, error, job_id, worker))
+
+    def counts(self):
+        """Returns the number of jobs per status, counting expired leases as pending."""
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        rows = self.connection.execute(
+            "SELECT CASE WHEN status = 'leased' AND lease_expires < ? THEN 'pending' ELSE status END, COUNT(*) "
+            "FROM jobs GROUP BY 1", (time.time(),))
+        for status, count in rows:
+            counts[status] += count
+        return counts
+
+    def results(self):
+        """Returns [(file, [(name, summary), ...]), ...] for finished jobs in deterministic order."""
+        merged = []
+        rows = self.connection.execute(
+            "SELECT file, name, summary FROM jobs WHERE status = 'done' ORDER BY file, position")
+        for filepath, name, summary in rows:
+            if not merged or merged[-1][0] != filepath:
+                merged.append((filepath, []))
+            merged[-1][1].append((name, summary))
+        return merged
+
+    def close(self):
+        self.connection.close()
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_worker(queue, summarize, worker=None, poll_seconds=5.0, exit_when_idle=True):
+    """Claims and summarizes jobs until none are left; returns the number of results posted."""
+    worker = worker or default_worker_id()
+    posted = 0
+    while True:
+        job = queue.claim(worker)
+        if job is None:
+            counts = queue.counts()
+            if exit_when_idle and counts["pending"] == 0 and counts["leased"] == 0:
+                return posted
+            # Other workers still hold leases that may expire and come back to the queue
+            time.sleep(poll_seconds)
+            continue
+        try:
+            summary = summarize(job["name"], job["code"])
+        except Exception as e:
+            print(f"[{worker}] {job['file']}::{job['name']} failed: {e}")
+            queue.fail(job["id"], worker, str(e))
+            continue
+        if queue.complete(job["id"], worker, summary):
+            posted += 1
+        else:
+            print(f"[{worker}] lease on {job['file']}::{job['name']} expired; result discarded")
+
+
+def run_batched_worker(queue, summarize_batch, batcher, length, worker=None, poll_seconds=5.0, exit_when_idle=True):
+    """Like run_worker, but claims about one batch of jobs at a time and summarizes them together.
+
+    `batcher` (an AdaptiveBatcher) sizes the batches passed to `summarize_batch([(name, code), ...])`
+    from `length(job)` tokens. Each batch is posted as soon as it is done; a batch that fails is
+    bisected so only the jobs that fail on their own go back to the queue.
+    """
+    worker = worker or default_worker_id()
+    posted = 0
+
+    def failed(job, error):
+        message = str(error) or type(error).__name__
+        print(f"[{worker}] {job['file']}::{job['name']} failed: {message}")
+        queue.fail(job["id"], worker, message)
+
+    def done(jobs, summaries):
+        nonlocal posted
+        for job, summary in zip(jobs, summaries):
+            if queue.complete(job["id"], worker, summary):
+                posted += 1
+            else:
+                print(f"[{worker}] lease on {job['file']}::{job['name']} expired; result discarded")
+
+    while True:
+        # Only the current batch limit is leased, so jobs don't wait out their lease behind other batches
+        jobs = queue.claim_many(worker, batcher.limit)
+        if not jobs:
+            counts = queue.counts()
+            if exit_when_idle and counts["pending"] == 0 and counts["leased"] == 0:
+                return posted
+            time.sleep(poll_seconds)
+            continue
+        batcher.run(jobs, lambda batch: summarize_batch([(job["name"], job["code"]) for job in batch]), length,
+                    on_error=failed, on_batch=done)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Share one summarization job across processes and hosts")
+    parser.add_argument("command", choices=["enqueue", "work", "status", "merge"])
+    parser.add_argument("--queue", default="work_queue.db", help="SQLite queue file, on a shared mount for several hosts")
+    parser.add_argument("--local", help="enqueue: local directory or .py file")
+    parser.add_argument("--github", action="store_true", help="enqueue: fetch files from a GitHub repository")
+    parser.add_argument("--owner", default="pypa", help="GitHub repository owner")
+    parser.add_argument("--repo", default="sampleproject", help="GitHub repository name")
+    parser.add_argument("--filepath", default="src/sample", help="Directory path in the GitHub repository")
+    parser.add_argument("--branch", default="main", help="GitHub branch")
+    parser.add_argument("--model", default="bart", help="work: model to summarize with (see cody_docu.AVAILABLE_MODELS)")
+    parser.add_argument("--max_length", type=int, default=100, help="work: maximum length of each summary")
+    parser.add_argument("--lease", type=float, default=600, help="Seconds a worker holds a job before it is re-queued")
+    parser.add_argument("--max_attempts", type=int, default=3, help="Attempts before a job is marked failed")
+    parser.add_argument("--worker_id", help="work: name of this worker (defaults to host:pid)")
+    add_compile_arguments(parser)
+    add_batching_arguments(parser)
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.queue, lease_seconds=args.lease, max_attempts=args.max_attempts)
+    try:
+        if args.command == "enqueue":
+            import cody_docu
+
+            if args.github:
+                files = cody_docu.get_github_files_in_directory(args.owner, args.repo, args.filepath, args.branch)
+                sources = ((path, cody_docu.get_github_file_content(args.owner, args.repo, path, args.branch))
+                           for path in files)
+            elif args.local:
+                files = ([args.local] if os.path.isfile(args.local)
+                         else sorted(cody_docu.get_local_files_in_directory(args.local)))
+                sources = ((path, open(path, 'r').read()) for path in files)
+            else:
+                parser.error("enqueue needs --local or --github")
+            total = 0
+            for path, code_content in sources:
+                if code_content:
+                    total += queue.enqueue(path, cody_docu.extract_functions(code_content))
+            print(f"Enqueued {total} functions from {len(files)} files into {args.queue}")
+
+        elif args.command == "work":
+            import cody_docu
+
+            # With --compile, compilation and warm-up happen here, before the worker leases its first job
+            summarization_pipeline = cody_docu.initialize_model(args.model, args.compile, args.buckets)
+
+            batcher = batcher_from_args(args)
+            if batcher is None:
+                def summarize(name, func_code):
+                    return cody_docu.summarize_function(name, func_code, summarization_pipeline, args.max_length)
+
+                posted = run_worker(queue, summarize, args.worker_id)
+            else:
+                tokenizer = summarization_pipeline.tokenizer
+                posted = run_batched_worker(
+                    queue, lambda functions: cody_docu.summarize_batch(functions, summarization_pipeline, args.max_length),
+                    batcher,
+                    # Decoder positions cost memory too, so each job counts its prompt plus the summary it may grow to
+                    lambda job: len(tokenizer(cody_docu.build_prompt(job["name"], job["code"]))["input_ids"])
+                    + args.max_length,
+                    args.worker_id)
+                print(batcher.report())
+            print(f"Posted {posted} summaries; queue: {queue.counts()}")
+
+        elif args.command == "status":
+            print(queue.counts())
+
+        elif args.command == "merge":
+            counts = queue.counts()
+            for filepath, summaries in queue.results():
+                print(f"Summary of {filepath}:")
+                print("\n\n".join(summary for name, summary in summaries))
+            if counts["pending"] or counts["leased"] or counts["failed"]:
+                print(f"Incomplete: {counts}")
+    finally:
+        queue.close()
+
+#usage python work_queue.py enqueue --local path/to/project --queue /shared/job.db
+#usage python work_queue.py work --queue /shared/job.db --model codet5 --lease 300   (on each host)
+#usage python work_queue.py work --queue /shared/job.db --model codet5 --compile inductor
+#usage python work_queue.py work --queue /shared/job.db --model codet5 --max_batch 16 --memory_ceiling_mb 6000
+#usage python work_queue.py merge --queue /shared/job.db > docs.txt